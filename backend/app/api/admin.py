@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models.dead_letter_job import DeadLetterJob
+from app.models.user import User
+from app.schemas.email_job import DeadLetterJobResponse
+from app.utils.auth import require_admin
+
+router = APIRouter()
+
+
+def _dead_job_response(dead: DeadLetterJob) -> DeadLetterJobResponse:
+    return DeadLetterJobResponse(
+        id=dead.id,
+        job_id=dead.job_id,
+        email_id=dead.job.email_id,
+        stage=dead.job.stage,
+        error_kind=dead.error_kind,
+        reason=dead.reason,
+        attempts=dead.attempts,
+        created_at=dead.created_at,
+    )
+
+
+@router.get("/dead-jobs", response_model=list[DeadLetterJobResponse])
+async def list_dead_jobs(
+    stage: str | None = None,
+    limit: int = 50,
+    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    from app.services.jobs import list_dead_jobs as _list_dead_jobs
+
+    dead_jobs = await _list_dead_jobs(db, stage=stage, limit=min(limit, 500))
+    return [_dead_job_response(dead) for dead in dead_jobs]
+
+
+@router.post("/dead-jobs/{dead_id}/requeue", status_code=202)
+async def requeue_dead_job(
+    dead_id: UUID,
+    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    from app.services.jobs import requeue_dead_job as _requeue_dead_job
+    from app.services.pipeline import queue_drafts
+    from app.tasks.worker import dispatch_processing, draft_next
+
+    job = await _requeue_dead_job(dead_id, db)
+    if not job:
+        raise HTTPException(status_code=404, detail="Dead job not found")
+
+    if job.stage in ("classify", "embed"):
+        dispatch_processing([str(job.email_id)], stages=(job.stage,))
+    elif await queue_drafts([job.email_id], db):
+        draft_next.delay()
+    return {"job_id": str(job.id), "status": job.status}
+
+
+@router.get("/chat-intents")
+async def chat_intent_stats(admin: User = Depends(require_admin)):
+    """How many chat commands the rule parser resolved without the LLM."""
+    import asyncio
+
+    from app.services.chat_intents import hit_rate
+
+    return await asyncio.to_thread(hit_rate)
+
+
+@router.get("/latency")
+async def latency_stats(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    bucket: str = Query("hour", pattern="^(hour|day|week)$"),
+    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """p50/p95 processing time per pipeline stage, per tenant and time window."""
+    from app.services.timings import latency_percentiles
+
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return await latency_percentiles(db, since, bucket=bucket)
@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
+from app.schemas.user import UserCreate, UserLogin, UserResponse, VipSendersUpdate, Token
 from app.utils.auth import hash_password, verify_password, create_access_token, get_current_user
 
 router = APIRouter()
@@ -44,3 +44,16 @@ async def login(data: UserLogin, db: AsyncSession = Depends(get_db)):
 @router.get("/me", response_model=UserResponse)
 async def get_me(user: User = Depends(get_current_user)):
     return user
+
+
+@router.put("/me/vip-senders", response_model=UserResponse)
+async def update_vip_senders(
+    data: VipSendersUpdate,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Senders whose mail is drafted ahead of the rest of the queue."""
+    user.vip_senders = sorted({s.strip().lower() for s in data.senders if s.strip()})
+    await db.commit()
+    await db.refresh(user)
+    return user
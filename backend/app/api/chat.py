@@ -2,35 +2,47 @@
 AI Command Chat — naturligt sprog til email-handlinger.
 Brugeren skriver hvad de vil, AI'en fortolker og udfører.
 """
+import asyncio
 import json
 import logging
 import uuid
+from collections import Counter
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import select, delete as sql_delete
+from sqlalchemy import func, select, update, delete as sql_delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 
 from app.config import settings
-from app.database import get_db
+from app.database import async_session, get_db
 from app.models.email_message import EmailMessage
 from app.models.mail_account import MailAccount
 from app.models.ai_suggestion import AiSuggestion
 from app.utils.auth import get_current_user
 from app.models.user import User
+from app.services import chat_intents, chat_sessions, counters
 from app.services.mail_gmail import send_reply
-from app.services.ai_engine import generate_reply, _call_ollama_generate
+from app.services.ai_engine import (
+    generate_reply, prepare_reply_prompt, stream_ollama_generate, template_reply, _call_ollama_generate,
+)
+from app.services.circuit_breaker import CircuitOpenError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_AI_UNAVAILABLE = "AI-assistenten er midlertidigt utilgængelig. Prøv igen om lidt."
+
 
 class CommandRequest(BaseModel):
     message: str
     confirm: bool = False        # Bruger bekræfter en afventende handling
     pending_action: dict | None = None  # Handling der afventer bekræftelse
+    session_id: str | None = None  # Samtale fra et tidligere svar; ny samtale hvis tom
 
 
 class CommandResponse(BaseModel):
@@ -39,26 +51,65 @@ class CommandResponse(BaseModel):
     requires_confirmation: bool = False
     pending_action: dict | None = None
     data: dict | None = None
+    session_id: str | None = None
+
+
+# Højeste antal emails en enkelt chat-handling viser eller sletter
+_ACTION_LIMIT = 500
+
 
+async def _account_ids(user: User, db: AsyncSession) -> list[uuid.UUID]:
+    return list((await db.execute(
+        select(MailAccount.id).where(MailAccount.user_id == user.id)
+    )).scalars().all())
 
-async def _get_user_emails(user: User, db: AsyncSession, limit: int = 100) -> list[EmailMessage]:
-    """Hent alle emails for brugeren."""
-    accounts = (await db.execute(
-        select(MailAccount).where(MailAccount.user_id == user.id)
-    )).scalars().all()
-    if not accounts:
+
+async def _get_user_emails(
+    account_ids: list[uuid.UUID], db: AsyncSession, *conditions, limit: int = 30
+) -> list[EmailMessage]:
+    """Hent brugerens seneste emails (evt. filtreret) uden brødtekst (indlæses kun ved behov)."""
+    if not account_ids:
         return []
-    account_ids = [a.id for a in accounts]
     result = await db.execute(
         select(EmailMessage)
-        .where(EmailMessage.account_id.in_(account_ids))
+        .options(
+            defer(EmailMessage.body_text, raiseload=True),
+            defer(EmailMessage.body_html, raiseload=True),
+        )
+        .where(EmailMessage.account_id.in_(account_ids), *conditions)
         .order_by(EmailMessage.received_at.desc())
         .limit(limit)
     )
     return result.scalars().all()
 
 
-async def _parse_intent(message: str, emails_summary: str) -> dict:
+def _filter_conditions(filters: dict, account_ids: list[uuid.UUID]) -> list:
+    """Oversæt intent-filtre til parametriserede SQL-betingelser over hele postkassen."""
+    conditions = [EmailMessage.account_id.in_(account_ids)]
+    if filters.get("email_ids"):
+        # Emails fra en tidligere tur ("slet den anden"); ugyldige id'er springes over
+        ids = []
+        for email_id in filters["email_ids"]:
+            try:
+                ids.append(uuid.UUID(str(email_id)))
+            except ValueError:
+                continue
+        conditions.append(EmailMessage.id.in_(ids))
+    if filters.get("category"):
+        conditions.append(EmailMessage.category == filters["category"])
+    if filters.get("is_read") is not None:
+        conditions.append(EmailMessage.is_read == bool(filters["is_read"]))
+    if filters.get("from_address"):
+        conditions.append(EmailMessage.from_address.icontains(filters["from_address"], autoescape=True))
+    if filters.get("search_text"):
+        from app.services.search import matches
+        conditions.append(matches(filters["search_text"]))
+    if filters.get("urgency"):
+        conditions.append(EmailMessage.urgency == filters["urgency"])
+    return conditions
+
+
+async def _parse_intent(message: str, emails_summary: str, conversation: str = "") -> dict:
     """Brug Ollama til at fortolke brugerens hensigt og returner struktureret JSON."""
     prompt = f"""Du er en email-assistent. Analyser denne kommando og returner KUN valid JSON.
 
@@ -75,6 +126,9 @@ TILGÆNGELIGE HANDLINGER:
 EMAILS I INDBAKKEN (opsummering):
 {emails_summary}
 
+SAMTALEN INDTIL NU:
+{conversation or "Ingen tidligere beskeder."}
+
 BRUGERENS KOMMANDO: "{message}"
 
 Returner JSON i dette format:
@@ -110,43 +164,92 @@ Svar KUN med JSON, ingen forklaringer."""
         return {"action": "summary", "description": "Kunne ikke fortolke kommandoen", "filters": {}}
 
 
-async def _execute_search(filters: dict, emails: list[EmailMessage]) -> tuple[list[EmailMessage], str]:
-    """Filtrer emails baseret på intent-filters."""
-    results = emails
-    if filters.get("category"):
-        results = [e for e in results if e.category == filters["category"]]
-    if filters.get("is_read") is not None:
-        results = [e for e in results if e.is_read == filters["is_read"]]
-    if filters.get("from_address"):
-        term = filters["from_address"].lower()
-        results = [e for e in results if term in (e.from_address or "").lower()]
-    if filters.get("search_text"):
-        term = filters["search_text"].lower()
-        results = [e for e in results if
-                   term in (e.subject or "").lower() or
-                   term in (e.body_text or "").lower() or
-                   term in (e.from_address or "").lower()]
-    if filters.get("urgency"):
-        results = [e for e in results if e.urgency == filters["urgency"]]
-
-    if not results:
-        return [], "Ingen emails matcher søgningen."
+async def _execute_search(
+    filters: dict, account_ids: list[uuid.UUID], db: AsyncSession, limit: int = _ACTION_LIMIT
+) -> tuple[list[EmailMessage], int, str]:
+    """Find emails der matcher intent-filtrene, nyeste først (højst `limit`), og det samlede antal."""
+    if not account_ids:
+        return [], 0, "Ingen emails matcher søgningen."
+    total = func.count().over().label("total")
+    rows = (await db.execute(
+        select(EmailMessage, total)
+        .options(
+            defer(EmailMessage.body_text, raiseload=True),
+            defer(EmailMessage.body_html, raiseload=True),
+        )
+        .where(*_filter_conditions(filters, account_ids))
+        .order_by(EmailMessage.received_at.desc().nulls_last(), EmailMessage.id.desc())
+        .limit(limit)
+    )).all()
+    if not rows:
+        return [], 0, "Ingen emails matcher søgningen."
 
-    lines = [f"Fandt {len(results)} email(s):"]
+    results = [row[0] for row in rows]
+    count = rows[0].total
+    lines = [f"Fandt {count} email(s):"]
     for e in results[:10]:
         lines.append(f"- [{e.category or '?'}] {e.subject or '(intet emne)'} fra {e.from_address}")
-    if len(results) > 10:
-        lines.append(f"... og {len(results) - 10} mere.")
-    return results, "\n".join(lines)
+    if count > 10:
+        lines.append(f"... og {count - 10} mere.")
+    return results, count, "\n".join(lines)
+
+
+async def _generate(prompt: str, stream: bool) -> AsyncIterator[str]:
+    """AI-tekst til en prompt — i bidder når der streames, ellers hele svaret på én gang."""
+    if stream:
+        async for token in stream_ollama_generate(prompt):
+            yield token
+    else:
+        yield await _call_ollama_generate(prompt)
+
+
+def _results_event(emails: list) -> dict:
+    """Fundne emails som de vises i chatten (ORM-objekter eller søgeresultater)."""
+    def field(e, name):
+        return e[name] if isinstance(e, dict) else getattr(e, name)
+    return {
+        "email_ids": [str(field(e, "id")) for e in emails],
+        "emails": [
+            {
+                "id": str(field(e, "id")),
+                "subject": field(e, "subject"),
+                "from_address": field(e, "from_address"),
+                "category": field(e, "category"),
+                "urgency": field(e, "urgency"),
+            }
+            for e in emails[:10]
+        ],
+    }
 
 
-@router.post("", response_model=CommandResponse)
-async def command(
-    req: CommandRequest,
-    user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-):
-    emails = await _get_user_emails(user, db)
+async def _semantic_search(text: str, user: User, db: AsyncSession) -> list[dict]:
+    """Semantisk søgning i brugerens emails; tom liste hvis vektorindekset ikke svarer."""
+    from app.services.search import semantic_hits
+    account_ids = await _account_ids(user, db)
+    if not account_ids:
+        return []
+    try:
+        return await semantic_hits(
+            db, user.id, account_ids, query=text,
+            limit=10, max_distance=settings.semantic_search_max_distance,
+        )
+    except Exception as exc:
+        logger.warning("Semantisk søgning fejlede: %s", exc)
+        return []
+
+
+async def _run_command(
+    req: CommandRequest, user: User, db: AsyncSession, session: dict, stream: bool = False
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Udfør en chatkommando som en række hændelser: "intent" (den fortolkede
+    kommando), "results" (fundne emails), "token" (AI-tekst efterhånden som
+    den genereres) og til sidst "done" med det samlede CommandResponse.
+
+    `session` er samtalens kontekst (se chat_sessions); den læses her og
+    opdateres af _run_turn.
+    """
+    account_ids = await _account_ids(user, db)
 
     # --- Bekræftelse af afventende handling ---
     if req.confirm and req.pending_action:
@@ -156,22 +259,33 @@ async def command(
 
         if action == "delete":
             if email_ids:
-                await db.execute(
-                    sql_delete(AiSuggestion).where(
-                        AiSuggestion.email_id.in_([uuid.UUID(i) for i in email_ids])
+                # Kun brugerens egne emails, uanset hvad klienten sender med
+                owned = (await db.execute(
+                    select(EmailMessage.id).where(
+                        EmailMessage.id.in_([uuid.UUID(i) for i in email_ids]),
+                        EmailMessage.account_id.in_(account_ids),
                     )
+                )).scalars().all()
+                email_ids = [str(i) for i in owned]
+                await counters.forget_emails(list(owned), db)
+                await db.execute(
+                    sql_delete(AiSuggestion).where(AiSuggestion.email_id.in_(owned))
                 )
                 await db.execute(
-                    sql_delete(EmailMessage).where(
-                        EmailMessage.id.in_([uuid.UUID(i) for i in email_ids])
-                    )
+                    sql_delete(EmailMessage).where(EmailMessage.id.in_(owned))
                 )
                 await db.commit()
                 actions_taken.append(f"Slettede {len(email_ids)} email(s)")
-            return CommandResponse(
+                try:
+                    from app.services.vector_store import delete_emails
+                    delete_emails(email_ids, str(user.id))
+                except Exception as exc:
+                    logger.warning("Kunne ikke fjerne slettede emails fra vektorindekset: %s", exc)
+            yield "done", CommandResponse(
                 response=f"Færdig. Jeg har slettet {len(email_ids)} email(s).",
                 actions_taken=actions_taken
             )
+            return
 
         if action == "send":
             send_data = req.pending_action.get("send_data", {})
@@ -179,7 +293,8 @@ async def command(
                 select(MailAccount).where(MailAccount.user_id == user.id, MailAccount.is_active == True)
             )).scalars().first()
             if not accounts:
-                return CommandResponse(response="Ingen aktiv mailkonto fundet. Forbind Gmail først under Indstillinger.")
+                yield "done", CommandResponse(response="Ingen aktiv mailkonto fundet. Forbind Gmail først under Indstillinger.")
+                return
             success = await send_reply(
                 account=accounts, db=db,
                 to=send_data.get("to", ""),
@@ -188,35 +303,65 @@ async def command(
                 thread_id=send_data.get("thread_id"),
             )
             if success:
-                return CommandResponse(
+                yield "done", CommandResponse(
                     response=f"Email sendt til {send_data.get('to')}.",
                     actions_taken=["Email sendt"]
                 )
-            return CommandResponse(response="Afsendelse mislykkedes. Tjek at Gmail er forbundet.")
-
-    # --- Ny kommando: lav email-opsummering til AI ---
-    emails_summary = "\n".join([
-        f"- ID:{str(e.id)[:8]} [{e.category or '?'}] [{e.urgency or '?'}] "
-        f"{'ULÆST' if not e.is_read else 'læst'} "
-        f"'{e.subject or '(intet emne)'}' fra {e.from_address}"
-        for e in emails[:30]
-    ]) or "Ingen emails i indbakken."
-
-    # --- Fortolk intent ---
-    intent = await _parse_intent(req.message, emails_summary)
+                return
+            yield "done", CommandResponse(response="Afsendelse mislykkedes. Tjek at Gmail er forbundet.")
+            return
+
+    # --- Fortolk intent: faste danske kommandoer lokalt, resten via AI ---
+    # "slet den anden", "svar på dem": emails vist i en tidligere tur
+    referenced = chat_sessions.referenced_ids(session, chat_intents.find_reference(req.message))
+    intent = chat_intents.match_intent(req.message, has_reference=bool(referenced))
+    source = "rule" if intent else "llm"
+    emails_summary = ""
+    conversation = chat_sessions.context(session)
+    if referenced:
+        conversation += (
+            "\n(Kommandoen henviser til emails vist ovenfor; de vælges automatisk, "
+            "så sæt kun filtre brugeren selv nævner.)"
+        )
+    if intent is None:
+        # Email-opsummering til AI'en (bruges også af chat og fallback nedenfor);
+        # genbruges fra samtalen, så opfølgninger ikke henter indbakken igen
+        emails_summary = chat_sessions.cached_inbox(session)
+        if emails_summary is None:
+            emails = await _get_user_emails(account_ids, db)
+            emails_summary = "\n".join([
+                f"- ID:{str(e.id)[:8]} [{e.category or '?'}] [{e.urgency or '?'}] "
+                f"{'ULÆST' if not e.is_read else 'læst'} "
+                f"'{e.subject or '(intet emne)'}' fra {e.from_address}"
+                for e in emails[:30]
+            ]) or "Ingen emails i indbakken."
+            chat_sessions.cache_inbox(session, emails_summary)
+        intent = await _parse_intent(req.message, emails_summary, conversation)
+    await asyncio.to_thread(chat_intents.record_hit, source)
     action = intent.get("action", "summary")
     description = intent.get("description", req.message)
-    filters = intent.get("filters", {})
+    filters = intent.get("filters") or {}
+    if referenced:
+        # Indsnævr til de udpegede emails; øvrige filtre gælder stadig
+        filters = {**filters, "email_ids": referenced}
+    yield "intent", {"action": action, "description": description, "filters": filters, "source": source}
 
     # --- SUGGEST ---
     if action == "suggest":
-        unread = [e for e in emails if not e.is_read]
-        high = [e for e in emails if e.urgency == "high"]
-        unanswered = [e for e in emails if not e.is_read and e.urgency in ("high", "medium")][:5]
+        counts = await counters.get_counters(user.id, db)
+        total, unread, high_count = (
+            counts.get("total", 0), counts.get("unread", 0), counts.get("urgency:high", 0)
+        )
+        high = await _get_user_emails(account_ids, db, EmailMessage.urgency == "high", limit=3)
+        unanswered = await _get_user_emails(
+            account_ids, db,
+            EmailMessage.is_read == False, EmailMessage.urgency.in_(["high", "medium"]),
+            limit=5,
+        )
         lines = ["**Forslag til hvad du bør gøre nu:**\n"]
         if high:
-            lines.append(f"🔴 **Høj prioritet ({len(high)} stk):**")
-            for e in high[:3]:
+            lines.append(f"🔴 **Høj prioritet ({high_count} stk):**")
+            for e in high:
                 lines.append(f"  - {e.subject or '(intet emne)'} fra {e.from_address}")
         if unanswered:
             lines.append(f"\n📬 **Ulæste der kræver svar:**")
@@ -224,102 +369,186 @@ async def command(
                 lines.append(f"  - [{e.category or '?'}] {e.subject or '(intet emne)'} fra {e.from_address}")
         if not high and not unanswered:
             lines.append("Ingen emails kræver øjeblikkelig handling. Indbakken ser godt ud!")
-        lines.append(f"\n📊 I alt: {len(emails)} emails, {len(unread)} ulæste.")
-        return CommandResponse(
+        lines.append(f"\n📊 I alt: {total} emails, {unread} ulæste.")
+        yield "done", CommandResponse(
             response="\n".join(lines),
-            data={"urgent_count": len(high), "unread_count": len(unread)}
+            data={"urgent_count": high_count, "unread_count": unread}
         )
+        return
 
     # --- CHAT (fri AI-snak om emails) ---
     if action == "chat":
         chat_prompt = (
             f"Du er en hjælpsom email-assistent. Svar på brugerens spørgsmål på dansk.\n\n"
             f"EMAILS I INDBAKKEN:\n{emails_summary}\n\n"
+            f"SAMTALEN INDTIL NU:\n{conversation or 'Ingen tidligere beskeder.'}\n\n"
             f"SPØRGSMÅL: {req.message}\n\n"
             f"Svar kortfattet og præcist på dansk."
         )
-        answer = await _call_ollama_generate(chat_prompt)
-        return CommandResponse(response=answer)
+        parts: list[str] = []
+        try:
+            async for token in _generate(chat_prompt, stream):
+                parts.append(token)
+                yield "token", {"text": token}
+            answer = "".join(parts)
+        except CircuitOpenError:
+            answer = _AI_UNAVAILABLE
+        yield "done", CommandResponse(response=answer)
+        return
 
     # --- SUMMARY ---
     if action == "summary":
-        unread = [e for e in emails if not e.is_read]
-        high = [e for e in emails if e.urgency == "high"]
-        cats: dict[str, int] = {}
-        for e in emails:
-            if e.category:
-                cats[e.category] = cats.get(e.category, 0) + 1
+        # Tællerne dækker hele postkassen og hentes i én forespørgsel
+        counts = await counters.get_counters(user.id, db)
+        total, unread = counts.get("total", 0), counts.get("unread", 0)
+        cats = {
+            key.removeprefix("category:"): value
+            for key, value in counts.items()
+            if key.startswith("category:") and value > 0
+        }
         cat_lines = ", ".join(f"{v}× {k}" for k, v in sorted(cats.items(), key=lambda x: -x[1]))
         response = (
             f"**Indbakke overblik:**\n"
-            f"- {len(emails)} emails i alt\n"
-            f"- {len(unread)} ulæste\n"
-            f"- {len(high)} med høj prioritet\n"
+            f"- {total} emails i alt\n"
+            f"- {unread} ulæste\n"
+            f"- {counts.get('urgency:high', 0)} med høj prioritet\n"
             f"- Kategorier: {cat_lines or 'ingen'}"
         )
-        return CommandResponse(response=response, data={"total": len(emails), "unread": len(unread)})
+        yield "done", CommandResponse(response=response, data={"total": total, "unread": unread})
+        return
 
     # --- SEARCH ---
     if action == "search":
-        matched, msg = await _execute_search(filters, emails)
-        return CommandResponse(
+        matched, _, msg = await _execute_search(filters, account_ids, db)
+        if not matched and filters.get("search_text"):
+            # Ingen ordret match — søg efter betydning i hele postkassen
+            semantic = await _semantic_search(filters["search_text"], user, db)
+            if semantic:
+                yield "results", _results_event(semantic)
+                lines = [f"Ingen ordrette match, men {len(semantic)} email(s) handler om det samme:"]
+                for e in semantic:
+                    lines.append(f"- [{e['category'] or '?'}] {e['subject'] or '(intet emne)'} fra {e['from_address']}")
+                yield "done", CommandResponse(
+                    response="\n".join(lines),
+                    data={"email_ids": [str(e["id"]) for e in semantic]}
+                )
+                return
+        if matched:
+            yield "results", _results_event(matched)
+        yield "done", CommandResponse(
             response=msg,
             data={"email_ids": [str(e.id) for e in matched]}
         )
+        return
 
     # --- MARK READ ---
     if action == "mark_read":
-        matched, _ = await _execute_search(filters, emails)
-        if not matched:
-            return CommandResponse(response="Fandt ingen emails der matcher.")
-        for e in matched:
-            e.is_read = True
+        # Én UPDATE over hele postkassen; RETURNING giver tallene til tællerne
+        result = await db.execute(
+            update(EmailMessage)
+            .where(*_filter_conditions(filters, account_ids), EmailMessage.is_read == False)
+            .values(is_read=True)
+            .returning(EmailMessage.account_id)
+            .execution_options(synchronize_session=False)
+        )
+        unread_by_account = Counter(result.scalars().all())
+        marked = sum(unread_by_account.values())
+        if not marked:
+            await db.rollback()
+            yield "done", CommandResponse(response="Fandt ingen ulæste emails der matcher.")
+            return
+        for account_id, n in sorted(unread_by_account.items()):
+            await counters.bump(account_id, {"unread": -n}, db)
         await db.commit()
-        return CommandResponse(
-            response=f"Markerede {len(matched)} email(s) som læst.",
-            actions_taken=[f"Markerede {len(matched)} emails som læst"]
+        yield "done", CommandResponse(
+            response=f"Markerede {marked} email(s) som læst.",
+            actions_taken=[f"Markerede {marked} emails som læst"]
         )
+        return
 
     # --- GENERATE REPLY ---
     if action == "generate_reply":
-        matched, _ = await _execute_search(filters, emails)
-        if not matched:
-            return CommandResponse(response="Fandt ingen email at svare på.")
-        email = matched[0]
+        email = (await db.execute(
+            select(EmailMessage)
+            .where(*_filter_conditions(filters, account_ids))
+            .order_by(EmailMessage.received_at.desc().nulls_last(), EmailMessage.id.desc())
+            .limit(1)
+        )).scalar_one_or_none() if account_ids else None
+        if email is None:
+            yield "done", CommandResponse(response="Fandt ingen email at svare på.")
+            return
         instructions = intent.get("reply_instructions") or ""
-        reply_text = await generate_reply(email, user, db)
+        try:
+            if stream and not instructions:
+                # Udkastet er det endelige svar — stream det direkte
+                prompt = await prepare_reply_prompt(email, user, db)
+                parts = []
+                async for token in _generate(prompt, stream):
+                    parts.append(token)
+                    yield "token", {"text": token}
+                reply_text = "".join(parts).strip()
+            else:
+                reply_text = await generate_reply(email, user, db)
+        except (CircuitOpenError, RuntimeError, httpx.HTTPError) as exc:
+            # AI nede: brug en skabelon, ellers sæt udkastet i kø
+            logger.warning("Svargenerering utilgængelig: %s", exc)
+            reply_text = await template_reply(email, user, db)
+            if reply_text is None:
+                from app.services.pipeline import request_draft
+                email_id = str(email.id)
+                await request_draft(email, db)
+                yield "done", CommandResponse(
+                    response="AI er midlertidigt utilgængelig. Svarudkastet er sat i kø "
+                             "og dukker op, så snart det er klar.",
+                    actions_taken=["Svarudkast sat i kø"],
+                    data={"email_id": email_id, "draft_pending": True}
+                )
+                return
+            instructions = ""
         if instructions:
             refine_prompt = (
                 f"Tilpas dette email-svar: {instructions}\n\n"
                 f"Original email: {email.subject}\n{email.body_text or ''}\n\n"
                 f"Nuværende svar:\n{reply_text}"
             )
-            reply_text = await _call_ollama_generate(refine_prompt)
+            parts = []
+            try:
+                async for token in _generate(refine_prompt, stream):
+                    parts.append(token)
+                    yield "token", {"text": token}
+                reply_text = "".join(parts)
+            except CircuitOpenError:
+                pass  # Behold det ikke-tilpassede udkast
         suggestion = AiSuggestion(
             email_id=email.id,
             suggested_text=reply_text,
             status="pending"
         )
         db.add(suggestion)
+        await counters.bump(email.account_id, {"pending_suggestions": 1}, db)
         await db.commit()
-        return CommandResponse(
+        yield "done", CommandResponse(
             response=f"Svarudkast oprettet til '{email.subject}':\n\n{reply_text}",
             actions_taken=["Svarudkast oprettet"],
             data={"email_id": str(email.id), "suggested_text": reply_text}
         )
+        return
 
     # --- DELETE (kræver bekræftelse) ---
     if action == "delete":
-        matched, msg = await _execute_search(filters, emails)
+        matched, count, _ = await _execute_search(filters, account_ids, db)
         if not matched:
-            return CommandResponse(response="Fandt ingen emails at slette.")
+            yield "done", CommandResponse(response="Fandt ingen emails at slette.")
+            return
         preview = "\n".join(
             f"- {e.subject or '(intet emne)'} fra {e.from_address}"
             for e in matched[:5]
         )
         if len(matched) > 5:
             preview += f"\n... og {len(matched) - 5} mere"
-        return CommandResponse(
+        if count > len(matched):
+            preview += f"\n\n{count} emails matcher; kun de {len(matched)} nyeste slettes ad gangen."
+        yield "done", CommandResponse(
             response=f"Er du sikker på at du vil slette {len(matched)} email(s)?\n\n{preview}",
             requires_confirmation=True,
             pending_action={
@@ -327,6 +556,7 @@ async def command(
                 "email_ids": [str(e.id) for e in matched]
             }
         )
+        return
 
     # --- SEND (kræver bekræftelse) ---
     if action == "send":
@@ -334,8 +564,9 @@ async def command(
         subject = intent.get("send_subject", "")
         body = intent.get("send_body", "")
         if not to or not body:
-            return CommandResponse(response="Angiv hvem emailen skal sendes til og hvad den skal indeholde.")
-        return CommandResponse(
+            yield "done", CommandResponse(response="Angiv hvem emailen skal sendes til og hvad den skal indeholde.")
+            return
+        yield "done", CommandResponse(
             response=f"Er du sikker på at du vil sende denne email?\n\n**Til:** {to}\n**Emne:** {subject}\n\n{body}",
             requires_confirmation=True,
             pending_action={
@@ -343,13 +574,92 @@ async def command(
                 "send_data": {"to": to, "subject": subject, "body": body}
             }
         )
+        return
 
     # Fallback: lad AI svare frit med email-kontekst
     fallback_prompt = (
         f"Du er en hjælpsom email-assistent. Svar på brugerens henvendelse på dansk.\n\n"
         f"EMAILS I INDBAKKEN:\n{emails_summary}\n\n"
+        f"SAMTALEN INDTIL NU:\n{conversation or 'Ingen tidligere beskeder.'}\n\n"
         f"BRUGERENS BESKED: {req.message}\n\n"
         f"Svar kortfattet og hjælpsomt på dansk."
     )
-    answer = await _call_ollama_generate(fallback_prompt)
-    return CommandResponse(response=answer)
+    parts = []
+    try:
+        async for token in _generate(fallback_prompt, stream):
+            parts.append(token)
+            yield "token", {"text": token}
+        answer = "".join(parts)
+    except CircuitOpenError:
+        answer = _AI_UNAVAILABLE
+    yield "done", CommandResponse(response=answer)
+
+
+async def _run_turn(
+    req: CommandRequest, user: User, db: AsyncSession, stream: bool = False
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    _run_command i en samtale: henter sessionen fra Redis, noterer intent
+    og viste emails undervejs og gemmer den opdaterede kontekst, før "done"
+    sendes videre med samtalens session_id.
+    """
+    session = await chat_sessions.load(user.id, req.session_id)
+    intent = None
+    results = None
+    async for event, payload in _run_command(req, user, db, session, stream=stream):
+        if event == "intent":
+            intent = payload
+        elif event == "results":
+            results = payload["emails"]
+        elif event == "done":
+            payload.session_id = session["id"]
+            chat_sessions.record_turn(session, req.message, payload, intent, results)
+            await chat_sessions.save(user.id, session)
+        yield event, payload
+
+
+@router.post("", response_model=CommandResponse)
+async def command(
+    req: CommandRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    async for event, payload in _run_turn(req, user, db):
+        if event == "done":
+            return payload
+
+
+def _sse(event: str, data: Any) -> str:
+    if isinstance(data, BaseModel):
+        data = data.model_dump()
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/stream")
+async def command_stream(
+    req: CommandRequest,
+    user: User = Depends(get_current_user),
+):
+    """
+    Samme kommando som POST /api/chat, men som server-sent events: intent
+    med det samme, derefter resultater og AI-tekst efterhånden, og til sidst
+    "done" med det samlede CommandResponse.
+    """
+    user_id = user.id
+
+    async def _events():
+        # Egen session: forespørgslens session er lukket, mens svaret streames
+        async with async_session() as db:
+            stream_user = await db.get(User, user_id)
+            try:
+                async for event, payload in _run_turn(req, stream_user, db, stream=True):
+                    yield _sse(event, payload)
+            except Exception:
+                logger.exception("Streamet chatkommando fejlede")
+                yield _sse("error", {"detail": "Kommandoen fejlede. Prøv igen."})
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,10 @@
+import logging
 from datetime import datetime, timezone, timedelta
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -11,22 +13,30 @@ from app.models.user import User
 from app.models.mail_account import MailAccount
 from app.models.email_message import EmailMessage
 from app.models.ai_suggestion import AiSuggestion
-from app.schemas.email_message import EmailMessageResponse, EmailListResponse
+from app.schemas.email_message import (
+    EmailMessageResponse, EmailListResponse, EmailSearchResult, EmailSemanticResult,
+)
 from app.utils.auth import get_current_user
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.get("/", response_model=list[EmailListResponse])
 async def list_emails(
+    response: Response,
     category: str | None = None,
     urgency: str | None = None,
     is_read: bool | None = None,
-    skip: int = Query(0, ge=0),
+    cursor: str | None = None,
     limit: int = Query(50, ge=1, le=100),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    """
+    One page of the inbox, newest first. When there are more emails, the
+    X-Next-Cursor header holds the cursor for the next page.
+    """
     # Get user's account IDs
     accounts_result = await db.execute(
         select(MailAccount.id).where(MailAccount.user_id == user.id)
@@ -35,31 +45,71 @@ async def list_emails(
     if not account_ids:
         return []
 
-    # Eagerly load suggestions to check has_suggestion
-    query_with_sug = (
-        select(EmailMessage)
-        .options(selectinload(EmailMessage.suggestions))
-        .where(EmailMessage.account_id.in_(account_ids))
-        .order_by(EmailMessage.received_at.desc())
+    from app.services.inbox import list_page
+    try:
+        emails, next_cursor = await list_page(
+            db, account_ids,
+            category=category, urgency=urgency, is_read=is_read,
+            cursor=cursor, limit=limit,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [EmailListResponse.model_validate(row) for row in emails]
+
+
+@router.get("/search", response_model=list[EmailSearchResult])
+async def search_emails(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Full-text search over all of the user's email, best match first.
+    Supports "quoted phrases", or and -exclusions. As with the inbox list,
+    the X-Next-Cursor header holds the cursor for the next page.
+    """
+    accounts_result = await db.execute(
+        select(MailAccount.id).where(MailAccount.user_id == user.id)
     )
-    if category:
-        query_with_sug = query_with_sug.where(EmailMessage.category == category)
-    if urgency:
-        query_with_sug = query_with_sug.where(EmailMessage.urgency == urgency)
-    if is_read is not None:
-        query_with_sug = query_with_sug.where(EmailMessage.is_read == is_read)
-    query_with_sug = query_with_sug.offset(skip).limit(limit)
+    account_ids = [row[0] for row in accounts_result.all()]
+    if not account_ids:
+        return []
 
-    result = await db.execute(query_with_sug)
-    emails = result.scalars().unique().all()
+    from app.services.search import search_page
+    try:
+        hits, next_cursor = await search_page(db, account_ids, q, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-    response = []
-    for email in emails:
-        item = EmailListResponse.model_validate(email)
-        item.has_suggestion = len(email.suggestions) > 0
-        response.append(item)
+    return [EmailSearchResult.model_validate(hit) for hit in hits]
 
-    return response
+
+@router.get("/semantic-search", response_model=list[EmailSemanticResult])
+async def semantic_search_emails(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(10, ge=1, le=50),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Emails about what the query describes, e.g. "kunder der spørger om badeværelse"."""
+    accounts_result = await db.execute(
+        select(MailAccount.id).where(MailAccount.user_id == user.id)
+    )
+    account_ids = [row[0] for row in accounts_result.all()]
+    if not account_ids:
+        return []
+
+    from app.services.search import semantic_hits
+    hits = await semantic_hits(db, user.id, account_ids, query=q, limit=limit)
+    return [EmailSemanticResult.model_validate(hit) for hit in hits]
 
 
 @router.get("/{email_id}", response_model=EmailMessageResponse)
@@ -85,43 +135,74 @@ async def get_email(
     # Mark as read
     if not email.is_read:
         email.is_read = True
+        from app.services import counters
+        await counters.bump(email.account_id, {"unread": -1}, db)
         await db.commit()
 
     return email
 
 
-@router.get("/stats/summary")
-async def email_stats(
+@router.get("/{email_id}/similar", response_model=list[EmailSemanticResult])
+async def similar_emails(
+    email_id: UUID,
+    limit: int = Query(10, ge=1, le=50),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    """Emails most like this one."""
     accounts_result = await db.execute(
         select(MailAccount.id).where(MailAccount.user_id == user.id)
     )
     account_ids = [row[0] for row in accounts_result.all()]
-    if not account_ids:
-        return {"total": 0, "unread": 0, "categories": {}, "urgency": {}}
 
-    base = select(func.count()).where(EmailMessage.account_id.in_(account_ids))
+    exists_result = await db.execute(
+        select(EmailMessage.id)
+        .where(EmailMessage.id == email_id, EmailMessage.account_id.in_(account_ids))
+    )
+    if exists_result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Email not found")
 
-    total = (await db.execute(base)).scalar()
-    unread = (await db.execute(base.where(EmailMessage.is_read == False))).scalar()
+    from app.services.search import semantic_hits
+    hits = await semantic_hits(db, user.id, account_ids, like_email_id=email_id, limit=limit)
+    return [EmailSemanticResult.model_validate(hit) for hit in hits]
 
-    cat_result = await db.execute(
-        select(EmailMessage.category, func.count())
-        .where(EmailMessage.account_id.in_(account_ids), EmailMessage.category.isnot(None))
-        .group_by(EmailMessage.category)
-    )
-    categories = {row[0]: row[1] for row in cat_result.all()}
 
-    urg_result = await db.execute(
-        select(EmailMessage.urgency, func.count())
-        .where(EmailMessage.account_id.in_(account_ids), EmailMessage.urgency.isnot(None))
-        .group_by(EmailMessage.urgency)
-    )
-    urgency = {row[0]: row[1] for row in urg_result.all()}
+@router.get("/stats/summary")
+async def email_stats(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    from app.services.counters import get_counters
+    counts = await get_counters(user.id, db)
 
-    return {"total": total, "unread": unread, "categories": categories, "urgency": urgency}
+    return {
+        "total": counts.get("total", 0),
+        "unread": counts.get("unread", 0),
+        "categories": _prefixed(counts, "category:"),
+        "urgency": _prefixed(counts, "urgency:"),
+    }
+
+
+def _prefixed(counts: dict[str, int], prefix: str) -> dict[str, int]:
+    return {
+        key[len(prefix):]: value
+        for key, value in counts.items()
+        if key.startswith(prefix) and value > 0
+    }
+
+
+@router.get("/stats/latency")
+async def latency_stats(
+    hours: int = Query(24, ge=1, le=24 * 90),
+    bucket: str = Query("hour", pattern="^(hour|day|week)$"),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """p50/p95 processing time per pipeline stage, per time window."""
+    from app.services.timings import latency_percentiles
+
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return await latency_percentiles(db, since, bucket=bucket, user_id=user.id)
 
 
 @router.get("/dashboard/summary")
@@ -129,49 +210,31 @@ async def dashboard_summary(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    accounts_result = await db.execute(
-        select(MailAccount.id).where(MailAccount.user_id == user.id)
-    )
-    account_ids = [row[0] for row in accounts_result.all()]
-    if not account_ids:
-        return {
-            "unread": 0, "high_priority": 0, "pending_suggestions": 0,
-            "week_total": 0, "top_urgent": [], "user_name": user.name,
-        }
-
-    base = select(func.count()).where(EmailMessage.account_id.in_(account_ids))
-    unread = (await db.execute(base.where(EmailMessage.is_read == False))).scalar()
-    high_priority = (await db.execute(base.where(EmailMessage.urgency == "high"))).scalar()
-
-    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    week_total = (await db.execute(
-        base.where(EmailMessage.received_at >= week_ago)
-    )).scalar()
-
-    pending_sug = (await db.execute(
-        select(func.count(AiSuggestion.id))
-        .join(EmailMessage, AiSuggestion.email_id == EmailMessage.id)
-        .where(EmailMessage.account_id.in_(account_ids), AiSuggestion.status == "pending")
-    )).scalar()
+    from app.services.counters import get_counters, received_since
+    counts = await get_counters(user.id, db)
 
     top_result = await db.execute(
-        select(EmailMessage)
+        select(
+            EmailMessage.id, EmailMessage.subject, EmailMessage.from_address,
+            EmailMessage.urgency, EmailMessage.category,
+        )
+        .join(MailAccount, MailAccount.id == EmailMessage.account_id)
         .where(
-            EmailMessage.account_id.in_(account_ids),
+            MailAccount.user_id == user.id,
             EmailMessage.is_read == False,
             EmailMessage.urgency.in_(["high", "medium"]),
         )
         .order_by(EmailMessage.urgency.desc(), EmailMessage.received_at.asc())
         .limit(5)
     )
-    top_emails = top_result.scalars().all()
+    top_emails = top_result.all()
 
     return {
         "user_name": user.name,
-        "unread": unread,
-        "high_priority": high_priority,
-        "pending_suggestions": pending_sug,
-        "week_total": week_total,
+        "unread": counts.get("unread", 0),
+        "high_priority": counts.get("urgency:high", 0),
+        "pending_suggestions": counts.get("pending_suggestions", 0),
+        "week_total": received_since(counts, 7),
         "top_urgent": [
             {
                 "id": str(e.id),
@@ -204,8 +267,21 @@ async def generate_suggestion(
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
 
-    from app.services.ai_engine import generate_reply
-    reply_text = await generate_reply(email, user, db)
+    from app.services.ai_engine import generate_reply, template_reply
+    from app.services.circuit_breaker import CircuitOpenError
+    try:
+        reply_text = await generate_reply(email, user, db)
+    except (CircuitOpenError, RuntimeError) as exc:
+        # Ollama is down: answer with a template draft, or queue the draft
+        logger.warning("Reply generation unavailable for %s: %s", email.id, exc)
+        reply_text = await template_reply(email, user, db)
+        if reply_text is None:
+            from app.services.pipeline import request_draft
+            await request_draft(email, db)
+            return JSONResponse(
+                status_code=202,
+                content={"status": "draft_pending", "email_id": str(email_id)},
+            )
 
     suggestion = AiSuggestion(
         email_id=email.id,
@@ -213,6 +289,8 @@ async def generate_suggestion(
         status="pending",
     )
     db.add(suggestion)
+    from app.services import counters
+    await counters.bump(email.account_id, {"pending_suggestions": 1}, db)
     email.processed = True
     await db.commit()
     await db.refresh(suggestion)
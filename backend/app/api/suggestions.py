@@ -42,6 +42,7 @@ async def handle_suggestion_action(
     db: AsyncSession = Depends(get_db),
 ):
     suggestion = await _verify_suggestion_access(suggestion_id, user, db)
+    was_pending = suggestion.status == "pending"
 
     if action.action == "approve":
         suggestion.status = "approved"
@@ -56,6 +57,9 @@ async def handle_suggestion_action(
     else:
         raise HTTPException(status_code=400, detail="Invalid action")
 
+    if was_pending:
+        from app.services.counters import bump_for_email
+        await bump_for_email(suggestion.email_id, {"pending_suggestions": -1}, db)
     await db.commit()
     await db.refresh(suggestion)
 
@@ -103,6 +107,9 @@ async def send_suggestion(
 
     from datetime import datetime, timezone
     suggestion.sent_at = datetime.now(timezone.utc)
+    if not email.is_replied:
+        from app.services.counters import bump
+        await bump(email.account_id, {"replied": 1}, db)
     email.is_replied = True
     await db.commit()
     await db.refresh(suggestion)
@@ -1,5 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import RedirectResponse
+import base64
+import hmac
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -11,6 +16,7 @@ from app.utils.auth import get_current_user
 from app.utils.encryption import encrypt_token
 from app.config import settings
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
@@ -108,6 +114,9 @@ async def gmail_callback(code: str, state: str, request: Request, db: AsyncSessi
         db.add(account)
 
     await db.commit()
+
+    from app.tasks.worker import renew_push_subscriptions
+    renew_push_subscriptions.delay()
     return RedirectResponse(f"{base}/settings?connected=gmail")
 
 
@@ -197,9 +206,84 @@ async def outlook_callback(code: str, state: str, request: Request, db: AsyncSes
         db.add(account)
 
     await db.commit()
+
+    from app.tasks.worker import renew_push_subscriptions
+    renew_push_subscriptions.delay()
     return RedirectResponse(f"{base}/settings?connected=outlook")
 
 
+@router.post("/gmail/push", status_code=204)
+async def gmail_push(request: Request, token: str = "", db: AsyncSession = Depends(get_db)):
+    """
+    Gmail Pub/Sub push endpoint.
+
+    The push subscription URL carries ?token=<gmail_push_token>. The message
+    data is {"emailAddress", "historyId"}; only that mailbox is synced.
+    """
+    if not settings.gmail_push_token or not hmac.compare_digest(token, settings.gmail_push_token):
+        raise HTTPException(status_code=403, detail="Invalid push token")
+
+    envelope = await request.json()
+    try:
+        data = json.loads(base64.b64decode(envelope["message"]["data"]))
+        email_address = data["emailAddress"]
+    except (KeyError, TypeError, ValueError):
+        # Ack malformed messages so Pub/Sub does not redeliver them forever
+        logger.warning("Ignoring malformed Gmail push message")
+        return Response(status_code=204)
+
+    result = await db.execute(
+        select(MailAccount.id).where(
+            MailAccount.provider == "gmail",
+            MailAccount.email_address == email_address,
+            MailAccount.is_active.is_(True),
+        )
+    )
+    from app.tasks.worker import sync_account
+    for (account_id,) in result.all():
+        sync_account.delay(str(account_id))
+    return Response(status_code=204)
+
+
+@router.post("/outlook/notifications")
+async def outlook_notifications(
+    request: Request,
+    validationToken: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Microsoft Graph change-notification endpoint.
+
+    Answers the subscription validation handshake, then syncs each account
+    whose subscription is named in a notification with a matching clientState.
+    """
+    if validationToken is not None:
+        return PlainTextResponse(validationToken)
+
+    payload = await request.json()
+    subscription_ids = {
+        n.get("subscriptionId")
+        for n in payload.get("value", [])
+        if settings.outlook_client_state
+        and hmac.compare_digest(n.get("clientState") or "", settings.outlook_client_state)
+    }
+    subscription_ids.discard(None)
+
+    if subscription_ids:
+        result = await db.execute(
+            select(MailAccount.id).where(
+                MailAccount.provider == "outlook",
+                MailAccount.push_subscription_id.in_(subscription_ids),
+                MailAccount.is_active.is_(True),
+            )
+        )
+        from app.tasks.worker import sync_account
+        for (account_id,) in result.all():
+            sync_account.delay(str(account_id))
+
+    return Response(status_code=202)
+
+
 @router.get("/accounts", response_model=list[MailAccountResponse])
 async def list_accounts(
     user: User = Depends(get_current_user),
@@ -33,11 +33,78 @@ class Settings(BaseSettings):
     chroma_host: str = "chromadb"
     chroma_port: int = 8000
 
+    # Email embeddings for semantic search, built by the "embed" pipeline
+    # stage; chat search falls back to hits closer than the max distance
+    email_embed_max_chars: int = 2000
+    semantic_search_max_distance: float = 0.5
+
+    # Circuit breakers around Ollama and ChromaDB (per process)
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 30.0
+
+    # AI processing dispatch (match the classify worker --concurrency)
+    ai_worker_concurrency: int = 2
+    ai_batch_max_size: int = 10
+    worker_db_pool_size: int = 5
+    # Per-tenant cap on drafts running at once; keep it below the draft
+    # worker concurrency (celery-drafter runs 2) so one mailbox cannot take
+    # every slot
+    draft_tenant_max_in_flight: int = 1
+
+    # Micro-batched classification: short emails are packed several to a
+    # prompt (1 disables it)
+    classification_batch_size: int = 8
+    classification_batch_body_chars: int = 800
+    classification_batch_num_ctx: int = 4096
+
+    # Durable job table: a claimed job is leased for job_lease_seconds (keep
+    # it above the slowest draft); pending jobs idle this long are re-dispatched
+    job_lease_seconds: int = 600
+    job_max_attempts: int = 5
+    job_recovery_interval_seconds: int = 120
+    # Transient failures (Ollama/ChromaDB down, timeouts, 429/5xx) back off
+    # exponentially with jitter; permanent ones go straight to dead letter
+    job_retry_base_seconds: float = 30.0
+    job_retry_max_seconds: float = 1800.0
+
+    # Server-side chat sessions: a rolling context per conversation in Redis,
+    # expiring after chat_session_ttl_seconds without a message
+    chat_session_ttl_seconds: int = 3600
+    chat_session_max_turns: int = 6
+    chat_session_max_summary_chars: int = 1500
+    chat_session_max_email_ids: int = 50
+    chat_session_inbox_ttl_seconds: int = 120
+
+    # Recount the per-account inbox counters to correct any drift
+    counters_reconcile_interval_seconds: int = 6 * 3600
+
+    # Asyncio-native worker (python -m app.tasks.async_worker)
+    async_worker_max_in_flight: int = 32
+    async_worker_max_retries: int = 3
+    async_worker_drain_timeout_seconds: int = 120
+
     # Encryption
     encryption_key: str = ""
 
     # Mail sync
     mail_sync_interval_seconds: int = 60
+    mail_sync_lock_timeout_seconds: int = 300
+
+    # Push notifications (polling falls back to the slow interval while a
+    # mailbox has a live watch/subscription)
+    gmail_pubsub_topic: str = ""  # projects/<project>/topics/<topic>
+    gmail_push_token: str = ""
+    outlook_notification_url: str = ""
+    outlook_client_state: str = ""
+    mail_poll_fallback_interval_seconds: int = 900
+    push_renewal_margin_hours: int = 24
+
+    # Provider rate limits (per account) and fetch strategy
+    gmail_fetch_mode: str = "batch"  # batch / concurrent
+    gmail_quota_units_per_second: float = 250.0
+    gmail_fetch_concurrency: int = 10
+    graph_requests_per_second: float = 16.0
+    outlook_initial_sync_days: int = 7
 
     model_config = {"env_file": ".env", "extra": "ignore"}
 
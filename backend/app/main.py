@@ -1,11 +1,17 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import text
 
 from app.config import settings
-from app.database import engine, Base
+from app.database import async_session, engine, Base
+from app.migrations import upgrade_schema
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.http_clients import close_clients
 from app.api.auth import router as auth_router
 from app.api.emails import router as emails_router
 from app.api.suggestions import router as suggestions_router
@@ -13,14 +19,31 @@ from app.api.templates import router as templates_router
 from app.api.knowledge import router as knowledge_router
 from app.api.webhooks import router as webhooks_router
 from app.api.chat import router as chat_router
+from app.api.admin import router as admin_router
+
+logger = logging.getLogger(__name__)
+
+
+async def _backfill_search():
+    from app.services.search import backfill
+    try:
+        async with async_session() as db:
+            await backfill(db)
+    except Exception:
+        logger.exception("Full-text search backfill failed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
+    # Create tables on startup, then upgrade the ones an older version created
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+    # Index mail stored before full-text search existed, without holding up startup
+    backfill = asyncio.create_task(_backfill_search())
     yield
+    backfill.cancel()
+    await close_clients()
     await engine.dispose()
 
 
@@ -37,8 +60,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    # Fail fast while Ollama/ChromaDB is down instead of holding the request
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"AI service temporarily unavailable ({exc.name})"},
+        headers={"Retry-After": str(int(exc.retry_after))},
+    )
+
+
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
 app.include_router(emails_router, prefix="/api/emails", tags=["emails"])
 app.include_router(suggestions_router, prefix="/api/suggestions", tags=["suggestions"])
@@ -46,6 +81,7 @@ app.include_router(templates_router, prefix="/api/templates", tags=["templates"]
 app.include_router(knowledge_router, prefix="/api/knowledge", tags=["knowledge"])
 app.include_router(webhooks_router, prefix="/api/webhooks", tags=["webhooks"])
 app.include_router(chat_router, prefix="/api/chat", tags=["chat"])
+app.include_router(admin_router, prefix="/api/admin", tags=["admin"])
 
 
 @app.get("/api/health")
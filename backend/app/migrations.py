@@ -0,0 +1,73 @@
+"""Idempotent schema upgrades for databases created before a model change."""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# create_all() creates missing tables but never alters existing ones, so
+# every column, index or constraint added to an existing table needs a step
+# here. Each step is a single statement that is a no-op once applied; they
+# run in order on every API start, after create_all().
+_STEPS: list[str] = [
+    # Per-account sync bookkeeping
+    "ALTER TABLE mail_accounts ADD COLUMN IF NOT EXISTS last_synced_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE mail_accounts ADD COLUMN IF NOT EXISTS last_sync_duration_ms INTEGER",
+    # Push subscriptions (Gmail watch / Graph change notifications)
+    "ALTER TABLE mail_accounts ADD COLUMN IF NOT EXISTS push_subscription_id VARCHAR(255)",
+    "ALTER TABLE mail_accounts ADD COLUMN IF NOT EXISTS push_expires_at TIMESTAMP WITH TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_mail_accounts_push_subscription_id ON mail_accounts (push_subscription_id)",
+    # Per-user VIP senders for draft priority
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS vip_senders JSONB",
+    # Bulk ingest relies on ON CONFLICT (account_id, provider_id). Before the
+    # constraint can exist, drop the duplicates older syncs let in: keep the
+    # first copy of each message and move its suggestions over to it.
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conname = 'uq_email_messages_account_provider'
+        ) THEN
+            CREATE TEMP TABLE _email_duplicates ON COMMIT DROP AS
+                SELECT id, keep_id FROM (
+                    SELECT id, first_value(id) OVER (
+                        PARTITION BY account_id, provider_id ORDER BY created_at, id
+                    ) AS keep_id
+                    FROM email_messages
+                ) ranked
+                WHERE id <> keep_id;
+            UPDATE ai_suggestions s SET email_id = d.keep_id
+                FROM _email_duplicates d WHERE s.email_id = d.id;
+            DELETE FROM email_messages e
+                USING _email_duplicates d WHERE e.id = d.id;
+            ALTER TABLE email_messages
+                ADD CONSTRAINT uq_email_messages_account_provider UNIQUE (account_id, provider_id);
+        END IF;
+    END $$
+    """,
+    # Inbox list: keyset order (received_at, id) per account, with and
+    # without each list filter
+    "CREATE INDEX IF NOT EXISTS ix_email_messages_account_received"
+    " ON email_messages (account_id, received_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_email_messages_account_category"
+    " ON email_messages (account_id, category, received_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_email_messages_account_urgency"
+    " ON email_messages (account_id, urgency, received_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_email_messages_account_is_read"
+    " ON email_messages (account_id, is_read, received_at, id)",
+    # Suggestion lookups per email (inbox list has_suggestion)
+    "CREATE INDEX IF NOT EXISTS ix_ai_suggestions_email_id ON ai_suggestions (email_id)",
+    # Full-text search; rows stored before it are indexed by search.backfill()
+    "ALTER TABLE email_messages ADD COLUMN IF NOT EXISTS search_vector TSVECTOR",
+    "CREATE INDEX IF NOT EXISTS ix_email_messages_search ON email_messages USING gin (search_vector)",
+]
+
+
+async def upgrade_schema(conn: AsyncConnection) -> None:
+    """
+    Bring existing tables up to the current models.
+
+    Runs in the caller's transaction; the advisory lock serialises API
+    processes starting at the same time.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('mailbot:schema-upgrade'))"))
+    for statement in _STEPS:
+        await conn.execute(text(statement))
@@ -5,8 +5,13 @@ from app.models.ai_suggestion import AiSuggestion
 from app.models.template import Template
 from app.models.knowledge_base import KnowledgeBase
 from app.models.feedback_log import FeedbackLog
+from app.models.email_job import EmailJob
+from app.models.dead_letter_job import DeadLetterJob
+from app.models.email_timing import EmailTiming
+from app.models.mailbox_counter import MailboxCounter
 
 __all__ = [
     "User", "MailAccount", "EmailMessage", "AiSuggestion",
-    "Template", "KnowledgeBase", "FeedbackLog",
+    "Template", "KnowledgeBase", "FeedbackLog", "EmailJob",
+    "DeadLetterJob", "EmailTiming", "MailboxCounter",
 ]
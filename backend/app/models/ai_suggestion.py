@@ -12,7 +12,7 @@ class AiSuggestion(Base):
     __tablename__ = "ai_suggestions"
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("email_messages.id"), nullable=False)
+    email_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("email_messages.id"), nullable=False, index=True)
     suggested_text: Mapped[str] = mapped_column(Text, nullable=False)
     status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, approved, edited, rejected
     edited_text: Mapped[str | None] = mapped_column(Text)
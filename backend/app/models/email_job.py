@@ -0,0 +1,31 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Index, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class EmailJob(Base):
+    __tablename__ = "email_jobs"
+    __table_args__ = (
+        UniqueConstraint("email_id", "stage", name="uq_email_jobs_email_stage"),
+        Index("ix_email_jobs_claim", "stage", "status", "locked_until"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    email_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("email_messages.id", ondelete="CASCADE"), nullable=False
+    )
+    stage: Mapped[str] = mapped_column(String(20), nullable=False)  # classify, draft, embed
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, running, done, dead
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # Lease expiry while running; earliest retry time while pending
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -1,8 +1,8 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Float, func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Float, Index, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -10,6 +10,17 @@ from app.database import Base
 
 class EmailMessage(Base):
     __tablename__ = "email_messages"
+    __table_args__ = (
+        UniqueConstraint("account_id", "provider_id", name="uq_email_messages_account_provider"),
+        # Inbox list: keyset order (received_at, id) per account, with and
+        # without each list filter
+        Index("ix_email_messages_account_received", "account_id", "received_at", "id"),
+        Index("ix_email_messages_account_category", "account_id", "category", "received_at", "id"),
+        Index("ix_email_messages_account_urgency", "account_id", "urgency", "received_at", "id"),
+        Index("ix_email_messages_account_is_read", "account_id", "is_read", "received_at", "id"),
+        # Full-text search
+        Index("ix_email_messages_search", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     account_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("mail_accounts.id"), nullable=False)
@@ -32,6 +43,8 @@ class EmailMessage(Base):
     confidence: Mapped[float | None] = mapped_column(Float)
 
     processed: Mapped[bool] = mapped_column(default=False)
+    # Danish tsvector over subject, sender and cleaned body, built at ingest
+    search_vector: Mapped[str | None] = mapped_column(TSVECTOR, deferred=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     account = relationship("MailAccount", back_populates="emails")
@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class EmailTiming(Base):
+    __tablename__ = "email_timings"
+    __table_args__ = (
+        Index("ix_email_timings_user_ingested", "user_id", "ingested_at"),
+    )
+
+    email_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("email_messages.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    received_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    ingested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    classified_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    drafted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+    # Stage durations in milliseconds
+    ingest_ms: Mapped[int | None] = mapped_column(Integer)          # received_at -> ingested_at
+    classify_queue_ms: Mapped[int | None] = mapped_column(Integer)  # ingested_at -> classify claimed
+    classify_ms: Mapped[int | None] = mapped_column(Integer)
+    draft_queue_ms: Mapped[int | None] = mapped_column(Integer)     # classified_at -> draft claimed
+    retrieval_ms: Mapped[int | None] = mapped_column(Integer)
+    prompt_ms: Mapped[int | None] = mapped_column(Integer)
+    generate_ms: Mapped[int | None] = mapped_column(Integer)
+    total_ms: Mapped[int | None] = mapped_column(Integer)           # received_at -> draft ready
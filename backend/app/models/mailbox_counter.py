@@ -0,0 +1,18 @@
+import uuid
+
+from sqlalchemy import String, ForeignKey, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class MailboxCounter(Base):
+    __tablename__ = "mailbox_counters"
+
+    account_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("mail_accounts.id", ondelete="CASCADE"), primary_key=True
+    )
+    # total, unread, replied, pending_suggestions, category:<c>, urgency:<u>, received:<YYYY-MM-DD>
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, default=0)
@@ -1,4 +1,4 @@
-from app.schemas.user import UserCreate, UserLogin, UserResponse, Token
+from app.schemas.user import UserCreate, UserLogin, UserResponse, VipSendersUpdate, Token
 from app.schemas.mail_account import MailAccountCreate, MailAccountResponse
 from app.schemas.email_message import EmailMessageResponse, EmailListResponse
 from app.schemas.ai_suggestion import AiSuggestionResponse, SuggestionAction
@@ -0,0 +1,16 @@
+from uuid import UUID
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class DeadLetterJobResponse(BaseModel):
+    id: UUID
+    job_id: UUID
+    email_id: UUID
+    stage: str
+    error_kind: str
+    reason: str
+    attempts: int
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
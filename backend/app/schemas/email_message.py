@@ -43,3 +43,13 @@ class EmailListResponse(BaseModel):
     has_suggestion: bool = False
 
     model_config = {"from_attributes": True}
+
+
+class EmailSemanticResult(EmailListResponse):
+    score: float
+
+
+class EmailSearchResult(EmailListResponse):
+    rank: float
+    subject_highlight: str | None = None
+    snippet: str | None = None
@@ -13,6 +13,7 @@ class MailAccountResponse(BaseModel):
     provider: str
     email_address: str
     is_active: bool
+    last_synced_at: datetime | None = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
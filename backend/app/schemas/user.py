@@ -21,11 +21,16 @@ class UserResponse(BaseModel):
     name: str
     company_name: str | None
     role: str
+    vip_senders: list[str] | None = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
 
 
+class VipSendersUpdate(BaseModel):
+    senders: list[str]  # full addresses or "@domain"
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
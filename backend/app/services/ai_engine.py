@@ -4,14 +4,22 @@ from __future__ import annotations
 
 import json
 import logging
+import time
+from collections.abc import AsyncIterator
 from typing import TYPE_CHECKING
 
 import httpx
 from sqlalchemy import select
 
 from app.config import settings
-from app.services.prompt_builder import build_classification_prompt, build_reply_prompt
-from app.services.vector_store import search_knowledge, search_similar_replies
+from app.services.circuit_breaker import CircuitOpenError, ollama_breaker
+from app.services.http_clients import ollama_client
+from app.services.prompt_builder import (
+    build_batch_classification_prompt,
+    build_classification_prompt,
+    build_reply_prompt,
+)
+from app.services.vector_store import get_email_embedding, search_knowledge, search_similar_replies
 
 if TYPE_CHECKING:
     from sqlalchemy.ext.asyncio import AsyncSession
@@ -21,8 +29,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
-# Default timeout for Ollama requests (generation can be slow on large models)
-_OLLAMA_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+def _elapsed_ms(started: float) -> int:
+    return int((time.monotonic() - started) * 1000)
 
 
 async def get_embedding(text: str) -> list[float]:
@@ -40,38 +49,89 @@ async def get_embedding(text: str) -> list[float]:
         "prompt": text,
     }
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(url, json=payload)
+    with ollama_breaker.guard():
+        response = await ollama_client().post(url, json=payload, timeout=60.0)
         response.raise_for_status()
-        data = response.json()
-        return data["embedding"]
+    data = response.json()
+    return data["embedding"]
 
 
-async def _call_ollama_generate(prompt: str) -> str:
+async def _call_ollama_generate(prompt: str, num_ctx: int = 2048) -> str:
     """Send a generation request to the Ollama API and return the response text.
 
     Args:
         prompt: The full prompt to send to the model.
+        num_ctx: Context window size for this request.
 
     Returns:
         The generated text response.
+
+    Raises:
+        CircuitOpenError: If recent calls failed and the Ollama breaker is open.
     """
     url = f"{settings.ollama_base_url}/api/generate"
     payload = {
         "model": settings.ollama_model,
         "prompt": prompt,
         "stream": False,
-        "options": {"num_ctx": 2048},
+        "options": {"num_ctx": num_ctx},
     }
 
-    async with httpx.AsyncClient(timeout=_OLLAMA_TIMEOUT) as client:
-        response = await client.post(url, json=payload)
+    with ollama_breaker.guard():
+        response = await ollama_client().post(url, json=payload)
         response.raise_for_status()
-        data = response.json()
-        return data.get("response", "")
+    data = response.json()
+    return data.get("response", "")
+
+
+async def stream_ollama_generate(prompt: str, num_ctx: int = 2048) -> AsyncIterator[str]:
+    """Send a streaming generation request to Ollama and yield the text as it arrives.
+
+    Only opening the stream counts towards the Ollama circuit breaker; a
+    stream that has started is read to the end (or until the caller stops).
+    Opening includes the wait for Ollama's first bytes, which can take
+    seconds while the model loads. A caller cancelled during that wait
+    (a client disconnecting) frees the breaker's half-open trial slot
+    without counting as a failure.
+
+    Args:
+        prompt: The full prompt to send to the model.
+        num_ctx: Context window size for this request.
 
+    Yields:
+        Chunks of the generated text, in order.
 
-async def classify_email(subject: str, body: str) -> dict:
+    Raises:
+        CircuitOpenError: If recent calls failed and the Ollama breaker is open.
+    """
+    url = f"{settings.ollama_base_url}/api/generate"
+    payload = {
+        "model": settings.ollama_model,
+        "prompt": prompt,
+        "stream": True,
+        "options": {"num_ctx": num_ctx},
+    }
+
+    client = ollama_client()
+    with ollama_breaker.guard():
+        response = await client.send(client.build_request("POST", url, json=payload), stream=True)
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+    try:
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
+    finally:
+        await response.aclose()
+
+
+async def classify_email(subject: str, body: str, raise_errors: bool = False) -> dict:
     """Classify an email using the Ollama LLM.
 
     Sends a classification prompt and parses the JSON response. Returns
@@ -80,6 +140,8 @@ async def classify_email(subject: str, body: str) -> dict:
     Args:
         subject: The email subject line.
         body: The plain-text email body.
+        raise_errors: Re-raise Ollama API errors instead of falling back to
+            keyword classification, so a job can retry the email later.
 
     Returns:
         Dict with keys: category, urgency, topic, confidence.
@@ -89,9 +151,11 @@ async def classify_email(subject: str, body: str) -> dict:
 
     try:
         raw_response = await _call_ollama_generate(prompt)
-    except httpx.HTTPError as exc:
+    except (httpx.HTTPError, CircuitOpenError) as exc:
         logger.error("Ollama API error during classification: %s", exc)
-        return _default_classification()
+        if raise_errors:
+            raise
+        return keyword_classification(subject, body)
 
     return _parse_classification_response(raw_response)
 
@@ -164,6 +228,150 @@ def _parse_classification_response(raw: str) -> dict:
     }
 
 
+async def classify_emails_batch(emails: list[tuple[str, str]]) -> list[dict]:
+    """Classify several short emails with a single Ollama call.
+
+    Bodies are trimmed to classification_batch_body_chars. Each item of the
+    returned JSON array is validated with _parse_classification_response;
+    any email the model skipped or answered unparseably is classified
+    on its own with classify_email.
+
+    Args:
+        emails: (subject, body) pairs.
+
+    Returns:
+        One classification dict per input email, in input order.
+
+    Raises:
+        httpx.HTTPError: If Ollama fails, so the caller can fall back to
+            classifying (and retrying) the emails one by one.
+    """
+    limit = settings.classification_batch_body_chars
+    prompt = build_batch_classification_prompt(
+        [(subject, body[:limit]) for subject, body in emails]
+    )
+
+    raw_response = await _call_ollama_generate(
+        prompt, num_ctx=settings.classification_batch_num_ctx
+    )
+    items = _parse_batch_classification_response(raw_response, len(emails))
+
+    results: list[dict] = []
+    for index, (subject, body) in enumerate(emails, start=1):
+        if index in items:
+            results.append(_parse_classification_response(json.dumps(items[index])))
+        else:
+            results.append(await classify_email(subject, body, raise_errors=True))
+    return results
+
+
+def _parse_batch_classification_response(raw: str, count: int) -> dict[int, dict]:
+    """Extract the per-email objects from a batch classification response.
+
+    Args:
+        raw: The raw text response from the LLM.
+        count: How many emails were in the batch.
+
+    Returns:
+        Mapping of 1-based email index to its raw classification object.
+        Items without a usable index are matched by position only if the
+        array has exactly one object per email.
+    """
+    text = raw.strip()
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end <= start:
+        logger.warning("No JSON array found in batch classification response: %s", text[:200])
+        return {}
+    try:
+        data = json.loads(text[start : end + 1])
+    except json.JSONDecodeError:
+        logger.warning("Failed to parse batch classification JSON: %s", text[:200])
+        return {}
+
+    objects = [item for item in data if isinstance(item, dict)]
+    items: dict[int, dict] = {}
+    for position, item in enumerate(objects, start=1):
+        try:
+            index = int(item.get("index"))
+        except (TypeError, ValueError):
+            if len(objects) != count:
+                continue
+            index = position
+        if 1 <= index <= count and index not in items:
+            items[index] = item
+    return items
+
+
+# Danish keywords per category, checked in this order; the first hit wins
+_CATEGORY_KEYWORDS: list[tuple[str, tuple[str, ...]]] = [
+    ("reklamation", ("reklamation", "klage", "utilfreds", "fejl ved", "virker ikke", "utæt", "defekt")),
+    ("faktura", ("faktura", "betaling", "rykker", "kreditnota", "indbetaling", "regning")),
+    ("booking", ("booking", "book", "aftale", "besøg", "tid til", "hvornår kan")),
+    ("tilbud", ("tilbud", "pris", "overslag", "hvad koster", "forespørgsel")),
+    ("leverandor", ("ordrebekræftelse", "levering", "leverandør", "grossist", "følgeseddel")),
+    ("spam", ("nyhedsbrev", "unsubscribe", "afmeld", "kampagne", "rabatkode")),
+]
+_HIGH_URGENCY_KEYWORDS = ("haster", "akut", "hurtigst muligt", "straks", "i dag", "vandskade", "nødsituation")
+
+
+def keyword_classification(subject: str, body: str) -> dict:
+    """Classify an email by Danish keywords when Ollama is unavailable.
+
+    A rough stand-in that keeps the inbox sortable during an outage. The
+    low confidence marks the result as a guess.
+
+    Args:
+        subject: The email subject line.
+        body: The plain-text email body.
+
+    Returns:
+        Dict with keys: category, urgency, topic, confidence.
+    """
+    text = f"{subject} {body}".lower()
+    category = next(
+        (cat for cat, words in _CATEGORY_KEYWORDS if any(w in text for w in words)),
+        "andet",
+    )
+    urgency = "high" if any(w in text for w in _HIGH_URGENCY_KEYWORDS) else "medium"
+    return {
+        "category": category,
+        "urgency": urgency,
+        "topic": (subject or "")[:100],
+        "confidence": 0.3 if category != "andet" else 0.1,
+    }
+
+
+async def template_reply(email: EmailMessage, user: User, db: AsyncSession) -> str | None:
+    """Build a draft from the user's best matching template, without the LLM.
+
+    Picks the most-used template for the email's category, or the most-used
+    template overall, and fills in {{navn}}. Other placeholders are left for
+    the user to complete.
+
+    Args:
+        email: The EmailMessage to reply to.
+        user: The User who owns the mailbox.
+        db: An async database session.
+
+    Returns:
+        The draft text, or None if the user has no templates.
+    """
+    from app.models.template import Template
+
+    stmt = (
+        select(Template)
+        .where(Template.user_id == user.id)
+        .order_by((Template.category == email.category).desc(), Template.usage_count.desc())
+        .limit(1)
+    )
+    template = (await db.execute(stmt)).scalar_one_or_none()
+    if template is None:
+        return None
+    name = email.from_name or email.from_address.split("@")[0]
+    return template.body.replace("{{navn}}", name)
+
+
 def _default_classification() -> dict:
     """Return safe default classification values."""
     return {
@@ -174,33 +382,42 @@ def _default_classification() -> dict:
     }
 
 
-async def generate_reply(
-    email: EmailMessage, user: User, db: AsyncSession
+async def prepare_reply_prompt(
+    email: EmailMessage,
+    user: User,
+    db: AsyncSession,
+    stage_ms: dict[str, int] | None = None,
 ) -> str:
-    """Orchestrate the full reply generation pipeline.
-
-    Steps:
-      1. Search ChromaDB for relevant knowledge base entries.
-      2. Search ChromaDB for similar previously approved replies.
-      3. Fetch matching templates from the database.
-      4. Build the reply prompt with all context.
-      5. Call Ollama to generate the reply.
+    """Gather the context for a reply and build its prompt (steps 0-4 of generate_reply).
 
     Args:
         email: The EmailMessage to reply to.
         user: The User who owns the mailbox.
         db: An async database session.
+        stage_ms: If given, filled with the milliseconds spent on
+            "retrieval" and "prompt_build".
 
     Returns:
-        The generated reply text.
+        The reply prompt, ready for Ollama.
     """
+    stage_ms = stage_ms if stage_ms is not None else {}
+    started = time.monotonic()
     user_id_str = str(user.id)
     query_text = f"{email.subject or ''} {email.body_text or ''}"
 
+    # 0: Reuse the ingest-time embedding instead of embedding the email again
+    embedding = None
+    try:
+        embedding = get_email_embedding(str(email.id), user_id_str)
+        if embedding is None:
+            embedding = await get_embedding(query_text)
+    except Exception as exc:
+        logger.warning("Email embedding lookup failed: %s", exc)
+
     # 1 & 2: Search ChromaDB in parallel-style (sequential but fast)
     try:
         knowledge_context = await search_knowledge(
-            query=query_text, user_id=user_id_str, n_results=3
+            query=query_text, user_id=user_id_str, n_results=3, embedding=embedding
         )
     except Exception as exc:
         logger.warning("Knowledge search failed: %s", exc)
@@ -208,7 +425,7 @@ async def generate_reply(
 
     try:
         similar_replies = await search_similar_replies(
-            query=query_text, user_id=user_id_str, n_results=3
+            query=query_text, user_id=user_id_str, n_results=3, embedding=embedding
         )
     except Exception as exc:
         logger.warning("Similar replies search failed: %s", exc)
@@ -228,7 +445,10 @@ async def generate_reply(
     except Exception as exc:
         logger.warning("Template fetch failed: %s", exc)
 
+    stage_ms["retrieval"] = _elapsed_ms(started)
+
     # 4: Build the prompt
+    started = time.monotonic()
     prompt = await build_reply_prompt(
         email=email,
         user=user,
@@ -237,11 +457,47 @@ async def generate_reply(
         templates=templates,
     )
 
+    stage_ms["prompt_build"] = _elapsed_ms(started)
+    return prompt
+
+
+async def generate_reply(
+    email: EmailMessage,
+    user: User,
+    db: AsyncSession,
+    stage_ms: dict[str, int] | None = None,
+) -> str:
+    """Orchestrate the full reply generation pipeline.
+
+    Steps:
+      0. Look up the email's embedding stored at ingest (embedded once here
+         if it has none yet), shared by both ChromaDB searches.
+      1. Search ChromaDB for relevant knowledge base entries.
+      2. Search ChromaDB for similar previously approved replies.
+      3. Fetch matching templates from the database.
+      4. Build the reply prompt with all context.
+      5. Call Ollama to generate the reply.
+
+    Args:
+        email: The EmailMessage to reply to.
+        user: The User who owns the mailbox.
+        db: An async database session.
+        stage_ms: If given, filled with the milliseconds spent on
+            "retrieval" (steps 1-3), "prompt_build" and "generate".
+
+    Returns:
+        The generated reply text.
+    """
+    stage_ms = stage_ms if stage_ms is not None else {}
+    prompt = await prepare_reply_prompt(email, user, db, stage_ms)
+
     # 5: Generate the reply
+    started = time.monotonic()
     try:
         reply_text = await _call_ollama_generate(prompt)
     except httpx.HTTPError as exc:
         logger.error("Ollama API error during reply generation: %s", exc)
         raise RuntimeError(f"Failed to generate reply: {exc}") from exc
+    stage_ms["generate"] = _elapsed_ms(started)
 
     return reply_text.strip()
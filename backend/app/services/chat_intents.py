@@ -0,0 +1,237 @@
+"""Rule-based fast path for common Danish chat commands, tried before the LLM intent parser."""
+
+import logging
+import re
+
+from app.utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HITS_KEY = "mailbot:chat-intents:{source}"
+SOURCES = ("rule", "llm")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_FROM_DOMAIN = re.compile(r"\bfra\s+@?([\w-]+(?:\.[\w-]+)+)")
+
+# Verbs handled by the LLM only: they need free text (a reply or a message)
+_LLM_ONLY = re.compile(r"\b(send\w*|svar\w*|skriv\w*|besvar\w*)\b")
+# ...except when asking which emails need an answer, a "suggest"
+_ASK_WHAT_TO_ANSWER = re.compile(r"\bhvad\s+(?:skal|bør)\s+jeg\s+svare\s+på\b")
+
+# First match wins; each pattern is removed from the text once matched
+_ACTIONS = [
+    ("mark_read", re.compile(r"\bmark[eé]r\w*\b(.*?)\b(?:som\s+)?læst\b")),
+    ("delete", re.compile(r"\bslet\w*\b")),
+    ("summary", re.compile(r"\b(?:opsummer\w*|overblik\w*|status)\b")),
+    ("suggest", re.compile(r"\b(?:hvad\s+(?:skal|bør)\s+jeg(?:\s+(?:gøre|svare\s+på|tage\s+mig\s+af))?|prioriter\w*|forslag)\b")),
+    ("search", re.compile(r"\b(?:vis|find|søg|list|hvilke|hent)\b")),
+]
+
+_CATEGORIES = {
+    "tilbud": re.compile(r"\btilbud\w*\b"),
+    "booking": re.compile(r"\bbooking\w*\b"),
+    "reklamation": re.compile(r"\b(?:reklamation\w*|klage\w*)\b"),
+    "faktura": re.compile(r"\b(?:faktura\w*|regning\w*)\b"),
+    "leverandor": re.compile(r"\bleverand[øo]r\w*\b"),
+    "intern": re.compile(r"\bintern\w*\b"),
+    "spam": re.compile(r"\bspam\b"),
+}
+
+_URGENCIES = {
+    "high": re.compile(r"\b(?:høj\s*-?\s*prioritet\w*|haster|hastende|akut\w*|vigtig\w*)\b"),
+    "medium": re.compile(r"\b(?:medium|mellem|middel)\s*-?\s*prioritet\w*\b"),
+    "low": re.compile(r"\blav\s*-?\s*prioritet\w*\b"),
+}
+
+# Follow-ups pointing at emails listed on an earlier turn ("slet den anden").
+# A reference is a whole object phrase: "den"/"det" + ordinal, "nr. 2" or a
+# plural pronoun, optionally followed by "mail(s)", and then nothing that
+# could make it part of a longer phrase ("den første levering", "sidste uge").
+_ORDINALS = {
+    "første": 0, "anden": 1, "andet": 1, "tredje": 2, "fjerde": 3, "femte": 4,
+    "sjette": 5, "syvende": 6, "ottende": 7, "niende": 8, "tiende": 9, "sidste": -1,
+}
+_REFERENCE = re.compile(
+    r"\b(?:(?:den|det)\s+(?P<ordinal>" + "|".join(_ORDINALS) + r")"
+    r"|(?:nr\.?|nummer)\s*(?P<number>\d{1,2})"
+    r"|(?P<plural>dem(?:\s+(?:alle|begge))?|disse|de\s+samme))"
+    r"(?:\s+(?:e-?mails?|mails?|beskeder|besked))?"
+    r"(?=\s*(?:$|[.!?,]|(?:som|og|igen|også|tak|please)\b))"
+)
+# "svar på den anden", "besvar dem": the reference is the object of a verb
+# the LLM handles
+_LLM_VERB_BEFORE = re.compile(r"\b(?:send\w*|svar\w*|skriv\w*|besvar\w*)(?:\s+(?:på|til))?\s*$")
+
+_UNREAD = re.compile(r"\bulæst\w*\b")
+_READ = re.compile(r"\blæst\w*\b")
+_SEARCH_TEXT = re.compile(r"\b(?:om|efter|indeholder|med\s+ordet|med\s+teksten)\s+[\"']?(.+?)[\"']?$")
+
+# Words that carry no meaning for a command once action and slots are taken out
+_FILLER = {
+    "af", "alle", "alt", "de", "den", "der", "det", "du", "e-mail", "e-mails", "email",
+    "emails", "en", "er", "et", "fra", "gerne", "giv", "har", "have", "hvad", "i", "indbakke",
+    "indbakken", "jeg", "kan", "lige", "mail", "mails", "besked", "beskeder", "med", "mig",
+    "min", "mine", "mit", "nu", "nye", "nyeste", "og", "om", "over", "på", "please",
+    "post", "seneste", "som", "tak", "til", "venligst", "vil", "så",
+}
+
+_DESCRIPTIONS = {
+    "search": "Vis emails",
+    "summary": "Giv overblik over indbakken",
+    "suggest": "Foreslå hvad der kræver handling",
+    "mark_read": "Marker emails som læst",
+    "delete": "Slet emails",
+}
+
+
+def _take(pattern: re.Pattern, text: str) -> tuple[list[re.Match], str]:
+    """All matches of `pattern` and the text with them blanked out."""
+    found = list(pattern.finditer(text))
+    return found, pattern.sub(" ", text)
+
+
+def find_reference(message: str) -> int | str | None:
+    """
+    Which earlier listed email a follow-up points at: a 0-based position
+    (-1 for "den sidste"), "all" for "dem"/"disse", or None.
+
+    Only a reference the command is about counts: either the rule parser
+    resolves the whole message with it ("slet den anden", "marker dem som
+    læst"), or it is the object of a reply/send verb ("svar på den anden").
+    Ordinals inside addresses or longer phrases ("mails fra sidste uge",
+    "noget andet") are not references.
+    """
+    text = _EMAIL.sub(" ", " ".join(message.lower().split()).strip(" .!?"))
+    match = _REFERENCE.search(text)
+    if not match:
+        return None
+    if not _LLM_VERB_BEFORE.search(text[: match.start()]) and match_intent(message, has_reference=True) is None:
+        return None
+    if match.group("ordinal"):
+        return _ORDINALS[match.group("ordinal")]
+    if match.group("number"):
+        number = int(match.group("number"))
+        return number - 1 if number > 0 else None
+    return "all"
+
+
+def match_intent(message: str, has_reference: bool = False) -> dict | None:
+    """
+    Resolve a chat message to an intent without the LLM, if it can be
+    resolved with confidence.
+
+    Returns an intent shaped like the LLM's (action, description, filters),
+    or None when the message is ambiguous: an unknown verb, a command that
+    needs free text (send, reply), conflicting slots, or words left over
+    once the action and slots are accounted for.
+
+    With has_reference the message points at emails from an earlier turn
+    (see find_reference); the reference stands in for filters.
+    """
+    text = " ".join(message.lower().split()).strip(" .!?")
+    if not text or _LLM_ONLY.search(_ASK_WHAT_TO_ANSWER.sub(" ", text)):
+        return None
+
+    filters: dict = {}
+
+    # Sender first: addresses contain dots and words the other rules would see
+    addresses, text = _take(_EMAIL, text)
+    domains, text = _take(_FROM_DOMAIN, text)
+    senders = [m.group(0) for m in addresses] + [m.group(1) for m in domains]
+    if len(senders) > 1:
+        return None
+    if senders:
+        filters["from_address"] = senders[0]
+
+    if has_reference:
+        # Exactly one reference, outside any address (those are gone by now)
+        references, text = _take(_REFERENCE, text)
+        if len(references) != 1:
+            return None
+
+    action = None
+    for name, pattern in _ACTIONS:
+        match = pattern.search(text)
+        if match:
+            action = name
+            # Keep what sits between "marker" and "læst" ("marker [tilbud] som læst")
+            kept = match.group(1) if match.groups() else ""
+            text = f"{text[:match.start()]} {kept} {text[match.end():]}"
+            break
+
+    if action in (None, "search", "delete"):
+        search_text = _SEARCH_TEXT.search(text)
+        if search_text:
+            terms = search_text.group(1).split()
+            while terms and terms[-1] in _FILLER:
+                terms.pop()  # "om tag fra <adresse>" leaves a dangling "fra"
+            if terms:
+                filters["search_text"] = " ".join(terms)
+            text = text[: search_text.start()]
+
+    categories = []
+    for category, pattern in _CATEGORIES.items():
+        found, text = _take(pattern, text)
+        if found:
+            categories.append(category)
+    urgencies = []
+    for urgency, pattern in _URGENCIES.items():
+        found, text = _take(pattern, text)
+        if found:
+            urgencies.append(urgency)
+    if len(categories) > 1 or len(urgencies) > 1:
+        return None
+    if categories:
+        filters["category"] = categories[0]
+    if urgencies:
+        filters["urgency"] = urgencies[0]
+
+    unread, text = _take(_UNREAD, text)
+    read, text = _take(_READ, text)
+    if unread and read:
+        return None
+    if unread or read:
+        filters["is_read"] = not unread
+
+    words = re.findall(r"[\wæøå-]+", text)
+    leftover = [w for w in words if w not in _FILLER]
+    if leftover:
+        return None
+
+    if action is None:
+        # Only slots ("ulæste tilbud") reads as a search
+        if not filters and not has_reference:
+            return None
+        action = "search"
+    if action in ("summary", "suggest") and filters:
+        return None  # Neither takes filters; let the LLM decide what was meant
+    if action == "delete" and not filters and not has_reference:
+        return None  # Never guess at "delete everything"
+    if action == "mark_read" and not filters and not has_reference and "alle" not in words:
+        return None
+
+    return {
+        "action": action,
+        "description": _DESCRIPTIONS[action],
+        "filters": filters,
+    }
+
+
+def record_hit(source: str) -> None:
+    """Count a chat intent resolved by `source` ("rule" or "llm")."""
+    try:
+        get_redis().incr(HITS_KEY.format(source=source))
+    except Exception as exc:
+        logger.warning("Could not record chat intent hit: %s", exc)
+
+
+def hit_rate() -> dict:
+    """How many chat intents each parser resolved, and the rule share."""
+    values = get_redis().mget([HITS_KEY.format(source=source) for source in SOURCES])
+    counts = {source: int(value or 0) for source, value in zip(SOURCES, values)}
+    total = sum(counts.values())
+    return {
+        **counts,
+        "total": total,
+        "rule_hit_rate": round(counts["rule"] / total, 4) if total else None,
+    }
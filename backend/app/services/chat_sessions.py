@@ -0,0 +1,184 @@
+"""Server-side chat sessions: a compact rolling context per conversation, kept in Redis."""
+
+import json
+import logging
+import re
+import time
+import uuid
+from uuid import UUID
+
+from app.config import settings
+from app.utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = "mailbot:chat-session:{user_id}:{session_id}"
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Per-field caps; together with the turn and summary limits in settings they
+# keep a session to a few kilobytes however long the conversation runs
+_USER_CHARS = 200
+_ASSISTANT_CHARS = 300
+_SUMMARY_LINE_CHARS = 160
+_MAX_RESULTS = 10
+
+
+def _new(session_id: str | None = None) -> dict:
+    return {
+        "id": session_id or uuid.uuid4().hex,
+        "summary": "",
+        "turns": [],
+        "results": [],
+        "email_ids": [],
+        "inbox": None,
+    }
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+async def load(user_id: UUID, session_id: str | None) -> dict:
+    """
+    The session the client refers to, or a fresh one when it has none, the
+    id is unknown or the session has expired. Redis being down degrades to
+    a stateless turn rather than failing the command.
+    """
+    if not session_id or not _SESSION_ID.match(session_id):
+        return _new()
+    try:
+        raw = await get_async_redis().get(SESSION_KEY.format(user_id=user_id, session_id=session_id))
+    except Exception as exc:
+        logger.warning("Could not load chat session: %s", exc)
+        return _new(session_id)
+    if raw is None:
+        return _new(session_id)
+    try:
+        return {**_new(session_id), **json.loads(raw)}
+    except ValueError:
+        return _new(session_id)
+
+
+async def save(user_id: UUID, session: dict) -> None:
+    """Store the session; every turn restarts its TTL."""
+    try:
+        await get_async_redis().set(
+            SESSION_KEY.format(user_id=user_id, session_id=session["id"]),
+            json.dumps(session, ensure_ascii=False, default=str),
+            ex=settings.chat_session_ttl_seconds,
+        )
+    except Exception as exc:
+        logger.warning("Could not save chat session: %s", exc)
+
+
+def cached_inbox(session: dict) -> str | None:
+    """The inbox summary built on an earlier turn, while it is still fresh."""
+    inbox = session.get("inbox")
+    if not inbox or time.time() - inbox["at"] > settings.chat_session_inbox_ttl_seconds:
+        return None
+    return inbox["text"]
+
+
+def cache_inbox(session: dict, text: str) -> None:
+    session["inbox"] = {"text": text, "at": time.time()}
+
+
+def referenced_ids(session: dict, reference: int | str | None) -> list[str]:
+    """
+    Email ids a follow-up refers to, from the emails shown on the last turn
+    that listed any: a position ("den anden", -1 for "den sidste") or "all"
+    ("dem", "disse").
+    """
+    results = session.get("results") or []
+    if reference is None or not results:
+        return []
+    if reference == "all":
+        return [r["id"] for r in results]
+    try:
+        return [results[reference]["id"]]
+    except IndexError:
+        return []
+
+
+def context(session: dict) -> str:
+    """The session as a short block of prompt text; empty for a new session."""
+    lines = []
+    if session.get("summary"):
+        lines.append("Tidligere i samtalen:")
+        lines.append(session["summary"])
+    for turn in session.get("turns") or []:
+        lines.append(f"Bruger: {turn['user']}")
+        lines.append(f"Assistent ({turn['action']}): {turn['assistant']}")
+    if session.get("results"):
+        lines.append("Senest viste emails:")
+        lines.extend(f"{n}. {r['label']}" for n, r in enumerate(session["results"], start=1))
+    return "\n".join(lines)
+
+
+def record_turn(
+    session: dict,
+    message: str,
+    response,
+    intent: dict | None = None,
+    results: list[dict] | None = None,
+) -> None:
+    """
+    Add a finished turn to the session.
+
+    Args:
+        session: Session from load().
+        message: What the user wrote.
+        response: The turn's CommandResponse.
+        intent: The resolved intent, if the turn had one (not for confirmations).
+        results: Emails listed to the user this turn, in order; a search that
+            found nothing clears the previous list.
+    """
+    action = (intent or {}).get("action") or "confirm"
+    session["turns"].append({
+        "user": _clip(message, _USER_CHARS),
+        "assistant": _clip(response.response, _ASSISTANT_CHARS),
+        "action": action,
+        "filters": {k: v for k, v in ((intent or {}).get("filters") or {}).items() if v not in (None, "")},
+    })
+
+    # Older turns are folded into one line each; the oldest lines go first
+    overflow = len(session["turns"]) - settings.chat_session_max_turns
+    if overflow > 0:
+        folded = [
+            _clip(f"- {t['user']} → {t['action']}: {t['assistant']}", _SUMMARY_LINE_CHARS)
+            for t in session["turns"][:overflow]
+        ]
+        del session["turns"][:overflow]
+        summary = "\n".join(filter(None, [session["summary"], *folded]))
+        while len(summary) > settings.chat_session_max_summary_chars and "\n" in summary:
+            summary = summary.split("\n", 1)[1]
+        session["summary"] = summary[-settings.chat_session_max_summary_chars:]
+
+    if results is not None:
+        session["results"] = [
+            {
+                "id": str(e["id"]),
+                "label": _clip(
+                    f"[{e.get('category') or '?'}] {e.get('subject') or '(intet emne)'} fra {e.get('from_address')}",
+                    _SUMMARY_LINE_CHARS,
+                ),
+            }
+            for e in results[:_MAX_RESULTS]
+        ]
+    elif action == "search":
+        session["results"] = []
+
+    if response.actions_taken:
+        session["inbox"] = None  # Emails were changed; rebuild the summary next turn
+
+    # Every email the turn touched, most recent first
+    data = response.data or {}
+    touched = [r["id"] for r in session["results"]] if results else []
+    touched += data.get("email_ids") or []
+    if data.get("email_id"):
+        touched.append(data["email_id"])
+    touched += (response.pending_action or {}).get("email_ids") or []
+    seen = list(dict.fromkeys([*map(str, touched), *session["email_ids"]]))
+    session["email_ids"] = seen[: settings.chat_session_max_email_ids]
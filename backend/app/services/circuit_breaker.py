@@ -0,0 +1,126 @@
+"""Circuit breakers for the Ollama and ChromaDB clients.
+
+After circuit_failure_threshold consecutive service failures a breaker
+opens, and calls fail at once with CircuitOpenError instead of waiting on
+a service that is down or overloaded. After circuit_reset_seconds one
+trial call is let through; it closes the breaker on success or re-opens
+it on failure. State is per process, which is enough to stop one API or
+worker process from piling requests onto a struggling service.
+"""
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import httpx
+
+from app.config import settings
+from app.services.rate_limit import RETRYABLE_STATUS
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a service whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_service_failure(exc: BaseException) -> bool:
+    """
+    Whether an error means the service itself is unhealthy: unreachable,
+    timed out or answering 429/5xx. Wrapped errors are judged by their
+    cause or, for an error raised while handling another (chromadb's
+    HttpClient turns a ConnectError into a ValueError that way), by the
+    error they replaced.
+    """
+    seen: set[int] = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, httpx.TransportError):
+            return True
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRYABLE_STATUS
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def _before_call(self) -> bool:
+        """Raise CircuitOpenError, or let the call run; True if it is the half-open trial."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._trial_running:
+            # Let a single trial call through; the rest keep failing fast
+            self._trial_running = True
+            return True
+        retry_after = self.reset_seconds - (time.monotonic() - self._opened_at)
+        raise CircuitOpenError(self.name, max(retry_after, 1.0))
+
+    def _record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Circuit %s closed", self.name)
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def _record_failure(self) -> None:
+        self._failures += 1
+        if self._trial_running or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._trial_running:
+                logger.warning("Circuit %s opened after %d failures", self.name, self._failures)
+            self._opened_at = time.monotonic()
+        self._trial_running = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Wrap one call to the service. Raises CircuitOpenError without running
+        the block while the breaker is open. Errors that do not mean the
+        service is unhealthy (bad input, 4xx) count as a working service.
+        A cancelled call (client gone, timeout, shutdown) counts as neither,
+        but always frees the trial slot so a later call can take it.
+        """
+        is_trial = self._before_call()
+        try:
+            yield
+        except Exception as exc:
+            if is_service_failure(exc):
+                self._record_failure()
+            else:
+                self._record_success()
+            raise
+        else:
+            self._record_success()
+        finally:
+            if is_trial:
+                self._trial_running = False
+
+
+ollama_breaker = CircuitBreaker(
+    "ollama", settings.circuit_failure_threshold, settings.circuit_reset_seconds
+)
+chroma_breaker = CircuitBreaker(
+    "chroma", settings.circuit_failure_threshold, settings.circuit_reset_seconds
+)
@@ -0,0 +1,208 @@
+"""Per-account inbox counters, maintained incrementally with the rows they count."""
+
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ai_suggestion import AiSuggestion
+from app.models.email_message import EmailMessage
+from app.models.mail_account import MailAccount
+from app.models.mailbox_counter import MailboxCounter
+
+logger = logging.getLogger(__name__)
+
+# First key of the per-account advisory lock shared by bump() and reconcile()
+_LOCK_NAMESPACE = 4401
+
+
+def received_key(received_at: datetime | date) -> str:
+    """Day bucket (UTC) an email was received in."""
+    if isinstance(received_at, datetime):
+        received_at = received_at.astimezone(timezone.utc).date()
+    return f"received:{received_at.isoformat()}"
+
+
+def classification_keys(email) -> list[str]:
+    """The category and urgency counters a classified email contributes 1 to."""
+    keys = []
+    if email.category:
+        keys.append(f"category:{email.category}")
+    if email.urgency:
+        keys.append(f"urgency:{email.urgency}")
+    return keys
+
+
+def email_keys(email) -> list[str]:
+    """Every counter one email contributes 1 to (excluding its suggestions)."""
+    keys = ["total", *classification_keys(email)]
+    if not email.is_read:
+        keys.append("unread")
+    if email.is_replied:
+        keys.append("replied")
+    if email.received_at:
+        keys.append(received_key(email.received_at))
+    return keys
+
+
+async def _lock_account(account_id: UUID, db: AsyncSession) -> None:
+    """
+    Take the account's counter lock until the transaction ends. It keeps a
+    bump from landing between reconcile()'s recount and its overwrite.
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(_LOCK_NAMESPACE, func.hashtext(str(account_id)))))
+
+
+async def bump(account_id: UUID, deltas: dict[str, int], db: AsyncSession) -> None:
+    """
+    Add `deltas` to an account's counters, creating missing ones.
+
+    Runs in the caller's transaction, so the counters change in the same
+    commit as the rows they count. The upsert is atomic, so concurrent
+    workers never lose an increment. The account's counter lock is held
+    until that commit; callers bumping several accounts in one transaction
+    go through them in sorted order, so two of them cannot deadlock.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    await _lock_account(account_id, db)
+    stmt = pg_insert(MailboxCounter).values(
+        [{"account_id": account_id, "key": key, "value": delta} for key, delta in deltas.items()]
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[MailboxCounter.account_id, MailboxCounter.key],
+            set_={"value": MailboxCounter.value + stmt.excluded.value},
+        )
+    )
+
+
+async def bump_for_email(email_id: UUID, deltas: dict[str, int], db: AsyncSession) -> None:
+    """bump() for the account an email belongs to."""
+    account_id = (await db.execute(
+        select(EmailMessage.account_id).where(EmailMessage.id == email_id)
+    )).scalar_one_or_none()
+    if account_id is not None:
+        await bump(account_id, deltas, db)
+
+
+async def forget_emails(email_ids: list[UUID], db: AsyncSession) -> None:
+    """Take emails (and their pending suggestions) out of the counters before they are deleted."""
+    if not email_ids:
+        return
+    rows = (await db.execute(
+        select(
+            EmailMessage.account_id, EmailMessage.is_read, EmailMessage.is_replied,
+            EmailMessage.category, EmailMessage.urgency, EmailMessage.received_at,
+        ).where(EmailMessage.id.in_(email_ids))
+    )).all()
+    deltas: dict[UUID, Counter] = {}
+    for row in rows:
+        deltas.setdefault(row.account_id, Counter()).update(email_keys(row))
+
+    pending = await db.execute(
+        select(EmailMessage.account_id, func.count())
+        .join(AiSuggestion, AiSuggestion.email_id == EmailMessage.id)
+        .where(EmailMessage.id.in_(email_ids), AiSuggestion.status == "pending")
+        .group_by(EmailMessage.account_id)
+    )
+    for account_id, count in pending.all():
+        deltas.setdefault(account_id, Counter())["pending_suggestions"] += count
+
+    for account_id, counts in sorted(deltas.items()):
+        await bump(account_id, {key: -n for key, n in counts.items()}, db)
+
+
+async def get_counters(user_id: UUID, db: AsyncSession) -> dict[str, int]:
+    """All counters for a user, summed over their accounts, in one query."""
+    result = await db.execute(
+        select(MailboxCounter.key, func.sum(MailboxCounter.value))
+        .join(MailAccount, MailAccount.id == MailboxCounter.account_id)
+        .where(MailAccount.user_id == user_id)
+        .group_by(MailboxCounter.key)
+    )
+    return {key: int(value) for key, value in result.all()}
+
+
+def received_since(counters: dict[str, int], days: int) -> int:
+    """Emails received over the last `days` UTC days, today included."""
+    today = datetime.now(timezone.utc).date()
+    return sum(
+        counters.get(received_key(today - timedelta(days=offset)), 0)
+        for offset in range(days)
+    )
+
+
+async def _count_account(account_id: UUID, db: AsyncSession) -> Counter:
+    """Recount an account's counters from the source tables."""
+    counts: Counter = Counter()
+    base = EmailMessage.account_id == account_id
+
+    row = (await db.execute(
+        select(
+            func.count(),
+            func.count().filter(EmailMessage.is_read.is_(False)),
+            func.count().filter(EmailMessage.is_replied.is_(True)),
+        ).where(base)
+    )).one()
+    counts["total"], counts["unread"], counts["replied"] = row
+
+    for column, prefix in ((EmailMessage.category, "category"), (EmailMessage.urgency, "urgency")):
+        result = await db.execute(
+            select(column, func.count()).where(base, column.isnot(None)).group_by(column)
+        )
+        counts.update({f"{prefix}:{value}": n for value, n in result.all()})
+
+    day = func.date(func.timezone("UTC", EmailMessage.received_at))
+    result = await db.execute(
+        select(day, func.count()).where(base, EmailMessage.received_at.isnot(None)).group_by(day)
+    )
+    counts.update({received_key(value): n for value, n in result.all()})
+
+    counts["pending_suggestions"] = (await db.execute(
+        select(func.count())
+        .select_from(AiSuggestion)
+        .join(EmailMessage, AiSuggestion.email_id == EmailMessage.id)
+        .where(base, AiSuggestion.status == "pending")
+    )).scalar()
+    return +counts  # drop zeros
+
+
+async def reconcile(db: AsyncSession) -> int:
+    """
+    Recount every account and overwrite counters that have drifted (a missed
+    hook, a manual SQL change, a crash between write paths). Each account is
+    recounted under its counter lock, so writers that bump it wait for the
+    overwrite instead of having their increment replaced by it.
+
+    Returns the number of accounts that needed a correction.
+    """
+    account_ids = (await db.execute(select(MailAccount.id))).scalars().all()
+    corrected = 0
+    for account_id in account_ids:
+        await _lock_account(account_id, db)
+        fresh = await _count_account(account_id, db)
+        stored = {
+            key: value
+            for key, value in (await db.execute(
+                select(MailboxCounter.key, MailboxCounter.value)
+                .where(MailboxCounter.account_id == account_id)
+            )).all()
+            if value
+        }
+        if stored != dict(fresh):
+            logger.warning("Counters for account %s drifted — correcting", account_id)
+            await db.execute(delete(MailboxCounter).where(MailboxCounter.account_id == account_id))
+            if fresh:
+                await db.execute(pg_insert(MailboxCounter).values([
+                    {"account_id": account_id, "key": key, "value": value}
+                    for key, value in fresh.items()
+                ]))
+            corrected += 1
+        await db.commit()
+    return corrected
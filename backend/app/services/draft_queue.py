@@ -0,0 +1,158 @@
+"""Priority queue for reply drafting, backed by a Redis sorted set.
+
+Emails waiting for a draft are ordered by a score in seconds (lower runs
+first): the time they were received, pulled forward by a fixed boost for
+urgency, VIP senders and fresh mail. Because the boost is bounded, a
+low-priority email is never overtaken by more than the largest boost, so
+nothing starves; an email received more than that long ago runs before any
+new arrival. Basing the score on receipt rather than on when the email was
+queued keeps a re-queued email in the place its age gives it.
+
+Each tenant has its own sorted set, and a "ready" sorted set holds the
+tenants that have emails waiting and are under their cap on drafts in
+flight, scored by their best email. Claiming takes the head of the best
+ready tenant, so one busy mailbox can neither occupy every draft worker nor
+hide other tenants' emails behind its own. Every change to a tenant's queue
+or in-flight count re-files the tenant in the ready set in the same Lua
+script.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.utils.redis_client import get_redis
+
+QUEUE_PREFIX = "mailbot:draft-queue:tenant:"
+READY_KEY = "mailbot:draft-queue:ready"
+IN_FLIGHT_PREFIX = "mailbot:draft-inflight:"
+
+URGENCY_BOOST_SECONDS = {"high": 4 * 3600, "medium": 3600, "low": 0}
+VIP_BOOST_SECONDS = 2 * 3600
+FRESH_BOOST_SECONDS = 1800
+FRESH_WINDOW_SECONDS = 3600
+
+# Safety net: an in-flight counter left behind by a crashed worker expires
+_IN_FLIGHT_TTL_SECONDS = 3600
+
+# KEYS[1] is the ready set; ARGV[1..3] are the queue prefix, the in-flight
+# prefix and the per-tenant cap. Each script appends its own arguments.
+_REFILE = """
+local function refile(owner)
+  local head = redis.call('ZRANGE', ARGV[1] .. owner, 0, 0, 'WITHSCORES')
+  local in_flight = tonumber(redis.call('GET', ARGV[2] .. owner) or '0')
+  if #head > 0 and in_flight < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], head[2], owner)
+  else
+    redis.call('ZREM', KEYS[1], owner)
+  end
+end
+"""
+
+# ARGV[4..6]: owner, email id, score
+_ENQUEUE_SCRIPT = _REFILE + """
+redis.call('ZADD', ARGV[1] .. ARGV[4], 'LT', ARGV[6], ARGV[5])
+refile(ARGV[4])
+"""
+
+# ARGV[4]: in-flight TTL. A ready tenant that turns out to be capped or empty
+# (an expired counter, a lowered cap) is re-filed and the scan moves on, so
+# it ends after at most one step per tenant.
+_CLAIM_SCRIPT = _REFILE + """
+while true do
+  local top = redis.call('ZRANGE', KEYS[1], 0, 0)
+  if #top == 0 then
+    return false
+  end
+  local owner = top[1]
+  local in_flight = ARGV[2] .. owner
+  if tonumber(redis.call('GET', in_flight) or '0') < tonumber(ARGV[3]) then
+    local head = redis.call('ZPOPMIN', ARGV[1] .. owner)
+    if #head > 0 then
+      redis.call('INCR', in_flight)
+      redis.call('EXPIRE', in_flight, tonumber(ARGV[4]))
+      refile(owner)
+      return {head[1], owner}
+    end
+  end
+  redis.call('ZREM', KEYS[1], owner)
+end
+"""
+
+# ARGV[4]: owner
+_RELEASE_SCRIPT = _REFILE + """
+local in_flight = ARGV[2] .. ARGV[4]
+if redis.call('DECR', in_flight) <= 0 then
+  redis.call('DEL', in_flight)
+end
+refile(ARGV[4])
+"""
+
+
+def _run(script: str, *args):
+    return get_redis().eval(
+        script,
+        1,
+        READY_KEY,
+        QUEUE_PREFIX,
+        IN_FLIGHT_PREFIX,
+        settings.draft_tenant_max_in_flight,
+        *args,
+    )
+
+
+def is_vip(from_address: str, vip_senders: list[str] | None) -> bool:
+    """Match a sender against VIP entries: full addresses or '@domain' suffixes."""
+    address = (from_address or "").lower()
+    for entry in vip_senders or []:
+        entry = entry.strip().lower()
+        if entry and (address == entry or (entry.startswith("@") and address.endswith(entry))):
+            return True
+    return False
+
+
+def priority_score(
+    urgency: str | None,
+    from_address: str,
+    received_at: datetime | None,
+    vip_senders: list[str] | None,
+    now: datetime | None = None,
+) -> float:
+    """Score for the sorted set — lower is drafted sooner."""
+    now = now or datetime.now(timezone.utc)
+    # Mail without a date, or dated in the future, counts as received now
+    received_at = min(received_at, now) if received_at else now
+    boost = URGENCY_BOOST_SECONDS.get(urgency or "medium", URGENCY_BOOST_SECONDS["medium"])
+    if is_vip(from_address, vip_senders):
+        boost += VIP_BOOST_SECONDS
+    if (now - received_at).total_seconds() < FRESH_WINDOW_SECONDS:
+        boost += FRESH_BOOST_SECONDS
+    return received_at.timestamp() - boost
+
+
+def enqueue(email_id: str, user_id: str, score: float) -> None:
+    """Add an email to its tenant's queue; re-queueing keeps the better of the two scores."""
+    _run(_ENQUEUE_SCRIPT, user_id, email_id, score)
+
+
+def claim_next() -> tuple[str, str] | None:
+    """
+    Take the best-scored email of any tenant under the in-flight cap.
+
+    Returns (email_id, user_id), or None if nothing is claimable right now.
+    """
+    claimed = _run(_CLAIM_SCRIPT, _IN_FLIGHT_TTL_SECONDS)
+    if not claimed:
+        return None
+    return claimed[0], claimed[1]
+
+
+def release(user_id: str) -> None:
+    """Mark one of the tenant's drafts as finished, making its queue claimable again."""
+    _run(_RELEASE_SCRIPT, user_id)
+
+
+def ready_count() -> int:
+    """Number of tenants with an email that can be claimed right now."""
+    return get_redis().zcard(READY_KEY)
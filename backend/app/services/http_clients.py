@@ -0,0 +1,42 @@
+"""Shared httpx clients for Ollama and the mail provider APIs.
+
+One client (and connection pool) per process and event loop, so repeated
+calls reuse keep-alive connections instead of opening a new one each time.
+"""
+
+import asyncio
+
+import httpx
+
+# Generation can be slow on large models
+OLLAMA_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+MAIL_TIMEOUT = httpx.Timeout(30.0)
+
+_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+
+def _get_client(name: str, timeout: httpx.Timeout) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    entry = _clients.get(name)
+    # A client is bound to the loop it was created on; replace it if that
+    # loop is gone (e.g. a one-off asyncio.run in a script)
+    if entry is None or entry[0] is not loop or entry[1].is_closed:
+        _clients[name] = (loop, httpx.AsyncClient(timeout=timeout))
+    return _clients[name][1]
+
+
+def ollama_client() -> httpx.AsyncClient:
+    return _get_client("ollama", OLLAMA_TIMEOUT)
+
+
+def mail_client() -> httpx.AsyncClient:
+    return _get_client("mail", MAIL_TIMEOUT)
+
+
+async def close_clients() -> None:
+    """Close every client that belongs to the running loop."""
+    loop = asyncio.get_running_loop()
+    for name, (client_loop, client) in list(_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+            del _clients[name]
@@ -0,0 +1,96 @@
+"""Inbox listing — keyset pagination over (received_at, id)."""
+
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import Row, and_, exists, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ai_suggestion import AiSuggestion
+from app.models.email_message import EmailMessage
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+def _received_at(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _after(cursor: str):
+    """
+    Condition for rows after the cursor in (received_at DESC, id DESC) order.
+
+    Postgres sorts NULLs first in descending order, so emails without a
+    received_at come before all dated ones.
+    """
+    received_at, email_id = decode_cursor(cursor, _received_at, UUID)
+    if received_at is None:
+        return or_(
+            and_(EmailMessage.received_at.is_(None), EmailMessage.id < email_id),
+            EmailMessage.received_at.isnot(None),
+        )
+    # Row comparison, so the (account_id, ..., received_at, id) indexes apply
+    return tuple_(EmailMessage.received_at, EmailMessage.id) < tuple_(received_at, email_id)
+
+
+# Only what the inbox list renders; bodies are left to the detail view
+LIST_COLUMNS = (
+    EmailMessage.id,
+    EmailMessage.from_address,
+    EmailMessage.from_name,
+    EmailMessage.subject,
+    EmailMessage.received_at,
+    EmailMessage.is_read,
+    EmailMessage.is_replied,
+    EmailMessage.category,
+    EmailMessage.urgency,
+    EmailMessage.topic,
+)
+
+
+def has_suggestion():
+    """EXISTS flag for whether an email has any reply suggestion."""
+    return (
+        exists()
+        .where(AiSuggestion.email_id == EmailMessage.id)
+        .correlate(EmailMessage)
+        .label("has_suggestion")
+    )
+
+
+async def list_page(
+    db: AsyncSession,
+    account_ids: list[UUID],
+    category: str | None = None,
+    urgency: str | None = None,
+    is_read: bool | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> tuple[list[Row], str | None]:
+    """
+    Return one page of slim email rows (the list columns plus a
+    has_suggestion flag), newest first, and the cursor for the next page
+    (None on the last page).
+
+    Each page costs the same however deep it is: the query seeks straight to
+    the cursor through the composite indexes instead of skipping rows.
+    """
+    stmt = (
+        select(*LIST_COLUMNS, has_suggestion())
+        .where(EmailMessage.account_id.in_(account_ids))
+        .order_by(EmailMessage.received_at.desc(), EmailMessage.id.desc())
+        .limit(limit + 1)
+    )
+    if category:
+        stmt = stmt.where(EmailMessage.category == category)
+    if urgency:
+        stmt = stmt.where(EmailMessage.urgency == urgency)
+    if is_read is not None:
+        stmt = stmt.where(EmailMessage.is_read == is_read)
+    if cursor:
+        stmt = stmt.where(_after(cursor))
+
+    emails = list((await db.execute(stmt)).all())
+    if len(emails) <= limit:
+        return emails, None
+    last = emails[limit - 1]
+    return emails[:limit], encode_cursor(last.received_at, last.id)
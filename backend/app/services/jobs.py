@@ -0,0 +1,222 @@
+"""Durable per-email job table — claims, completion, retries and dead letters."""
+
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.dead_letter_job import DeadLetterJob
+from app.models.email_job import EmailJob
+from app.services.circuit_breaker import CircuitOpenError, is_service_failure
+
+logger = logging.getLogger(__name__)
+
+
+def _claimable(now: datetime):
+    """Pending jobs past their retry time, or running jobs whose lease ran out."""
+    return or_(
+        and_(
+            EmailJob.status == "pending",
+            or_(EmailJob.locked_until.is_(None), EmailJob.locked_until <= now),
+        ),
+        and_(EmailJob.status == "running", EmailJob.locked_until <= now),
+    )
+
+
+async def create_jobs(
+    email_ids: list[UUID], stage: str, db: AsyncSession, reset: bool = False
+) -> None:
+    """
+    Create a pending job per email for `stage`, skipping any that exist.
+
+    With reset=True, existing jobs that are not running (done or dead) are
+    put back to pending with a fresh set of attempts instead, for work a
+    user explicitly asked to redo.
+
+    Runs inside the caller's transaction, so the jobs commit together with
+    the rows that caused them.
+    """
+    if not email_ids:
+        return
+    stmt = pg_insert(EmailJob).values(
+        [{"email_id": email_id, "stage": stage} for email_id in email_ids]
+    )
+    if reset:
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_email_jobs_email_stage",
+            set_={"status": "pending", "attempts": 0, "locked_until": None},
+            where=EmailJob.status != "running",
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(constraint="uq_email_jobs_email_stage")
+    await db.execute(stmt)
+
+
+async def claim_jobs(
+    stage: str, db: AsyncSession, email_ids: list[UUID] | None = None, limit: int = 50
+) -> dict[UUID, UUID]:
+    """
+    Claim up to `limit` claimable jobs for `stage` and commit the claim.
+
+    The candidate rows are locked with FOR UPDATE SKIP LOCKED, so workers
+    claiming at the same time never get the same job. A claimed job is
+    leased for job_lease_seconds; if its worker dies, the lease runs out and
+    the job can be claimed again.
+
+    Returns a mapping of email ID to job ID.
+    """
+    now = datetime.now(timezone.utc)
+    candidates = (
+        select(EmailJob.id)
+        .where(EmailJob.stage == stage, _claimable(now))
+        .order_by(EmailJob.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if email_ids is not None:
+        candidates = candidates.where(EmailJob.email_id.in_(email_ids))
+
+    result = await db.execute(
+        update(EmailJob)
+        .where(EmailJob.id.in_(candidates.scalar_subquery()))
+        .values(
+            status="running",
+            attempts=EmailJob.attempts + 1,
+            locked_until=now + timedelta(seconds=settings.job_lease_seconds),
+        )
+        .returning(EmailJob.email_id, EmailJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = {email_id: job_id for email_id, job_id in result.all()}
+    await db.commit()
+    return claimed
+
+
+async def complete_job(job_id: UUID, db: AsyncSession) -> None:
+    """Mark a job done. Call before the commit that stores the job's result."""
+    await db.execute(
+        update(EmailJob)
+        .where(EmailJob.id == job_id)
+        .values(status="done", locked_until=None, last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def is_transient(exc: BaseException) -> bool:
+    """
+    Whether a failure is worth retrying: the Ollama or ChromaDB service was
+    unreachable, timed out, answered 429/5xx or has its circuit open.
+    Anything else — bad input, a bug, a 4xx — would fail the same way again.
+    """
+    return isinstance(exc, CircuitOpenError) or is_service_failure(exc)
+
+
+def _retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at job_retry_max_seconds."""
+    base = settings.job_retry_base_seconds
+    delay = base * 2 ** (attempts - 1) + random.uniform(0, base)
+    return min(delay, settings.job_retry_max_seconds)
+
+
+async def fail_job(job_id: UUID, exc: BaseException, db: AsyncSession) -> None:
+    """
+    Record a failed attempt and commit.
+
+    A transient failure puts the job back to pending, not claimable until
+    its backoff has passed. A permanent failure, or a transient one on the
+    last of job_max_attempts, moves the job to dead and records why in the
+    dead-letter table.
+    """
+    job = await db.get(EmailJob, job_id)
+    if job is None:
+        return
+    transient = is_transient(exc)
+    reason = f"{type(exc).__name__}: {exc}"[:2000]
+    job.last_error = reason
+
+    if transient and job.attempts < settings.job_max_attempts:
+        job.status = "pending"
+        job.locked_until = datetime.now(timezone.utc) + timedelta(
+            seconds=_retry_delay(job.attempts)
+        )
+    else:
+        job.status = "dead"
+        job.locked_until = None
+        db.add(
+            DeadLetterJob(
+                job_id=job.id,
+                error_kind="transient" if transient else "permanent",
+                reason=reason,
+                attempts=job.attempts,
+            )
+        )
+        logger.warning(
+            "Job %s (%s for email %s) dead after %d attempts: %s",
+            job.id, job.stage, job.email_id, job.attempts, reason,
+        )
+    await db.commit()
+
+
+async def list_dead_jobs(
+    db: AsyncSession, stage: str | None = None, limit: int = 50
+) -> list[DeadLetterJob]:
+    """Return dead-lettered jobs, newest first."""
+    stmt = select(DeadLetterJob).order_by(DeadLetterJob.created_at.desc()).limit(limit)
+    if stage:
+        stmt = stmt.join(EmailJob, EmailJob.id == DeadLetterJob.job_id).where(EmailJob.stage == stage)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def requeue_dead_job(dead_id: UUID, db: AsyncSession) -> EmailJob | None:
+    """
+    Give a dead job a fresh set of attempts and drop its dead-letter entry.
+
+    The caller dispatches the job afterwards. Returns the job, or None if
+    there is no such dead-letter entry.
+    """
+    dead = await db.get(DeadLetterJob, dead_id)
+    if dead is None:
+        return None
+    job = dead.job
+    job.status = "pending"
+    job.attempts = 0
+    job.locked_until = None
+    await db.delete(dead)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def recover_stale_jobs(db: AsyncSession) -> dict[str, list[UUID]]:
+    """
+    Reset jobs whose wake-up was lost and return their email IDs by stage.
+
+    Covers running jobs whose lease expired (the worker died mid-job) and
+    pending jobs that have sat idle for job_recovery_interval_seconds (the
+    queue message was lost, or a failed attempt's backoff has passed). Both
+    go back to pending with a fresh updated_at, so a slow queue is not
+    re-dispatched on every run; the caller re-dispatches them to be claimed.
+    """
+    now = datetime.now(timezone.utc)
+    idle_since = now - timedelta(seconds=settings.job_recovery_interval_seconds)
+    result = await db.execute(
+        update(EmailJob)
+        .where(
+            _claimable(now),
+            or_(EmailJob.status == "running", EmailJob.updated_at < idle_since),
+        )
+        .values(status="pending", updated_at=now)
+        .returning(EmailJob.stage, EmailJob.email_id)
+        .execution_options(synchronize_session=False)
+    )
+    stale: dict[str, list[UUID]] = {}
+    for stage, email_id in result.all():
+        stale.setdefault(stage, []).append(email_id)
+    await db.commit()
+    return stale
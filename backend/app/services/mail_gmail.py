@@ -1,8 +1,11 @@
 """Gmail API client using raw REST API via httpx."""
 
+import asyncio
 import base64
+import json
 import logging
 import re
+import uuid
 from datetime import datetime, timezone
 from email.mime.text import MIMEText
 from email.utils import parseaddr, parsedate_to_datetime
@@ -10,12 +13,26 @@ from email.utils import parseaddr, parsedate_to_datetime
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models.mail_account import MailAccount
+from app.services.http_clients import mail_client
+from app.services.rate_limit import TokenBucket, get_bucket, request_with_retry
 from app.services.token_manager import get_valid_token
 
 logger = logging.getLogger(__name__)
 
 GMAIL_API = "https://gmail.googleapis.com/gmail/v1/users/me"
+GMAIL_BATCH_API = "https://gmail.googleapis.com/batch/gmail/v1"
+
+# Gmail accepts at most 100 sub-requests per batch call
+_BATCH_MAX_SIZE = 100
+_BATCH_MAX_ATTEMPTS = 4
+
+# Gmail quota units per call (see "Usage limits" in the Gmail API docs)
+_UNITS_MESSAGES_GET = 5
+_UNITS_MESSAGES_LIST = 5
+_UNITS_HISTORY_LIST = 2
+_UNITS_PROFILE = 1
 
 
 def _get_header(headers: list[dict], name: str) -> str:
@@ -111,6 +128,183 @@ def _parse_message(raw: dict) -> dict:
     }
 
 
+def _build_batch_body(message_ids: list[str], boundary: str) -> str:
+    """Build a multipart/mixed batch body with one messages.get per ID."""
+    parts = []
+    for index, msg_id in enumerate(message_ids):
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <item-{index}>\r\n"
+            "\r\n"
+            f"GET /gmail/v1/users/me/messages/{msg_id}?format=full\r\n"
+            "\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n")
+    return "".join(parts)
+
+
+def _parse_batch_response(content_type: str, body: str) -> dict[int, tuple[int, dict]]:
+    """
+    Split a multipart/mixed batch response into its sub-responses.
+    Returns {request index: (HTTP status, JSON body)}.
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise ValueError(f"Batch response has no boundary: {content_type!r}")
+    boundary = match.group(1)
+
+    responses: dict[int, tuple[int, dict]] = {}
+    for part in body.replace("\r\n", "\n").split(f"--{boundary}"):
+        part = part.strip()
+        if not part or part == "--":
+            continue
+
+        outer_headers, _, http_response = part.partition("\n\n")
+        id_match = re.search(
+            r"content-id:\s*<response-item-(\d+)>", outer_headers, re.IGNORECASE
+        )
+        if not id_match:
+            continue
+
+        status_line, _, rest = http_response.partition("\n")
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            continue
+        _, _, payload = rest.partition("\n\n")
+        try:
+            data = json.loads(payload) if payload.strip() else {}
+        except json.JSONDecodeError:
+            data = {}
+        responses[int(id_match.group(1))] = (status, data)
+
+    return responses
+
+
+async def _fetch_batch(
+    client: httpx.AsyncClient,
+    headers: dict,
+    message_ids: list[str],
+    bucket: TokenBucket,
+) -> list[dict]:
+    """
+    Fetch up to _batch_size() messages in one batch call.
+
+    404 sub-responses (message deleted between list and get) are skipped.
+    429/5xx sub-responses, and any sub-request missing from the response,
+    are retried in a smaller follow-up batch with exponential backoff.
+    """
+    parsed: dict[str, dict] = {}
+    pending = list(message_ids)
+
+    for attempt in range(_BATCH_MAX_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(2 ** (attempt - 1))
+
+        boundary = f"batch_{uuid.uuid4().hex}"
+        resp = await request_with_retry(
+            client,
+            "POST",
+            GMAIL_BATCH_API,
+            bucket,
+            cost=_UNITS_MESSAGES_GET * len(pending),
+            headers={**headers, "Content-Type": f"multipart/mixed; boundary={boundary}"},
+            content=_build_batch_body(pending, boundary),
+        )
+        resp.raise_for_status()
+        responses = _parse_batch_response(resp.headers.get("content-type", ""), resp.text)
+
+        retry: list[str] = []
+        for index, msg_id in enumerate(pending):
+            status, data = responses.get(index, (None, {}))
+            if status == 200:
+                parsed[msg_id] = _parse_message(data)
+            elif status == 404:
+                continue
+            elif status is None or status == 429 or status >= 500:
+                retry.append(msg_id)
+            else:
+                raise RuntimeError(
+                    f"Gmail batch get for message {msg_id} failed with status {status}"
+                )
+
+        pending = retry
+        if not pending:
+            break
+    else:
+        raise RuntimeError(
+            f"Gmail batch get gave up on {len(pending)} messages after "
+            f"{_BATCH_MAX_ATTEMPTS} attempts"
+        )
+
+    # Preserve the listing order
+    return [parsed[msg_id] for msg_id in message_ids if msg_id in parsed]
+
+
+async def _fetch_concurrent(
+    client: httpx.AsyncClient,
+    headers: dict,
+    message_ids: list[str],
+    bucket: TokenBucket,
+) -> list[dict]:
+    """
+    Fetch messages with individual GETs issued concurrently, bounded by
+    settings.gmail_fetch_concurrency and paced by the account's bucket.
+    """
+    semaphore = asyncio.Semaphore(settings.gmail_fetch_concurrency)
+
+    async def _fetch_one(msg_id: str) -> dict | None:
+        async with semaphore:
+            resp = await request_with_retry(
+                client,
+                "GET",
+                f"{GMAIL_API}/messages/{msg_id}",
+                bucket,
+                cost=_UNITS_MESSAGES_GET,
+                headers=headers,
+                params={"format": "full"},
+            )
+        if resp.status_code == 404:
+            return None  # message deleted between list and get
+        resp.raise_for_status()
+        return _parse_message(resp.json())
+
+    fetched = await asyncio.gather(*(_fetch_one(msg_id) for msg_id in message_ids))
+    return [msg for msg in fetched if msg is not None]
+
+
+def _batch_size() -> int:
+    """
+    Messages per batch call: as many as one second of the account's quota
+    pays for (250 units / 5 per get = 50), so a batch never has to wait on
+    the bucket or trip Gmail's per-second limit.
+    """
+    per_second = int(settings.gmail_quota_units_per_second // _UNITS_MESSAGES_GET)
+    return max(1, min(_BATCH_MAX_SIZE, per_second))
+
+
+async def _fetch_full_messages(
+    client: httpx.AsyncClient,
+    headers: dict,
+    message_ids: list[str],
+    bucket: TokenBucket,
+) -> list[dict]:
+    """Fetch and parse full messages using the configured fetch mode."""
+    if settings.gmail_fetch_mode == "concurrent":
+        return await _fetch_concurrent(client, headers, message_ids, bucket)
+
+    results: list[dict] = []
+    batch_size = _batch_size()
+    for start in range(0, len(message_ids), batch_size):
+        results.extend(
+            await _fetch_batch(
+                client, headers, message_ids[start : start + batch_size], bucket
+            )
+        )
+    return results
+
+
 async def fetch_messages(
     account: MailAccount, db: AsyncSession
 ) -> list[dict]:
@@ -119,95 +313,96 @@ async def fetch_messages(
 
     The sync_cursor stores the latest historyId. On the first sync (no cursor),
     we fetch the most recent 50 messages. On subsequent syncs we use the
-    history.list endpoint to get only new message IDs, then fetch each.
+    history.list endpoint to get only new message IDs. Full messages are
+    fetched through the batch endpoint (up to 100 per round-trip) or, with
+    gmail_fetch_mode="concurrent", as parallel GETs. Either way calls are
+    paced by the account's quota bucket and throttling is retried.
 
     Returns a list of parsed message dicts.
     """
     token = await get_valid_token(account, db)
     headers = {"Authorization": f"Bearer {token}"}
+    bucket = get_bucket("gmail", str(account.id))
     results: list[dict] = []
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-
-        if account.sync_cursor:
-            # ----- Incremental sync via history ----- #
-            message_ids: list[str] = []
-            next_page: str | None = None
-
-            while True:
-                params: dict = {
-                    "startHistoryId": account.sync_cursor,
-                    "historyTypes": "messageAdded",
-                }
-                if next_page:
-                    params["pageToken"] = next_page
-
-                resp = await client.get(
-                    f"{GMAIL_API}/history", headers=headers, params=params
-                )
-                if resp.status_code == 404:
-                    # historyId expired — fall back to full sync
-                    account.sync_cursor = None
-                    return await fetch_messages(account, db)
-                resp.raise_for_status()
-                data = resp.json()
-
-                for record in data.get("history", []):
-                    for added in record.get("messagesAdded", []):
-                        msg_id = added.get("message", {}).get("id")
-                        if msg_id and msg_id not in message_ids:
-                            message_ids.append(msg_id)
-
-                next_page = data.get("nextPageToken")
-                if not next_page:
-                    # Update cursor to the latest historyId
-                    new_history_id = data.get("historyId")
-                    if new_history_id:
-                        account.sync_cursor = str(new_history_id)
-                    break
-
-            # Fetch full message details for each new ID
-            for msg_id in message_ids:
-                resp = await client.get(
-                    f"{GMAIL_API}/messages/{msg_id}",
-                    headers=headers,
-                    params={"format": "full"},
-                )
-                if resp.status_code == 404:
-                    continue  # message deleted between list and get
-                resp.raise_for_status()
-                results.append(_parse_message(resp.json()))
-
-        else:
-            # ----- Initial full sync — most recent 50 ----- #
-            resp = await client.get(
-                f"{GMAIL_API}/messages",
+    client = mail_client()
+
+    if account.sync_cursor:
+        # ----- Incremental sync via history ----- #
+        message_ids: list[str] = []
+        next_page: str | None = None
+
+        while True:
+            params: dict = {
+                "startHistoryId": account.sync_cursor,
+                "historyTypes": "messageAdded",
+            }
+            if next_page:
+                params["pageToken"] = next_page
+
+            resp = await request_with_retry(
+                client,
+                "GET",
+                f"{GMAIL_API}/history",
+                bucket,
+                cost=_UNITS_HISTORY_LIST,
                 headers=headers,
-                params={"maxResults": 50, "labelIds": "INBOX"},
+                params=params,
             )
+            if resp.status_code == 404:
+                # historyId expired — fall back to full sync
+                account.sync_cursor = None
+                return await fetch_messages(account, db)
             resp.raise_for_status()
-            listing = resp.json()
-            message_stubs = listing.get("messages", [])
-
-            for stub in message_stubs:
-                msg_id = stub["id"]
-                resp = await client.get(
-                    f"{GMAIL_API}/messages/{msg_id}",
-                    headers=headers,
-                    params={"format": "full"},
-                )
-                if resp.status_code == 404:
-                    continue
-                resp.raise_for_status()
-                msg_data = resp.json()
-                results.append(_parse_message(msg_data))
-
-            # Set cursor to the profile's current historyId
-            profile_resp = await client.get(
-                f"{GMAIL_API}/profile", headers=headers
-            )
-            profile_resp.raise_for_status()
-            account.sync_cursor = str(profile_resp.json().get("historyId", ""))
+            data = resp.json()
+
+            for record in data.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    msg_id = added.get("message", {}).get("id")
+                    if msg_id and msg_id not in message_ids:
+                        message_ids.append(msg_id)
+
+            next_page = data.get("nextPageToken")
+            if not next_page:
+                # Update cursor to the latest historyId
+                new_history_id = data.get("historyId")
+                if new_history_id:
+                    account.sync_cursor = str(new_history_id)
+                break
+
+        # Fetch full message details for the new IDs in batches
+        results = await _fetch_full_messages(client, headers, message_ids, bucket)
+
+    else:
+        # ----- Initial full sync — most recent 50 ----- #
+        resp = await request_with_retry(
+            client,
+            "GET",
+            f"{GMAIL_API}/messages",
+            bucket,
+            cost=_UNITS_MESSAGES_LIST,
+            headers=headers,
+            params={"maxResults": 50, "labelIds": "INBOX"},
+        )
+        resp.raise_for_status()
+        listing = resp.json()
+        message_stubs = listing.get("messages", [])
+
+        results = await _fetch_full_messages(
+            client, headers, [stub["id"] for stub in message_stubs], bucket
+        )
+
+        # Set cursor to the profile's current historyId
+        profile_resp = await request_with_retry(
+            client,
+            "GET",
+            f"{GMAIL_API}/profile",
+            bucket,
+            cost=_UNITS_PROFILE,
+            headers=headers,
+        )
+        profile_resp.raise_for_status()
+        account.sync_cursor = str(profile_resp.json().get("historyId", ""))
 
     await db.commit()
     logger.info(
@@ -218,6 +413,35 @@ async def fetch_messages(
     return results
 
 
+async def watch_mailbox(account: MailAccount, db: AsyncSession) -> datetime:
+    """
+    Start (or renew) Gmail push notifications for the account's INBOX.
+
+    Gmail publishes to settings.gmail_pubsub_topic whenever the mailbox
+    changes. A watch lasts 7 days and Google recommends renewing it daily;
+    calling users.watch again simply extends it.
+
+    Returns the watch expiration time.
+    """
+    token = await get_valid_token(account, db)
+    client = mail_client()
+    resp = await client.post(
+        f"{GMAIL_API}/watch",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "topicName": settings.gmail_pubsub_topic,
+            "labelIds": ["INBOX"],
+            "labelFilterBehavior": "INCLUDE",
+        },
+    )
+    resp.raise_for_status()
+    data = resp.json()
+
+    expires_at = datetime.fromtimestamp(int(data["expiration"]) / 1000, tz=timezone.utc)
+    logger.info("Gmail watch active for %s until %s", account.email_address, expires_at)
+    return expires_at
+
+
 async def send_reply(
     account: MailAccount,
     db: AsyncSession,
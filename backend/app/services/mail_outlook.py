@@ -1,18 +1,27 @@
 """Microsoft Graph API mail client using httpx."""
 
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models.mail_account import MailAccount
+from app.services.http_clients import mail_client
+from app.services.rate_limit import TokenBucket, get_bucket, request_with_retry
 from app.services.token_manager import get_valid_token
 
 logger = logging.getLogger(__name__)
 
 GRAPH_API = "https://graph.microsoft.com/v1.0"
 
+_SELECT_FIELDS = "id,conversationId,from,toRecipients,subject,body,receivedDateTime,isRead"
+_DELTA_PAGE_SIZE = 50
+
+# Graph caps mail subscriptions at just under three days
+_SUBSCRIPTION_LIFETIME = timedelta(minutes=4200)
+
 
 def _parse_message(raw: dict) -> dict:
     """Parse a Microsoft Graph message resource into a flat dict."""
@@ -54,73 +63,102 @@ def _parse_message(raw: dict) -> dict:
     }
 
 
-async def fetch_messages(
-    account: MailAccount, db: AsyncSession
-) -> list[dict]:
+def _initial_delta_params(cursor: str | None) -> dict:
     """
-    Fetch new messages from Outlook/Graph API.
-
-    The sync_cursor stores an ISO 8601 timestamp of the most recent message's
-    receivedDateTime. On subsequent syncs we filter for messages received after
-    that timestamp.  On the first sync we fetch the most recent 50 messages.
+    Query params for starting a fresh delta round.
 
-    Returns a list of parsed message dicts.
+    Limited to recent mail so the first round does not page through the whole
+    inbox. A pre-delta cursor (an ISO timestamp) is used as the starting point
+    so no mail is skipped when an account is migrated.
     """
-    token = await get_valid_token(account, db)
-    headers = {"Authorization": f"Bearer {token}"}
-    results: list[dict] = []
-
-    # We request both text and html bodies by preferring text, but Graph
-    # always returns one contentType — we ask for both via $select.
-    select_fields = (
-        "id,conversationId,from,toRecipients,subject,body,"
-        "receivedDateTime,isRead"
-    )
+    since = datetime.now(timezone.utc) - timedelta(days=settings.outlook_initial_sync_days)
+    if cursor:
+        try:
+            since = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+        except ValueError:
+            pass
+    return {
+        "$select": _SELECT_FIELDS,
+        "$filter": f"receivedDateTime ge {since.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+    }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
 
-        params: dict = {
-            "$select": select_fields,
-            "$orderby": "receivedDateTime desc",
-            "$top": 50,
-        }
+async def _fetch_delta(
+    client: httpx.AsyncClient,
+    headers: dict,
+    bucket: TokenBucket,
+    cursor: str | None,
+) -> tuple[list[dict], str]:
+    """
+    Run one delta round and return (parsed messages, new deltaLink).
 
-        if account.sync_cursor:
-            # Incremental: only messages newer than cursor
-            params["$filter"] = (
-                f"receivedDateTime gt {account.sync_cursor}"
-            )
-            params["$orderby"] = "receivedDateTime asc"
+    Follows @odata.nextLink until Graph hands out an @odata.deltaLink.
+    Deleted messages (@removed) are skipped; changed messages come back as
+    full resources and are de-duplicated by the sync orchestrator.
+    """
+    if cursor and cursor.startswith("http"):
+        url: str = cursor
+        params: dict = {}
+    else:
+        url = f"{GRAPH_API}/me/mailFolders/inbox/messages/delta"
+        params = _initial_delta_params(cursor)
 
-        url: str = f"{GRAPH_API}/me/messages"
-        latest_dt: str | None = None
+    results: list[dict] = []
+    while True:
+        resp = await request_with_retry(
+            client, "GET", url, bucket, headers=headers, params=params
+        )
+        if resp.status_code == 410 and not params:
+            # Delta token expired or invalidated — start a fresh round
+            logger.info("Outlook delta token expired — restarting delta sync")
+            url = f"{GRAPH_API}/me/mailFolders/inbox/messages/delta"
+            params = _initial_delta_params(None)
+            results = []
+            continue
+        resp.raise_for_status()
+        data = resp.json()
+
+        for msg in data.get("value", []):
+            if "@removed" in msg:
+                continue
+            results.append(_parse_message(msg))
+
+        delta_link = data.get("@odata.deltaLink")
+        if delta_link:
+            return results, delta_link
+
+        # nextLink already carries the query — clear params on later pages
+        url = data["@odata.nextLink"]
+        params = {}
 
-        while url:
-            resp = await client.get(url, headers=headers, params=params)
-            resp.raise_for_status()
-            data = resp.json()
 
-            for msg in data.get("value", []):
-                parsed = _parse_message(msg)
-                results.append(parsed)
+async def fetch_messages(
+    account: MailAccount, db: AsyncSession
+) -> list[dict]:
+    """
+    Fetch new inbox messages from Outlook via a Graph delta query.
 
-                # Track the latest receivedDateTime for cursor update
-                msg_dt = msg.get("receivedDateTime", "")
-                if msg_dt and (latest_dt is None or msg_dt > latest_dt):
-                    latest_dt = msg_dt
+    The sync_cursor stores the @odata.deltaLink from the previous round, so
+    each sync transfers only messages added or changed since then. Bodies are
+    requested as plain text and pages are capped with odata.maxpagesize.
+    Page requests are paced by the mailbox's Graph bucket, and 429/503
+    responses are retried after Retry-After.
 
-            # Follow @odata.nextLink for pagination
-            url = data.get("@odata.nextLink", "")
-            # Clear params on subsequent pages — nextLink contains them
-            params = {}
+    Returns a list of parsed message dicts.
+    """
+    token = await get_valid_token(account, db)
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Prefer": f'odata.maxpagesize={_DELTA_PAGE_SIZE}, outlook.body-content-type="text"',
+    }
+    bucket = get_bucket("outlook", str(account.id))
 
-        # Update sync cursor to the latest message timestamp
-        if latest_dt:
-            account.sync_cursor = latest_dt
-        elif not account.sync_cursor and results:
-            # First sync — set cursor to now so next sync only gets new mail
-            account.sync_cursor = datetime.now(timezone.utc).isoformat()
+    client = mail_client()
+    results, delta_link = await _fetch_delta(
+        client, headers, bucket, account.sync_cursor
+    )
 
+    account.sync_cursor = delta_link
     await db.commit()
     logger.info(
         "Outlook fetch complete for %s — %d new messages",
@@ -130,6 +168,53 @@ async def fetch_messages(
     return results
 
 
+async def subscribe_mailbox(
+    account: MailAccount, db: AsyncSession
+) -> tuple[str, datetime]:
+    """
+    Create or renew a Graph change-notification subscription for new inbox mail.
+
+    An existing subscription (account.push_subscription_id) is extended with
+    PATCH; if Graph no longer knows it, a new one is created. Notifications
+    carry settings.outlook_client_state so the webhook can verify them.
+
+    Returns (subscription id, expiration time).
+    """
+    token = await get_valid_token(account, db)
+    headers = {"Authorization": f"Bearer {token}"}
+    expires_at = datetime.now(timezone.utc) + _SUBSCRIPTION_LIFETIME
+    expiration = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    client = mail_client()
+    if account.push_subscription_id:
+        resp = await client.patch(
+            f"{GRAPH_API}/subscriptions/{account.push_subscription_id}",
+            headers=headers,
+            json={"expirationDateTime": expiration},
+        )
+        if resp.is_success:
+            return account.push_subscription_id, expires_at
+        if resp.status_code != 404:
+            resp.raise_for_status()
+
+    resp = await client.post(
+        f"{GRAPH_API}/subscriptions",
+        headers=headers,
+        json={
+            "changeType": "created",
+            "notificationUrl": settings.outlook_notification_url,
+            "resource": "me/mailFolders('inbox')/messages",
+            "expirationDateTime": expiration,
+            "clientState": settings.outlook_client_state,
+        },
+    )
+    resp.raise_for_status()
+    data = resp.json()
+
+    logger.info("Graph subscription created for %s until %s", account.email_address, expiration)
+    return data["id"], expires_at
+
+
 async def send_reply(
     account: MailAccount,
     db: AsyncSession,
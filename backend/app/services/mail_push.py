@@ -0,0 +1,68 @@
+"""Push subscriptions — keeps Gmail watches and Graph subscriptions alive."""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.mail_account import MailAccount
+from app.services import mail_gmail, mail_outlook
+
+logger = logging.getLogger(__name__)
+
+
+def push_enabled(provider: str) -> bool:
+    """Whether push is configured for the provider in this deployment."""
+    if provider == "gmail":
+        return bool(settings.gmail_pubsub_topic)
+    if provider == "outlook":
+        return bool(settings.outlook_notification_url)
+    return False
+
+
+async def renew_subscription(account: MailAccount, db: AsyncSession) -> None:
+    """Create or extend the push subscription for one account."""
+    if account.provider == "gmail":
+        account.push_expires_at = await mail_gmail.watch_mailbox(account, db)
+    elif account.provider == "outlook":
+        subscription_id, expires_at = await mail_outlook.subscribe_mailbox(account, db)
+        account.push_subscription_id = subscription_id
+        account.push_expires_at = expires_at
+    await db.commit()
+
+
+async def renew_expiring_subscriptions(db: AsyncSession) -> int:
+    """
+    Renew every subscription that is missing or expires within the margin.
+
+    Errors on individual accounts are logged; the account keeps being
+    polled at the normal interval until a renewal succeeds.
+
+    Returns the number of subscriptions renewed.
+    """
+    cutoff = datetime.now(timezone.utc) + timedelta(hours=settings.push_renewal_margin_hours)
+    result = await db.execute(
+        select(MailAccount.id).where(
+            MailAccount.is_active.is_(True),
+            or_(MailAccount.push_expires_at.is_(None), MailAccount.push_expires_at < cutoff),
+        )
+    )
+    account_ids = [row[0] for row in result.all()]
+
+    renewed = 0
+    for account_id in account_ids:
+        account = await db.get(MailAccount, account_id)
+        if not account or not push_enabled(account.provider):
+            continue
+        try:
+            await renew_subscription(account, db)
+            renewed += 1
+        except Exception:
+            logger.exception("Failed to renew push subscription for account %s", account_id)
+            await db.rollback()
+
+    if renewed:
+        logger.info("Renewed %d push subscriptions", renewed)
+    return renewed
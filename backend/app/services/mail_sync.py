@@ -1,25 +1,37 @@
 """Mail sync orchestrator — pulls new messages and persists them."""
 
 import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+
 from app.models.email_message import EmailMessage
 from app.models.mail_account import MailAccount
-from app.services import mail_gmail, mail_outlook
+from app.services import counters, jobs, mail_gmail, mail_outlook, search, timings
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT statement (17 bind parameters each, well under asyncpg's limit)
+_INSERT_CHUNK_SIZE = 500
+
 
-async def sync_account(account: MailAccount, db: AsyncSession) -> int:
+async def sync_account(account: MailAccount, db: AsyncSession) -> int | None:
     """
     Sync a single mail account.
 
-    Fetches new messages via the provider-specific client, de-duplicates
-    against existing records by provider_id, and persists new messages.
+    Fetches new messages via the provider-specific client and persists them
+    with a bulk INSERT ... ON CONFLICT DO NOTHING, so de-duplication happens
+    in the database and concurrent syncs cannot create duplicates.
 
-    Returns the count of newly saved messages.
+    Returns the count of newly saved messages, or None when the account
+    could not be fetched (unknown provider or a provider error).
     """
     # Select the correct provider module
     if account.provider == "gmail":
@@ -32,7 +44,7 @@ async def sync_account(account: MailAccount, db: AsyncSession) -> int:
             account.provider,
             account.email_address,
         )
-        return 0
+        return None
 
     try:
         messages = await provider.fetch_messages(account, db)
@@ -42,61 +54,67 @@ async def sync_account(account: MailAccount, db: AsyncSession) -> int:
             account.email_address,
             account.provider,
         )
-        return 0
+        # Discard any cursor the provider advanced before failing, so the
+        # next run re-fetches the messages this one never delivered.
+        await db.rollback()
+        return None
 
     if not messages:
         return 0
 
-    # Collect provider_ids to check for duplicates in one query
-    incoming_ids = [m["provider_id"] for m in messages]
-    existing_result = await db.execute(
-        select(EmailMessage.provider_id).where(
-            EmailMessage.account_id == account.id,
-            EmailMessage.provider_id.in_(incoming_ids),
+    # Insert in chunks; the unique constraint on (account_id, provider_id)
+    # de-duplicates, and RETURNING yields the IDs of rows actually inserted.
+    received: list[tuple[UUID, datetime | None]] = []
+    for start in range(0, len(messages), _INSERT_CHUNK_SIZE):
+        rows = [
+            {
+                "account_id": account.id,
+                "provider_id": msg["provider_id"],
+                "thread_id": msg.get("thread_id"),
+                "from_address": msg["from_address"],
+                "from_name": msg.get("from_name", ""),
+                "to_address": msg["to_address"],
+                "subject": msg.get("subject", ""),
+                "body_text": msg.get("body_text", ""),
+                "body_html": msg.get("body_html", ""),
+                "received_at": msg.get("received_at"),
+                "is_read": False,
+                "is_replied": False,
+                "processed": False,
+                "search_vector": search.document(
+                    msg.get("subject", ""),
+                    search.sender_text(msg.get("from_name"), msg["from_address"]),
+                    search.clean_body(msg.get("body_text"), msg.get("body_html")),
+                ),
+            }
+            for msg in messages[start : start + _INSERT_CHUNK_SIZE]
+        ]
+        result = await db.execute(
+            pg_insert(EmailMessage)
+            .values(rows)
+            .on_conflict_do_nothing(constraint="uq_email_messages_account_provider")
+            .returning(EmailMessage.id, EmailMessage.received_at)
         )
-    )
-    existing_ids: set[str] = {row[0] for row in existing_result.all()}
-
-    new_count = 0
-    for msg in messages:
-        if msg["provider_id"] in existing_ids:
-            continue
-
-        email = EmailMessage(
-            account_id=account.id,
-            provider_id=msg["provider_id"],
-            thread_id=msg.get("thread_id"),
-            from_address=msg["from_address"],
-            from_name=msg.get("from_name", ""),
-            to_address=msg["to_address"],
-            subject=msg.get("subject", ""),
-            body_text=msg.get("body_text", ""),
-            body_html=msg.get("body_html", ""),
-            received_at=msg.get("received_at"),
-            is_read=False,
-            is_replied=False,
-            processed=False,
-        )
-        db.add(email)
-        new_count += 1
-
-    if new_count:
-        await db.commit()
-
-        # Trigger AI processing for each new email
-        from app.tasks.worker import process_single_email
-        for msg in messages:
-            if msg["provider_id"] not in existing_ids:
-                # Find the email we just saved
-                saved = await db.execute(
-                    select(EmailMessage).where(
-                        EmailMessage.account_id == account.id,
-                        EmailMessage.provider_id == msg["provider_id"],
-                    )
-                )
-                saved_email = saved.scalar_one_or_none()
-                if saved_email:
-                    process_single_email.delay(str(saved_email.id))
+        inserted = [(row[0], row[1]) for row in result.all()]
+
+        # The classify jobs commit with the emails, so a lost dispatch below
+        # is picked up by job recovery instead of leaving them unprocessed
+        await jobs.create_jobs([email_id for email_id, _ in inserted], "classify", db)
+        await jobs.create_jobs([email_id for email_id, _ in inserted], "embed", db)
+        await timings.record_ingest(account.user_id, inserted, db)
+        ingest_counts = Counter({"total": len(inserted), "unread": len(inserted)})
+        ingest_counts.update(counters.received_key(r) for _, r in inserted if r)
+        await counters.bump(account.id, ingest_counts, db)
+        received.extend(inserted)
+
+    new_ids = [email_id for email_id, _ in received]
+    await db.commit()
+    new_count = len(new_ids)
+
+    # Trigger AI processing for the new emails in batches
+    if new_ids:
+        from app.tasks.worker import dispatch_processing
+        dispatch_processing([str(email_id) for email_id in new_ids])
 
     logger.info(
         "Synced %s — %d new / %d fetched / %d duplicates skipped",
@@ -108,30 +126,51 @@ async def sync_account(account: MailAccount, db: AsyncSession) -> int:
     return new_count
 
 
-async def sync_all_accounts(db: AsyncSession) -> None:
+async def sync_account_by_id(account_id: UUID, db: AsyncSession) -> int:
     """
-    Sync every active mail account.
+    Sync one account by ID and record when the sync ran and how long it took.
+
+    Used by the per-account Celery task, which holds the account's sync lock
+    while this runs. Inactive or deleted accounts are skipped. A failed fetch
+    leaves last_synced_at untouched, so the account stays due for a poll.
 
-    Iterates through all active MailAccount rows and syncs each one
-    sequentially. Errors on individual accounts are logged but do not
-    stop the overall sync run.
+    Returns the count of newly saved messages.
     """
-    result = await db.execute(
-        select(MailAccount).where(MailAccount.is_active.is_(True))
-    )
-    accounts = result.scalars().all()
+    account = await db.get(MailAccount, account_id)
+    if not account or not account.is_active:
+        logger.debug("Account %s is gone or inactive — skipping", account_id)
+        return 0
 
-    if not accounts:
-        logger.debug("No active mail accounts to sync")
-        return
+    started = time.monotonic()
+    new_count = await sync_account(account, db)
+    if new_count is None:
+        return 0
 
-    total_new = 0
-    for account in accounts:
-        count = await sync_account(account, db)
-        total_new += count
+    account.last_synced_at = datetime.now(timezone.utc)
+    account.last_sync_duration_ms = int((time.monotonic() - started) * 1000)
+    await db.commit()
+    return new_count
 
-    logger.info(
-        "Sync run complete — %d accounts, %d new messages total",
-        len(accounts),
-        total_new,
+
+async def get_accounts_due_for_poll(db: AsyncSession) -> list[UUID]:
+    """
+    Return the IDs of active accounts the periodic poll should sync.
+
+    Accounts with a live push subscription are synced by their webhook, so
+    they are only polled as a safety net once they have gone
+    mail_poll_fallback_interval_seconds without a sync.
+    """
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.mail_poll_fallback_interval_seconds)
+    result = await db.execute(
+        select(MailAccount.id).where(
+            MailAccount.is_active.is_(True),
+            or_(
+                MailAccount.push_expires_at.is_(None),
+                MailAccount.push_expires_at <= now,
+                MailAccount.last_synced_at.is_(None),
+                MailAccount.last_synced_at < stale,
+            ),
+        )
     )
+    return [row[0] for row in result.all()]
@@ -0,0 +1,317 @@
+"""AI processing pipeline — classifies new emails and drafts reply suggestions."""
+
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.ai_suggestion import AiSuggestion
+from app.models.email_message import EmailMessage
+from app.models.mail_account import MailAccount
+from app.models.user import User
+from app.services import counters, draft_queue, jobs, timings
+from app.services.ai_engine import classify_email, classify_emails_batch, generate_reply
+from app.services.search import embedding_text
+from app.services.vector_store import add_email
+
+logger = logging.getLogger(__name__)
+
+
+async def _load_with_owners(
+    email_ids: list[UUID], db: AsyncSession, *conditions
+) -> list[tuple[EmailMessage, User]]:
+    """Load emails together with their owning user in one query."""
+    result = await db.execute(
+        select(EmailMessage, User)
+        .join(MailAccount, MailAccount.id == EmailMessage.account_id)
+        .join(User, User.id == MailAccount.user_id)
+        .where(EmailMessage.id.in_(email_ids), *conditions)
+        .order_by(EmailMessage.received_at)
+    )
+    return [(email, user) for email, user in result.all()]
+
+
+async def classify(email: EmailMessage, classification: dict | None = None) -> None:
+    """
+    Classify one email in place, using a result from a batch call if given.
+    Spam needs no draft, so it is done here.
+    """
+    if classification is None:
+        classification = await classify_email(
+            email.subject or "", email.body_text or "", raise_errors=True
+        )
+    email.category = classification.get("category")
+    email.urgency = classification.get("urgency")
+    email.topic = classification.get("topic")
+    email.confidence = classification.get("confidence")
+    if email.category == "spam":
+        email.processed = True
+
+
+async def draft(
+    email: EmailMessage, user: User, db: AsyncSession, stage_ms: dict[str, int] | None = None
+) -> None:
+    """Generate a reply suggestion for a classified email."""
+    reply_text = await generate_reply(email, user, db, stage_ms)
+    db.add(AiSuggestion(email_id=email.id, suggested_text=reply_text))
+    await counters.bump(email.account_id, {"pending_suggestions": 1}, db)
+    email.processed = True
+
+
+async def embed(email: EmailMessage, user: User) -> None:
+    """Store an email's embedding (subject and cleaned body) for semantic search."""
+    await add_email(
+        str(email.id),
+        str(user.id),
+        embedding_text(email.subject, email.body_text, email.body_html),
+        {
+            "account_id": str(email.account_id),
+            "received_at": int(email.received_at.timestamp()) if email.received_at else 0,
+        },
+    )
+
+
+async def _claim(
+    email_ids: list[UUID], stage: str, db: AsyncSession, *conditions
+) -> tuple[list[tuple[EmailMessage, User]], dict[UUID, UUID]]:
+    """
+    Claim the `stage` jobs for these emails and load the claimed emails.
+
+    Emails whose job another worker holds (or has finished) are left out.
+    A claimed email that no longer matches `conditions` already has its
+    result, so its job is closed without running the stage again.
+
+    Returns the loaded (email, user) pairs and the email-to-job mapping.
+    """
+    claimed = await jobs.claim_jobs(stage, db, email_ids=email_ids, limit=len(email_ids))
+    if not claimed:
+        return [], {}
+    pairs = await _load_with_owners(list(claimed), db, *conditions)
+    loaded = {email.id for email, _ in pairs}
+    finished = [job_id for email_id, job_id in claimed.items() if email_id not in loaded]
+    for job_id in finished:
+        await jobs.complete_job(job_id, db)
+    if finished:
+        await db.commit()
+    return pairs, claimed
+
+
+async def _run_stage(
+    pairs: list[tuple[EmailMessage, User]], claimed: dict[UUID, UUID], db: AsyncSession, stage
+) -> list[UUID]:
+    """
+    Run `stage(email, user)` over each pair, committing after every email so
+    results show up right away and a failure keeps the work already done.
+
+    Each email's job is marked done in the same commit as its result, so a
+    result is never stored without its job closing, or the other way round.
+    A failure is recorded on the job, which retries or dead-letters it.
+
+    Returns the IDs of the emails that succeeded.
+    """
+    done: list[UUID] = []
+    expired = False
+    for email, user in pairs:
+        if expired:
+            # A rollback expired every loaded object; reload before use
+            await db.refresh(email)
+            await db.refresh(user)
+        email_id = email.id
+        job_id = claimed[email_id]
+        try:
+            await stage(email, user)
+            await jobs.complete_job(job_id, db)
+            await db.commit()
+            done.append(email_id)
+        except Exception as exc:
+            logger.exception("Failed to process email %s", email_id)
+            await db.rollback()
+            await jobs.fail_job(job_id, exc, db)
+            expired = True
+    return done
+
+
+async def _batch_classify(emails: list[EmailMessage]) -> dict[UUID, tuple[dict, int]]:
+    """
+    Classify the short emails of a batch several to a prompt.
+
+    Long emails, and any group that fails outright, are left out of the
+    result and fall back to one call per email in classify().
+
+    Returns each email's classification and its share of the group's
+    classification time in milliseconds.
+    """
+    size = settings.classification_batch_size
+    if size <= 1:
+        return {}
+
+    short = [
+        e for e in emails
+        if len(e.body_text or "") <= settings.classification_batch_body_chars
+    ]
+    results: dict[UUID, tuple[dict, int]] = {}
+    for start in range(0, len(short), size):
+        group = short[start : start + size]
+        if len(group) < 2:
+            continue
+        started = time.monotonic()
+        try:
+            classified = await classify_emails_batch(
+                [(e.subject or "", e.body_text or "") for e in group]
+            )
+        except Exception:
+            logger.exception("Batch classification failed — falling back to single calls")
+            continue
+        share_ms = int((time.monotonic() - started) * 1000 / len(group))
+        results.update({e.id: (c, share_ms) for e, c in zip(group, classified)})
+    return results
+
+
+async def classify_emails(email_ids: list[UUID], db: AsyncSession) -> list[UUID]:
+    """
+    Classify a batch of emails that have not been classified yet and put
+    the ones that need a reply on the draft priority queue. Only emails
+    whose classify job this worker claims are processed.
+
+    Returns the IDs of the emails queued for drafting.
+    """
+    # Ingest already created these; this covers manual re-processing
+    await jobs.create_jobs(email_ids, "classify", db)
+    await db.commit()
+    pairs, claimed = await _claim(
+        email_ids, "classify", db,
+        EmailMessage.category.is_(None), EmailMessage.processed.is_(False),
+    )
+
+    claimed_at = datetime.now(timezone.utc)
+    precomputed = await _batch_classify([email for email, _ in pairs])
+    to_queue: dict[UUID, tuple[str, float]] = {}
+
+    async def _stage(email: EmailMessage, user: User) -> None:
+        started = time.monotonic()
+        classification, batch_ms = precomputed.get(email.id, (None, 0))
+        await classify(email, classification)
+        await counters.bump(
+            email.account_id, dict.fromkeys(counters.classification_keys(email), 1), db
+        )
+        classify_ms = batch_ms + int((time.monotonic() - started) * 1000)
+        await timings.record_classify(email.id, claimed_at, classify_ms, db)
+        if not email.processed:
+            await jobs.create_jobs([email.id], "draft", db)
+            to_queue[email.id] = (
+                str(user.id),
+                draft_queue.priority_score(
+                    email.urgency, email.from_address, email.received_at, user.vip_senders
+                ),
+            )
+
+    queued: list[UUID] = []
+    for email_id in await _run_stage(pairs, claimed, db, _stage):
+        if email_id in to_queue:
+            user_id, score = to_queue[email_id]
+            draft_queue.enqueue(str(email_id), user_id, score)
+            queued.append(email_id)
+    return queued
+
+
+async def draft_replies(email_ids: list[UUID], db: AsyncSession) -> int:
+    """
+    Draft replies for classified emails that are still unprocessed and
+    whose draft job this worker claims.
+
+    Returns the number of drafts created.
+    """
+    pairs, claimed = await _claim(
+        email_ids, "draft", db,
+        EmailMessage.category.isnot(None), EmailMessage.processed.is_(False),
+    )
+
+    claimed_at = datetime.now(timezone.utc)
+
+    async def _stage(email: EmailMessage, user: User) -> None:
+        stage_ms: dict[str, int] = {}
+        await draft(email, user, db, stage_ms)
+        await timings.record_draft(email.id, claimed_at, stage_ms, db)
+
+    return len(await _run_stage(pairs, claimed, db, _stage))
+
+
+async def embed_emails(email_ids: list[UUID], db: AsyncSession) -> int:
+    """
+    Embed newly ingested emails whose embed job this worker claims.
+    Runs alongside classification; neither waits for the other.
+
+    Returns the number of emails embedded.
+    """
+    # Ingest already created these; this covers manual re-processing
+    await jobs.create_jobs(email_ids, "embed", db)
+    await db.commit()
+    pairs, claimed = await _claim(email_ids, "embed", db)
+
+    async def _stage(email: EmailMessage, user: User) -> None:
+        await embed(email, user)
+
+    return len(await _run_stage(pairs, claimed, db, _stage))
+
+
+async def queue_drafts(email_ids: list[UUID], db: AsyncSession) -> int:
+    """
+    Put classified emails on the draft priority queue.
+
+    Returns the number of emails queued.
+    """
+    pairs = await _load_with_owners(email_ids, db)
+    for email, user in pairs:
+        draft_queue.enqueue(
+            str(email.id),
+            str(user.id),
+            draft_queue.priority_score(
+                email.urgency, email.from_address, email.received_at, user.vip_senders
+            ),
+        )
+    return len(pairs)
+
+
+async def request_draft(email: EmailMessage, db: AsyncSession) -> None:
+    """
+    Queue a (new) draft for one email, e.g. when a user asks for one while
+    Ollama is unavailable. An unclassified email is classified first, which
+    queues its draft in turn.
+    """
+    stage = "draft" if email.category else "classify"
+    email_id = email.id
+    email.processed = False
+    await jobs.create_jobs([email_id], stage, db, reset=True)
+    await db.commit()
+
+    from app.tasks.worker import dispatch_processing, draft_next
+
+    if stage == "classify":
+        dispatch_processing([str(email_id)], stages=("classify",))
+    elif await queue_drafts([email_id], db):
+        draft_next.delay()
+
+
+async def recover_jobs(db: AsyncSession) -> tuple[list[UUID], list[UUID], int]:
+    """
+    Reset stale jobs and put stale drafts back on the draft priority queue.
+
+    Returns the email IDs whose classification and embedding must be
+    re-dispatched and the number of drafts re-queued.
+    """
+    stale = await jobs.recover_stale_jobs(db)
+    classify_ids = stale.get("classify", [])
+    embed_ids = stale.get("embed", [])
+    drafts = await queue_drafts(stale["draft"], db) if stale.get("draft") else 0
+    if stale:
+        logger.info(
+            "Recovered %d classify, %d embed and %d draft jobs",
+            len(classify_ids), len(embed_ids), drafts,
+        )
+    return classify_ids, embed_ids, drafts
@@ -51,6 +51,50 @@ Email body:
 JSON response:"""
 
 
+def build_batch_classification_prompt(emails: list[tuple[str, str]]) -> str:
+    """Build one prompt that classifies several short emails at once.
+
+    The instruction block is shared across all emails, so its evaluation
+    cost is paid once per batch instead of once per email. The LLM should
+    return a JSON array with one object per email, each carrying its
+    1-based "index" plus the same four fields as the single-email prompt.
+
+    Args:
+        emails: (subject, body) pairs, already trimmed to a short length.
+
+    Returns:
+        A fully-formed batch classification prompt string.
+    """
+    blocks = []
+    for index, (subject, body) in enumerate(emails, start=1):
+        blocks.append(f"### Email {index}\nSubject: {subject}\nBody:\n{body}")
+    emails_section = "\n\n".join(blocks)
+
+    return f"""You are an email classification assistant for a Danish craftsman business. Classify each of the {len(emails)} emails below.
+
+For every email return an object with exactly these five fields:
+
+- "index": the email number shown in its heading
+- "category": one of "tilbud", "booking", "reklamation", "faktura", "leverandor", "intern", "spam", "andet"
+  - tilbud: price inquiry or quote request
+  - booking: wants to book a job or meeting
+  - reklamation: complaint about completed work
+  - faktura: invoice or payment related
+  - leverandor: from suppliers or wholesalers
+  - intern: from own employees or internal
+  - spam: advertisements or unwanted
+  - andet: cannot be classified
+- "urgency": one of "high", "medium", "low"
+- "topic": a short description of the email topic in Danish (max 10 words)
+- "confidence": a float between 0.0 and 1.0 indicating your confidence
+
+Return ONLY a valid JSON array with one object per email, in order. No explanations, no markdown formatting, no code fences.
+
+{emails_section}
+
+JSON array:"""
+
+
 async def build_reply_prompt(
     email: EmailMessage,
     user: User,
@@ -0,0 +1,117 @@
+"""Per-account rate limiting and retry handling for the mail provider APIs."""
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean "slow down / try again" rather than "this request is wrong"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_MAX_ATTEMPTS = 5
+_MAX_BACKOFF_SECONDS = 60.0
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. A caller
+    may take more than `capacity` in one go (a Gmail batch call costs 5 units
+    per sub-request); the bucket then goes into debt and later callers wait.
+    No asyncio primitives are held, so a bucket can outlive the event loop it
+    was first used on.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        needed = min(cost, self.capacity)
+        while True:
+            self._refill()
+            if self._tokens >= needed:
+                self._tokens -= cost
+                return
+            await asyncio.sleep((needed - self._tokens) / self.rate)
+
+
+_buckets: dict[tuple[str, str], TokenBucket] = {}
+
+
+def get_bucket(provider: str, account_id: str) -> TokenBucket:
+    """
+    Return the bucket for one account on one provider.
+
+    Gmail is metered in quota units per user per second (messages.get = 5);
+    Graph in requests per mailbox (10,000 per 10 minutes).
+    """
+    key = (provider, account_id)
+    if key not in _buckets:
+        if provider == "gmail":
+            rate = settings.gmail_quota_units_per_second
+        else:
+            rate = settings.graph_requests_per_second
+        _buckets[key] = TokenBucket(rate=rate, capacity=rate)
+    return _buckets[key]
+
+
+def _retry_delay(resp: httpx.Response, attempt: int) -> float:
+    """Honour Retry-After (seconds or HTTP date); otherwise back off exponentially."""
+    retry_after = resp.headers.get("retry-after")
+    if retry_after:
+        try:
+            return min(float(retry_after), _MAX_BACKOFF_SECONDS)
+        except ValueError:
+            try:
+                at = parsedate_to_datetime(retry_after)
+                wait = (at - datetime.now(timezone.utc)).total_seconds()
+                return min(max(wait, 0.0), _MAX_BACKOFF_SECONDS)
+            except (TypeError, ValueError):
+                pass
+    return min(2 ** attempt + random.uniform(0, 1), _MAX_BACKOFF_SECONDS)
+
+
+async def request_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    bucket: TokenBucket,
+    cost: float = 1.0,
+    **kwargs,
+) -> httpx.Response:
+    """
+    Send a request through the account's bucket, retrying throttling and
+    transient server errors.
+
+    The final response is returned as-is, so callers keep their own handling
+    of 404s and raise_for_status().
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        await bucket.acquire(cost)
+        resp = await client.request(method, url, **kwargs)
+        if resp.status_code not in RETRYABLE_STATUS or attempt == _MAX_ATTEMPTS - 1:
+            return resp
+
+        delay = _retry_delay(resp, attempt)
+        logger.info(
+            "%s %s returned %d — retrying in %.1fs (attempt %d/%d)",
+            method, url.split("?")[0], resp.status_code, delay, attempt + 1, _MAX_ATTEMPTS,
+        )
+        await asyncio.sleep(delay)
+    return resp
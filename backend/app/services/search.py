@@ -0,0 +1,273 @@
+"""Email search — Danish full-text over subject, sender and cleaned body, and semantic search."""
+
+import html
+import logging
+import re
+from uuid import UUID
+
+from sqlalchemy import Row, Text, bindparam, func, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.email_message import EmailMessage
+from app.services import vector_store
+from app.services.inbox import LIST_COLUMNS, has_suggestion
+from app.utils.cursor import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+_CONFIG = literal_column("'danish'::regconfig")
+
+# Keeps a single document well under Postgres' 1 MB tsvector limit
+_MAX_BODY_CHARS = 100_000
+
+# Highlight markers from ts_headline; swapped for <mark> after HTML-escaping
+_START, _STOP = "\ue000", "\ue001"
+_HEADLINE_OPTIONS = (
+    f'StartSel="{_START}", StopSel="{_STOP}", '
+    "MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=\" … \""
+)
+
+_HTML_SKIP = re.compile(r"<(script|style)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+_HTML_TAG = re.compile(r"<[^>]+>")
+# First line of a quoted earlier message in a reply (Gmail, Outlook, Apple Mail)
+_REPLY_HEADER = re.compile(
+    r"^\s*(?:On .+ wrote:|Den .+ skrev.*:|-{2,}\s*(?:Original Message|Oprindelig meddelelse)\s*-{2,})\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def clean_body(body_text: str | None, body_html: str | None) -> str:
+    """
+    The part of an email body worth indexing: plain text (or the HTML with
+    its tags stripped), without the quoted earlier messages of a reply.
+    """
+    text = body_text or ""
+    if not text.strip() and body_html:
+        text = html.unescape(_HTML_TAG.sub(" ", _HTML_SKIP.sub(" ", body_html)))
+
+    header = _REPLY_HEADER.search(text)
+    if header:
+        text = text[: header.start()]
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith(">")]
+    return _WHITESPACE.sub(" ", " ".join(lines)).strip()[:_MAX_BODY_CHARS]
+
+
+def document(subject, sender, body):
+    """
+    SQL expression for an email's search vector. Subject matches rank above
+    sender matches, which rank above body matches.
+
+    Args:
+        subject: Subject text (a value or a bind parameter).
+        sender: Sender name and address.
+        body: Cleaned body, see clean_body().
+    """
+    def weighted(value, weight: str):
+        return func.setweight(
+            func.to_tsvector(_CONFIG, func.coalesce(value, "")),
+            literal_column(f"'{weight}'"),
+            type_=TSVECTOR,
+        )
+
+    return weighted(subject, "A").op("||")(weighted(sender, "B")).op("||")(weighted(body, "C"))
+
+
+def embedding_text(subject: str | None, body_text: str | None, body_html: str | None) -> str:
+    """What an email is embedded as for semantic search: subject and cleaned body."""
+    text = f"{subject or ''}\n\n{clean_body(body_text, body_html)}"
+    return text[: settings.email_embed_max_chars]
+
+
+def sender_text(from_name: str | None, from_address: str | None) -> str:
+    """The sender as indexed: name followed by address."""
+    return f"{from_name or ''} {from_address or ''}".strip()
+
+
+def tsquery(query: str):
+    """A web-search style query ("quoted phrases", or, -exclude) as a Danish tsquery."""
+    return func.websearch_to_tsquery(_CONFIG, query)
+
+
+def matches(query: str):
+    """Condition for emails matching a full-text query; served by the GIN index."""
+    return EmailMessage.search_vector.op("@@")(tsquery(query))
+
+
+def _highlight(text: str | None) -> str | None:
+    """HTML-escape a ts_headline result and turn its markers into <mark> tags."""
+    if text is None:
+        return None
+    return html.escape(text).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+async def search_page(
+    db: AsyncSession,
+    account_ids: list[UUID],
+    query: str,
+    cursor: str | None = None,
+    limit: int = 20,
+) -> tuple[list[dict], str | None]:
+    """
+    Return one page of search hits, best match first, and the cursor for the
+    next page (None on the last page).
+
+    The query uses web-search syntax ("quoted phrases", or, -exclude). Each
+    hit has the inbox list columns plus its rank and highlighted subject and
+    snippet (HTML, with matches wrapped in <mark>). The snippet is cut from
+    the same cleaned body the index was built from, so HTML-only mail gets
+    one and quoted earlier messages are never highlighted.
+    """
+    ts_query = tsquery(query)
+    rank = func.ts_rank_cd(EmailMessage.search_vector, ts_query).label("rank")
+
+    # Rank and page the matches first; headlines are only built for the page
+    hits = (
+        select(EmailMessage.id, rank)
+        .where(
+            EmailMessage.account_id.in_(account_ids),
+            EmailMessage.search_vector.op("@@")(ts_query),
+        )
+        .order_by(rank.desc(), EmailMessage.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        after_rank, after_id = decode_cursor(cursor, float, UUID)
+        hits = hits.where(tuple_(rank, EmailMessage.id) < tuple_(after_rank, after_id))
+    hits = hits.subquery()
+
+    stmt = (
+        select(
+            *LIST_COLUMNS,
+            has_suggestion(),
+            hits.c.rank,
+            func.ts_headline(_CONFIG, func.coalesce(EmailMessage.subject, ""), ts_query, _HEADLINE_OPTIONS)
+            .label("subject_highlight"),
+            EmailMessage.body_text,
+            EmailMessage.body_html,
+        )
+        .join(hits, hits.c.id == EmailMessage.id)
+        .order_by(hits.c.rank.desc(), EmailMessage.id.desc())
+    )
+    rows: list[Row] = list((await db.execute(stmt)).all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+
+    snippets = await _headlines(db, [clean_body(row.body_text, row.body_html) for row in rows], query)
+    results = []
+    for row, snippet in zip(rows, snippets):
+        hit = dict(row._mapping)
+        del hit["body_text"], hit["body_html"]
+        hit["subject_highlight"] = _highlight(hit["subject_highlight"])
+        hit["snippet"] = _highlight(snippet)
+        results.append(hit)
+    return results, next_cursor
+
+
+async def _headlines(db: AsyncSession, texts: list[str], query: str) -> list[str]:
+    """ts_headline for each text, in order, in one round trip."""
+    if not texts:
+        return []
+    bodies = func.unnest(bindparam("texts", texts, type_=ARRAY(Text))).table_valued(
+        "body", with_ordinality="n"
+    ).render_derived()
+    result = await db.execute(
+        select(func.ts_headline(_CONFIG, bodies.c.body, tsquery(query), _HEADLINE_OPTIONS))
+        .select_from(bodies)
+        .order_by(bodies.c.n)
+    )
+    return list(result.scalars().all())
+
+
+async def backfill(db: AsyncSession, batch_size: int = 500) -> int:
+    """
+    Build the search vector for emails stored before search existed.
+    New emails get theirs at ingest. Returns the number of emails indexed.
+    """
+    stmt = (
+        update(EmailMessage.__table__)
+        .where(EmailMessage.__table__.c.id == bindparam("email_id"))
+        .values(search_vector=document(
+            bindparam("subject"), bindparam("sender"), bindparam("body"),
+        ))
+    )
+    indexed = 0
+    while True:
+        rows = (await db.execute(
+            select(
+                EmailMessage.id, EmailMessage.subject, EmailMessage.from_name,
+                EmailMessage.from_address, EmailMessage.body_text, EmailMessage.body_html,
+            )
+            .where(EmailMessage.search_vector.is_(None))
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            break
+        await db.execute(stmt, [
+            {
+                "email_id": row.id,
+                "subject": row.subject or "",
+                "sender": sender_text(row.from_name, row.from_address),
+                "body": clean_body(row.body_text, row.body_html),
+            }
+            for row in rows
+        ])
+        await db.commit()
+        indexed += len(rows)
+    if indexed:
+        logger.info("Indexed %d emails for full-text search", indexed)
+    return indexed
+
+
+async def semantic_hits(
+    db: AsyncSession,
+    user_id: UUID,
+    account_ids: list[UUID],
+    query: str | None = None,
+    like_email_id: UUID | None = None,
+    limit: int = 10,
+    max_distance: float | None = None,
+) -> list[dict]:
+    """
+    Emails closest in meaning to a free-text query, or to another email
+    ("find mails like this"), nearest first.
+
+    Each hit has the inbox list columns plus a score (cosine similarity).
+    An email that has not been embedded yet is embedded on the fly to be
+    used as the query. Hits farther away than max_distance are left out.
+    """
+    user_key = str(user_id)
+    embedding = None
+    if like_email_id is not None:
+        embedding = vector_store.get_email_embedding(str(like_email_id), user_key)
+        if embedding is None:
+            row = (await db.execute(
+                select(EmailMessage.subject, EmailMessage.body_text, EmailMessage.body_html)
+                .where(EmailMessage.id == like_email_id)
+            )).one()
+            query = embedding_text(row.subject, row.body_text, row.body_html)
+
+    found = await vector_store.search_emails(
+        user_key, query=query, embedding=embedding, n_results=limit + 1,
+    )
+    distances = {
+        UUID(hit["id"]): hit["distance"]
+        for hit in found
+        if hit["id"] != str(like_email_id)
+        and (max_distance is None or hit["distance"] <= max_distance)
+    }
+    if not distances:
+        return []
+
+    rows = (await db.execute(
+        select(*LIST_COLUMNS, has_suggestion())
+        .where(EmailMessage.id.in_(list(distances)), EmailMessage.account_id.in_(account_ids))
+    )).all()
+    hits = [{**row._mapping, "score": 1 - distances[row.id]} for row in rows]
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits[:limit]
@@ -0,0 +1,156 @@
+"""Per-email pipeline timing records and latency percentiles."""
+
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import DateTime, Integer, cast, func, literal, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.email_timing import EmailTiming
+
+BUCKETS = ("hour", "day", "week")
+
+# Reported stage name -> column
+STAGES = {
+    "ingest": EmailTiming.ingest_ms,
+    "classify_queue": EmailTiming.classify_queue_ms,
+    "classify": EmailTiming.classify_ms,
+    "draft_queue": EmailTiming.draft_queue_ms,
+    "retrieval": EmailTiming.retrieval_ms,
+    "prompt_build": EmailTiming.prompt_ms,
+    "generate": EmailTiming.generate_ms,
+    "total": EmailTiming.total_ms,
+}
+
+
+def _ms_since(start: datetime, column) -> object:
+    """SQL expression for the milliseconds from `column` to `start`."""
+    return cast(
+        func.extract("epoch", literal(start, DateTime(timezone=True)) - column) * 1000, Integer
+    )
+
+
+def _ms_between(start: datetime | None, end: datetime) -> int | None:
+    if start is None:
+        return None
+    return max(int((end - start).total_seconds() * 1000), 0)
+
+
+async def record_ingest(
+    user_id: UUID, emails: list[tuple[UUID, datetime | None]], db: AsyncSession
+) -> None:
+    """Create timing rows for newly ingested (email_id, received_at) pairs, in the caller's transaction."""
+    if not emails:
+        return
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        pg_insert(EmailTiming)
+        .values([
+            {
+                "email_id": email_id,
+                "user_id": user_id,
+                "received_at": received_at,
+                "ingested_at": now,
+                "ingest_ms": _ms_between(received_at, now),
+            }
+            for email_id, received_at in emails
+        ])
+        .on_conflict_do_nothing()
+    )
+
+
+async def record_classify(
+    email_id: UUID, started: datetime, classify_ms: int, db: AsyncSession
+) -> None:
+    """Record the classify queue wait (ingest to claim) and classification time."""
+    await db.execute(
+        update(EmailTiming)
+        .where(EmailTiming.email_id == email_id)
+        .values(
+            classify_queue_ms=_ms_since(started, EmailTiming.ingested_at),
+            classify_ms=classify_ms,
+            classified_at=datetime.now(timezone.utc),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def record_draft(
+    email_id: UUID, started: datetime, stage_ms: dict[str, int], db: AsyncSession
+) -> None:
+    """
+    Record the draft queue wait (classified to claim), the retrieval, prompt
+    build and generation times from generate_reply, and the end-to-end time
+    from receipt to a ready draft.
+    """
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        update(EmailTiming)
+        .where(EmailTiming.email_id == email_id)
+        .values(
+            draft_queue_ms=_ms_since(started, EmailTiming.classified_at),
+            retrieval_ms=stage_ms.get("retrieval"),
+            prompt_ms=stage_ms.get("prompt_build"),
+            generate_ms=stage_ms.get("generate"),
+            drafted_at=now,
+            total_ms=_ms_since(now, EmailTiming.received_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def latency_percentiles(
+    db: AsyncSession,
+    since: datetime,
+    bucket: str = "hour",
+    user_id: UUID | None = None,
+) -> list[dict]:
+    """
+    Aggregate p50/p95 per stage per tenant over time windows.
+
+    Emails are grouped by the `bucket` (hour, day or week) they were
+    ingested in. Returns one dict per (window, tenant) with the email count
+    and, per stage, {"p50", "p95", "count"} in milliseconds; stages with no
+    samples in a window are left out.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    # Inlined rather than bound, so SELECT and GROUP BY are the same expression
+    window = func.date_trunc(literal_column(f"'{bucket}'"), EmailTiming.ingested_at).label("window")
+    columns = [window, EmailTiming.user_id, func.count().label("emails")]
+    for name, column in STAGES.items():
+        columns += [
+            func.percentile_cont(0.5).within_group(column).label(f"{name}_p50"),
+            func.percentile_cont(0.95).within_group(column).label(f"{name}_p95"),
+            func.count(column).label(f"{name}_count"),
+        ]
+
+    stmt = (
+        select(*columns)
+        .where(EmailTiming.ingested_at >= since)
+        .group_by(window, EmailTiming.user_id)
+        .order_by(window)
+    )
+    if user_id is not None:
+        stmt = stmt.where(EmailTiming.user_id == user_id)
+
+    rows = (await db.execute(stmt)).mappings().all()
+    output: list[dict] = []
+    for row in rows:
+        stages = {
+            name: {
+                "p50": round(row[f"{name}_p50"]),
+                "p95": round(row[f"{name}_p95"]),
+                "count": row[f"{name}_count"],
+            }
+            for name in STAGES
+            if row[f"{name}_count"]
+        }
+        output.append({
+            "window_start": row["window"],
+            "user_id": row["user_id"],
+            "emails": row["emails"],
+            "stages": stages,
+        })
+    return output
@@ -1,4 +1,4 @@
-"""ChromaDB vector store integration for knowledge base and approved replies."""
+"""ChromaDB vector store integration for knowledge base, approved replies and emails."""
 
 from __future__ import annotations
 
@@ -6,9 +6,10 @@ import logging
 from typing import Optional
 
 import chromadb
-import httpx
 
 from app.config import settings
+from app.services.circuit_breaker import chroma_breaker, ollama_breaker
+from app.services.http_clients import ollama_client
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,15 @@ def get_replies_collection() -> chromadb.Collection:
     return client.get_or_create_collection(name="approved_replies")
 
 
+def get_email_collection(user_id: str) -> chromadb.Collection:
+    """Return (or create) a user's own 'emails_<user id>' collection."""
+    client = _get_chroma_client()
+    return client.get_or_create_collection(
+        name=f"emails_{user_id.replace('-', '')}",
+        metadata={"hnsw:space": "cosine"},
+    )
+
+
 async def _get_embedding(text: str) -> list[float]:
     """Request an embedding vector from the Ollama API.
 
@@ -49,11 +59,11 @@ async def _get_embedding(text: str) -> list[float]:
         "prompt": text,
     }
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(url, json=payload)
+    with ollama_breaker.guard():
+        response = await ollama_client().post(url, json=payload, timeout=60.0)
         response.raise_for_status()
-        data = response.json()
-        return data["embedding"]
+    data = response.json()
+    return data["embedding"]
 
 
 async def add_knowledge_entry(entry_id: str, content: str, metadata: dict) -> None:
@@ -65,18 +75,19 @@ async def add_knowledge_entry(entry_id: str, content: str, metadata: dict) -> No
         metadata: Metadata dict (must include 'user_id' for later filtering).
     """
     embedding = await _get_embedding(content)
-    collection = get_knowledge_collection()
-    collection.upsert(
-        ids=[entry_id],
-        embeddings=[embedding],
-        documents=[content],
-        metadatas=[metadata],
-    )
+    with chroma_breaker.guard():
+        collection = get_knowledge_collection()
+        collection.upsert(
+            ids=[entry_id],
+            embeddings=[embedding],
+            documents=[content],
+            metadatas=[metadata],
+        )
     logger.info("Added knowledge entry %s to ChromaDB", entry_id)
 
 
 async def search_knowledge(
-    query: str, user_id: str, n_results: int = 3
+    query: str, user_id: str, n_results: int = 3, embedding: list[float] | None = None
 ) -> list[dict]:
     """Search the knowledge collection for entries matching the query.
 
@@ -84,18 +95,20 @@ async def search_knowledge(
         query: The search query text.
         user_id: Filter results to this user only.
         n_results: Maximum number of results to return.
+        embedding: The query's embedding, if already known.
 
     Returns:
         List of dicts with keys: id, document, metadata, distance.
     """
-    embedding = await _get_embedding(query)
-    collection = get_knowledge_collection()
-
-    results = collection.query(
-        query_embeddings=[embedding],
-        n_results=n_results,
-        where={"user_id": user_id},
-    )
+    if embedding is None:
+        embedding = await _get_embedding(query)
+    with chroma_breaker.guard():
+        collection = get_knowledge_collection()
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where={"user_id": user_id},
+        )
 
     output: list[dict] = []
     if results and results["ids"] and results["ids"][0]:
@@ -122,18 +135,19 @@ async def add_approved_reply(
         metadata: Metadata dict (should include 'user_id', 'category', etc.).
     """
     embedding = await _get_embedding(text)
-    collection = get_replies_collection()
-    collection.upsert(
-        ids=[suggestion_id],
-        embeddings=[embedding],
-        documents=[text],
-        metadatas=[metadata],
-    )
+    with chroma_breaker.guard():
+        collection = get_replies_collection()
+        collection.upsert(
+            ids=[suggestion_id],
+            embeddings=[embedding],
+            documents=[text],
+            metadatas=[metadata],
+        )
     logger.info("Added approved reply %s to ChromaDB", suggestion_id)
 
 
 async def search_similar_replies(
-    query: str, user_id: str, n_results: int = 3
+    query: str, user_id: str, n_results: int = 3, embedding: list[float] | None = None
 ) -> list[dict]:
     """Search the approved replies collection for similar past replies.
 
@@ -141,18 +155,20 @@ async def search_similar_replies(
         query: The search query text (typically the incoming email body).
         user_id: Filter results to this user only.
         n_results: Maximum number of results to return.
+        embedding: The query's embedding, if already known.
 
     Returns:
         List of dicts with keys: id, document, metadata, distance.
     """
-    embedding = await _get_embedding(query)
-    collection = get_replies_collection()
-
-    results = collection.query(
-        query_embeddings=[embedding],
-        n_results=n_results,
-        where={"user_id": user_id},
-    )
+    if embedding is None:
+        embedding = await _get_embedding(query)
+    with chroma_breaker.guard():
+        collection = get_replies_collection()
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where={"user_id": user_id},
+        )
 
     output: list[dict] = []
     if results and results["ids"] and results["ids"][0]:
@@ -166,3 +182,82 @@ async def search_similar_replies(
                 }
             )
     return output
+
+
+async def add_email(email_id: str, user_id: str, text: str, metadata: dict) -> None:
+    """Embed an email and add it to its owner's email collection.
+
+    Args:
+        email_id: The email's ID (str(uuid)).
+        user_id: The owning user's ID; selects the collection.
+        text: Subject and cleaned body to embed.
+        metadata: Metadata dict (account_id, received_at, etc.).
+    """
+    embedding = await _get_embedding(text)
+    with chroma_breaker.guard():
+        collection = get_email_collection(user_id)
+        collection.upsert(
+            ids=[email_id],
+            embeddings=[embedding],
+            metadatas=[metadata],
+        )
+    logger.debug("Added email %s to ChromaDB", email_id)
+
+
+def get_email_embedding(email_id: str, user_id: str) -> list[float] | None:
+    """Return the stored embedding of an email, or None if it has none yet."""
+    with chroma_breaker.guard():
+        collection = get_email_collection(user_id)
+        result = collection.get(ids=[email_id], include=["embeddings"])
+    embeddings = result.get("embeddings")
+    if embeddings is None or len(embeddings) == 0:
+        return None
+    return [float(x) for x in embeddings[0]]
+
+
+async def search_emails(
+    user_id: str,
+    query: str | None = None,
+    embedding: list[float] | None = None,
+    n_results: int = 10,
+) -> list[dict]:
+    """Search a user's emails by meaning.
+
+    Args:
+        user_id: The user whose collection to search.
+        query: Free text to search for; ignored if embedding is given.
+        embedding: Search by this vector instead, e.g. a stored email's.
+        n_results: Maximum number of results to return.
+
+    Returns:
+        List of dicts with keys: id, metadata, distance (cosine), nearest first.
+    """
+    if embedding is None:
+        embedding = await _get_embedding(query or "")
+    with chroma_breaker.guard():
+        collection = get_email_collection(user_id)
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["metadatas", "distances"],
+        )
+
+    output: list[dict] = []
+    if results and results["ids"] and results["ids"][0]:
+        for i, doc_id in enumerate(results["ids"][0]):
+            output.append(
+                {
+                    "id": doc_id,
+                    "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
+                    "distance": results["distances"][0][i] if results["distances"] else None,
+                }
+            )
+    return output
+
+
+def delete_emails(email_ids: list[str], user_id: str) -> None:
+    """Remove deleted emails from their owner's email collection."""
+    if not email_ids:
+        return
+    with chroma_breaker.guard():
+        get_email_collection(user_id).delete(ids=email_ids)
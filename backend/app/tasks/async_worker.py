@@ -0,0 +1,256 @@
+"""
+Asyncio-native job consumer — an alternative to the Celery prefork worker.
+
+Reads the same Redis queue that Celery publishes to and runs many jobs
+concurrently in one process, which suits our workload: almost all of a
+job's time is spent waiting on Ollama, ChromaDB and the mail APIs.
+
+    python -m app.tasks.async_worker --queues celery,classify,draft --concurrency 32 --name worker-1
+
+Delivery is at-least-once. Each message is moved atomically into a
+per-consumer processing list (BLMOVE) and removed from it only once the
+job has finished (ack). Messages left in that list by a crash are put back
+on the queue when a consumer with the same --name starts again. Failed
+jobs are re-queued with exponential backoff up to
+async_worker_max_retries times; messages for a task with no handler are
+moved to the mailbot:async-worker:parked list. On SIGTERM/SIGINT the
+consumer stops taking new messages and waits for in-flight jobs before
+exiting.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import random
+import signal
+import socket
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.services.http_clients import close_clients
+from app.tasks import handlers
+
+logger = logging.getLogger(__name__)
+
+# Messages for tasks this consumer has no handler for, kept for inspection
+PARKED_KEY = "mailbot:async-worker:parked"
+
+Handler = Callable[..., Awaitable[None]]
+
+
+# Task name -> shared body in app.tasks.handlers; the Celery tasks run the same ones
+HANDLERS: dict[str, Handler] = {
+    f"app.tasks.worker.{name}": getattr(handlers, name)
+    for name in (
+        "classify_email_batch",
+        "embed_email_batch",
+        "draft_next",
+        "process_single_email",
+        "sync_account",
+        "sync_all_emails",
+        "renew_push_subscriptions",
+        "recover_stale_jobs",
+        "reconcile_counters",
+    )
+}
+
+
+# --------------------------------------------------------------------------- #
+# Consumer
+# --------------------------------------------------------------------------- #
+
+def _decode(raw: str) -> tuple[str, list, dict, dict]:
+    """Decode a Celery (protocol 2) message into (task, args, kwargs, headers)."""
+    message = json.loads(raw)
+    body = message["body"]
+    if message.get("properties", {}).get("body_encoding") == "base64":
+        body = base64.b64decode(body).decode(message.get("content-encoding", "utf-8"))
+    args, kwargs, _embed = json.loads(body)
+    headers = message.get("headers", {})
+    return headers["task"], args, kwargs, headers
+
+
+def _with_retries(raw: str, retries: int) -> str:
+    """Return the message with its retry counter bumped."""
+    message = json.loads(raw)
+    message.setdefault("headers", {})["retries"] = retries
+    return json.dumps(message)
+
+
+class AsyncConsumer:
+    def __init__(self, queues: list[str], concurrency: int, name: str):
+        self.queues = queues
+        self.concurrency = concurrency
+        self.name = name
+        self.processing_key = f"mailbot:async-worker:{name}:processing"
+        self._stopping = asyncio.Event()
+        self._in_flight: set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+        self._engine = create_async_engine(
+            settings.database_url,
+            echo=False,
+            pool_size=min(concurrency, 20),
+            max_overflow=concurrency,
+            pool_pre_ping=True,
+        )
+        self._sessions = async_sessionmaker(self._engine, class_=AsyncSession, expire_on_commit=False)
+
+    def stop(self) -> None:
+        if not self._stopping.is_set():
+            logger.info("Stopping — no new jobs will be taken, draining %d in flight", len(self._in_flight))
+            self._stopping.set()
+
+    async def _recover(self) -> None:
+        """Put messages a previous run of this consumer never acked back on their queue."""
+        recovered = 0
+        while raw := await self._redis.rpop(self.processing_key):
+            queue = json.loads(raw).get("properties", {}).get("delivery_info", {}).get(
+                "routing_key", self.queues[0]
+            )
+            await self._redis.lpush(queue, raw)
+            recovered += 1
+        if recovered:
+            logger.warning("Re-queued %d unacknowledged messages from a previous run", recovered)
+
+    async def _ack(self, raw: str) -> None:
+        await self._redis.lrem(self.processing_key, 1, raw)
+
+    async def _requeue(self, raw: str, queue: str, delay: float) -> None:
+        """Push a message back onto its queue after `delay`, then ack the original."""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        await self._redis.lpush(queue, raw)
+
+    async def _run(self, raw: str, queue: str) -> None:
+        try:
+            task_name, args, kwargs, headers = _decode(raw)
+            if headers.get("eta"):
+                datetime.fromisoformat(headers["eta"])
+        except (KeyError, ValueError, TypeError):
+            logger.error("Dropping undecodable message: %s", raw[:200])
+            await self._ack(raw)
+            return
+
+        handler = HANDLERS.get(task_name)
+        if handler is None:
+            # Re-queueing would loop it straight back to this consumer
+            logger.error("Parking message for unknown task %s %s", task_name, headers.get("id"))
+            await self._redis.lpush(PARKED_KEY, raw)
+            await self._ack(raw)
+            return
+
+        eta = headers.get("eta")
+        if eta:
+            eta_at = datetime.fromisoformat(eta)
+            if eta_at.tzinfo is None:
+                eta_at = eta_at.replace(tzinfo=timezone.utc)
+            wait = (eta_at - datetime.now(timezone.utc)).total_seconds()
+            if wait > 0:
+                await self._requeue(raw, queue, min(wait, 60))
+                await self._ack(raw)
+                return
+
+        try:
+            await handler(self._sessions, self._redis, *args, **kwargs)
+        except Exception:
+            retries = int(headers.get("retries") or 0)
+            if retries >= settings.async_worker_max_retries:
+                logger.exception("Task %s %s failed permanently after %d retries", task_name, headers.get("id"), retries)
+            else:
+                delay = min(2 ** retries + random.uniform(0, 1), 60)
+                logger.exception("Task %s %s failed — retrying in %.1fs", task_name, headers.get("id"), delay)
+                await self._requeue(_with_retries(raw, retries + 1), queue, delay)
+        await self._ack(raw)
+
+    async def _fetch(self) -> tuple[str, str] | None:
+        """Move the next message from any queue into the processing list."""
+        for queue in self.queues:
+            raw = await self._redis.lmove(queue, self.processing_key, "RIGHT", "LEFT")
+            if raw:
+                return raw, queue
+        # Nothing ready — block briefly on the first queue
+        raw = await self._redis.blmove(self.queues[0], self.processing_key, 1, "RIGHT", "LEFT")
+        return (raw, self.queues[0]) if raw else None
+
+    def _spawn(self, raw: str, queue: str) -> None:
+        task = asyncio.create_task(self._run(raw, queue))
+        self._in_flight.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            self._in_flight.discard(t)
+            self._slots.release()
+
+        task.add_done_callback(_done)
+
+    async def run(self) -> None:
+        await self._recover()
+        logger.info(
+            "Async worker %s consuming %s with up to %d jobs in flight",
+            self.name, ", ".join(self.queues), self.concurrency,
+        )
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            if self._stopping.is_set():
+                self._slots.release()
+                break
+            try:
+                fetched = await self._fetch()
+            except Exception:
+                logger.exception("Redis fetch failed — backing off")
+                self._slots.release()
+                await asyncio.sleep(2)
+                continue
+            if fetched is None:
+                self._slots.release()
+                continue
+            self._spawn(*fetched)
+
+        if self._in_flight:
+            done, pending = await asyncio.wait(
+                self._in_flight, timeout=settings.async_worker_drain_timeout_seconds
+            )
+            if pending:
+                logger.warning(
+                    "%d jobs still running after the drain timeout; they stay unacked "
+                    "and are re-queued on the next start", len(pending),
+                )
+                for task in pending:
+                    task.cancel()
+
+        await close_clients()
+        await self._engine.dispose()
+        await self._redis.aclose()
+        logger.info("Async worker %s stopped", self.name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--queues", default="celery,classify,draft", help="comma-separated queue names")
+    parser.add_argument("--concurrency", type=int, default=settings.async_worker_max_in_flight)
+    parser.add_argument("--name", default=socket.gethostname(),
+                        help="stable consumer name; unacked messages are recovered under it")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    async def _main():
+        consumer = AsyncConsumer(args.queues.split(","), args.concurrency, args.name)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, consumer.stop)
+        await consumer.run()
+
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
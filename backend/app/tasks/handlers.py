@@ -0,0 +1,154 @@
+"""
+Task bodies shared by the Celery tasks in app.tasks.worker and the asyncio
+consumer in app.tasks.async_worker.
+
+Each body takes a session factory and an asyncio Redis client, so the same
+code runs on a Celery worker's persistent loop and in the async consumer.
+Follow-up work is always enqueued through the Celery tasks, which either
+kind of worker picks up.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from uuid import UUID
+
+from redis import asyncio as aioredis
+from redis.exceptions import LockError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], AsyncSession]
+
+SYNC_LOCK_KEY = "mailbot:sync-lock:{account_id}"
+# Set when a sync is requested while the account is already syncing; the
+# lock holder re-enqueues one more sync after it releases the lock
+SYNC_PENDING_KEY = "mailbot:sync-pending:{account_id}"
+
+
+async def sync_all_emails(sessions: SessionFactory, redis: aioredis.Redis) -> None:
+    """Fan out one sync_account task per account due for a poll."""
+    from app.services.mail_sync import get_accounts_due_for_poll
+    from app.tasks import worker
+
+    async with sessions() as db:
+        account_ids = await get_accounts_due_for_poll(db)
+    for account_id in account_ids:
+        worker.sync_account.delay(str(account_id))
+    logger.info("Enqueued sync for %d accounts", len(account_ids))
+
+
+async def sync_account(sessions: SessionFactory, redis: aioredis.Redis, account_id: str) -> None:
+    """Sync a single account while holding its Redis lock.
+
+    If another worker already holds the lock (an overrunning previous sync,
+    or a push notification arriving mid-sync), this run does not race it on
+    the same cursor. It marks a resync as pending instead, and the holder
+    enqueues one more sync once it is done, so mail that arrived during the
+    running sync is not left for the next fallback poll.
+    """
+    from app.services.mail_sync import sync_account_by_id
+    from app.tasks import worker
+
+    pending_key = SYNC_PENDING_KEY.format(account_id=account_id)
+    lock = redis.lock(
+        SYNC_LOCK_KEY.format(account_id=account_id),
+        timeout=settings.mail_sync_lock_timeout_seconds,
+    )
+    if not await lock.acquire(blocking=False):
+        await redis.set(pending_key, 1, ex=settings.mail_sync_lock_timeout_seconds)
+        # The holder may have released (and checked the flag) in between
+        if not await lock.acquire(blocking=False):
+            logger.info("Account %s is already syncing — resync pending", account_id)
+            return
+
+    try:
+        async with sessions() as db:
+            await sync_account_by_id(UUID(account_id), db)
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            # Lock expired mid-sync; another run may already own it now
+            logger.warning("Sync lock for account %s expired before release", account_id)
+        if await redis.delete(pending_key):
+            worker.sync_account.delay(account_id)
+
+
+async def renew_push_subscriptions(sessions: SessionFactory, redis: aioredis.Redis) -> None:
+    from app.services.mail_push import renew_expiring_subscriptions
+
+    async with sessions() as db:
+        await renew_expiring_subscriptions(db)
+
+
+async def recover_stale_jobs(sessions: SessionFactory, redis: aioredis.Redis) -> None:
+    """Re-dispatch jobs whose worker died or whose wake-up was lost."""
+    from app.services.pipeline import recover_jobs
+    from app.tasks import worker
+
+    async with sessions() as db:
+        classify_ids, embed_ids, drafts = await recover_jobs(db)
+    worker.dispatch_processing([str(email_id) for email_id in classify_ids], stages=("classify",))
+    worker.dispatch_processing([str(email_id) for email_id in embed_ids], stages=("embed",))
+    for _ in range(drafts):
+        worker.draft_next.delay()
+
+
+async def reconcile_counters(sessions: SessionFactory, redis: aioredis.Redis) -> None:
+    from app.services.counters import reconcile
+
+    async with sessions() as db:
+        corrected = await reconcile(db)
+    logger.info("Reconciled inbox counters — %d accounts corrected", corrected)
+
+
+async def classify_email_batch(sessions: SessionFactory, redis: aioredis.Redis, email_ids: list[str]) -> None:
+    """Classify a batch (committed per email) and queue the drafts by priority."""
+    from app.services.pipeline import classify_emails
+    from app.tasks import worker
+
+    async with sessions() as db:
+        queued = await classify_emails([UUID(i) for i in email_ids], db)
+    # One wake-up per queued email; each draft_next takes whatever is most
+    # urgent at the time it runs, not necessarily the email that queued it
+    for _ in queued:
+        worker.draft_next.delay()
+
+
+async def embed_email_batch(sessions: SessionFactory, redis: aioredis.Redis, email_ids: list[str]) -> None:
+    """Embed a batch of emails into their owners' email collections."""
+    from app.services.pipeline import embed_emails
+
+    async with sessions() as db:
+        await embed_emails([UUID(i) for i in email_ids], db)
+
+
+async def draft_next(sessions: SessionFactory, redis: aioredis.Redis) -> None:
+    """Draft the highest-priority queued email whose tenant is under its cap."""
+    from app.services import draft_queue
+    from app.services.pipeline import draft_replies
+    from app.tasks import worker
+
+    # The draft queue shares the synchronous client with the pipeline that fills it
+    claimed = await asyncio.to_thread(draft_queue.claim_next)
+    if claimed is None:
+        return
+    email_id, user_id = claimed
+    try:
+        async with sessions() as db:
+            await draft_replies([UUID(email_id)], db)
+    finally:
+        await asyncio.to_thread(draft_queue.release, user_id)
+        # Emails held back by the tenant cap have no wake-up of their own
+        if await asyncio.to_thread(draft_queue.ready_count):
+            worker.draft_next.delay()
+
+
+async def process_single_email(sessions: SessionFactory, redis: aioredis.Redis, email_id: str) -> None:
+    from app.tasks import worker
+
+    worker.dispatch_processing([email_id])
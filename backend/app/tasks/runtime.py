@@ -0,0 +1,87 @@
+"""Per-process runtime for Celery workers.
+
+Each worker process keeps one event loop, one pooled SQLAlchemy engine, an
+asyncio Redis client and the shared HTTP clients for its whole life, instead of building and tearing
+them down in every task. Set up on worker_process_init and closed on
+worker_process_shutdown; run() initialises lazily for the solo pool, eager
+tasks and scripts.
+"""
+
+import asyncio
+import logging
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_loop: asyncio.AbstractEventLoop | None = None
+_engine = None
+_session_factory: async_sessionmaker[AsyncSession] | None = None
+_redis: aioredis.Redis | None = None
+
+
+def init() -> None:
+    global _loop, _engine, _session_factory, _redis
+    if _loop is not None:
+        return
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+    _engine = create_async_engine(
+        settings.database_url,
+        echo=False,
+        pool_size=settings.worker_db_pool_size,
+        pool_pre_ping=True,
+    )
+    _session_factory = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    _redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+    logger.debug("Worker runtime initialised")
+
+
+def shutdown() -> None:
+    global _loop, _engine, _session_factory, _redis
+    if _loop is None:
+        return
+    from app.services.http_clients import close_clients
+
+    async def _close():
+        await close_clients()
+        await _engine.dispose()
+        await _redis.aclose()
+
+    try:
+        _loop.run_until_complete(_close())
+    finally:
+        _loop.close()
+        _loop = _engine = _session_factory = _redis = None
+
+
+def run(coro):
+    """Run a coroutine to completion on the process's persistent loop."""
+    init()
+    return _loop.run_until_complete(coro)
+
+
+def session() -> AsyncSession:
+    """Open a session on the process's pooled engine."""
+    init()
+    return _session_factory()
+
+
+def redis() -> aioredis.Redis:
+    """The process's asyncio Redis client, bound to its persistent loop."""
+    init()
+    return _redis
+
+
+@worker_process_init.connect
+def _on_process_init(**kwargs):
+    init()
+
+
+@worker_process_shutdown.connect
+def _on_process_shutdown(**kwargs):
+    shutdown()
@@ -1,9 +1,13 @@
-import asyncio
+import logging
+import math
 
-from celery import Celery
+from celery import Celery, group
 from celery.schedules import crontab
 
 from app.config import settings
+from app.tasks import handlers, runtime
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "mailbot",
@@ -16,96 +20,112 @@ celery_app.conf.update(
     accept_content=["json"],
     result_serializer="json",
     timezone="Europe/Copenhagen",
+    # Cheap classification and slow drafting run on separate worker pools,
+    # so a burst of drafts never delays classification
+    task_routes={
+        "app.tasks.worker.classify_email_batch": {"queue": "classify"},
+        "app.tasks.worker.embed_email_batch": {"queue": "classify"},
+        "app.tasks.worker.draft_next": {"queue": "draft"},
+    },
     beat_schedule={
         "sync-emails-periodic": {
             "task": "app.tasks.worker.sync_all_emails",
             "schedule": settings.mail_sync_interval_seconds,
         },
+        "renew-push-subscriptions": {
+            "task": "app.tasks.worker.renew_push_subscriptions",
+            "schedule": 3600,
+        },
+        "recover-stale-jobs": {
+            "task": "app.tasks.worker.recover_stale_jobs",
+            "schedule": settings.job_recovery_interval_seconds,
+        },
+        "reconcile-counters": {
+            "task": "app.tasks.worker.reconcile_counters",
+            "schedule": settings.counters_reconcile_interval_seconds,
+        },
     },
 )
 
 
 def run_async(coro):
-    loop = asyncio.new_event_loop()
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+    return runtime.run(coro)
 
 
-def _make_session():
-    """Create a fresh async engine+session for each Celery task."""
-    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
-    engine = create_async_engine(settings.database_url, echo=False)
-    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    return engine, session_factory
+def run_handler(handler, *args):
+    """Run a shared task body from app.tasks.handlers on the process runtime."""
+    return run_async(handler(runtime.session, runtime.redis(), *args))
 
 
 @celery_app.task(name="app.tasks.worker.sync_all_emails")
 def sync_all_emails():
-    from app.services.mail_sync import sync_all_accounts
+    """Beat entry point: fan out one sync_account task per account due for a poll."""
+    run_handler(handlers.sync_all_emails)
+
+
+@celery_app.task(name="app.tasks.worker.sync_account")
+def sync_account(account_id: str):
+    """Sync a single account; see handlers.sync_account for the lock protocol."""
+    run_handler(handlers.sync_account, account_id)
+
+
+@celery_app.task(name="app.tasks.worker.renew_push_subscriptions")
+def renew_push_subscriptions():
+    run_handler(handlers.renew_push_subscriptions)
+
+
+@celery_app.task(name="app.tasks.worker.recover_stale_jobs")
+def recover_stale_jobs():
+    """Beat entry point: re-dispatch jobs whose worker died or whose wake-up was lost."""
+    run_handler(handlers.recover_stale_jobs)
+
+
+@celery_app.task(name="app.tasks.worker.reconcile_counters")
+def reconcile_counters():
+    run_handler(handlers.reconcile_counters)
+
+
+def dispatch_processing(
+    email_ids: list[str], stages: tuple[str, ...] = ("classify", "embed")
+) -> None:
+    """
+    Send newly ingested emails to the classify queue as a group of batch
+    tasks, one set per pipeline stage (classification and embedding).
+
+    The IDs are split into roughly one chunk per classify worker slot, capped
+    at ai_batch_max_size, so a catch-up spreads across all workers while each
+    task still shares its session and lookups across several emails.
+    """
+    if not email_ids:
+        return
+    tasks = {"classify": classify_email_batch, "embed": embed_email_batch}
+    size = math.ceil(len(email_ids) / settings.ai_worker_concurrency)
+    size = max(1, min(size, settings.ai_batch_max_size))
+    group(
+        tasks[stage].s(email_ids[start : start + size])
+        for stage in stages
+        for start in range(0, len(email_ids), size)
+    ).apply_async()
+
+
+@celery_app.task(name="app.tasks.worker.classify_email_batch")
+def classify_email_batch(email_ids: list[str]):
+    """Classify a batch (committed per email) and queue the drafts by priority."""
+    run_handler(handlers.classify_email_batch, email_ids)
+
+
+@celery_app.task(name="app.tasks.worker.embed_email_batch")
+def embed_email_batch(email_ids: list[str]):
+    """Embed a batch of emails into their owners' email collections."""
+    run_handler(handlers.embed_email_batch, email_ids)
 
-    async def _sync():
-        engine, session_factory = _make_session()
-        try:
-            async with session_factory() as db:
-                await sync_all_accounts(db)
-        finally:
-            await engine.dispose()
 
-    run_async(_sync())
+@celery_app.task(name="app.tasks.worker.draft_next")
+def draft_next():
+    """Draft the highest-priority queued email whose tenant is under its cap."""
+    run_handler(handlers.draft_next)
 
 
 @celery_app.task(name="app.tasks.worker.process_single_email")
 def process_single_email(email_id: str):
-    from uuid import UUID
-    from sqlalchemy import select
-    from app.models.email_message import EmailMessage
-    from app.models.mail_account import MailAccount
-    from app.models.user import User
-    from app.models.ai_suggestion import AiSuggestion
-    from app.services.ai_engine import classify_email, generate_reply
-
-    async def _process():
-        engine, session_factory = _make_session()
-        try:
-            async with session_factory() as db:
-                result = await db.execute(
-                    select(EmailMessage).where(EmailMessage.id == UUID(email_id))
-                )
-                email = result.scalar_one_or_none()
-                if not email or email.processed:
-                    return
-
-                # Classify
-                classification = await classify_email(email.subject or "", email.body_text or "")
-                email.category = classification.get("category")
-                email.urgency = classification.get("urgency")
-                email.topic = classification.get("topic")
-                email.confidence = classification.get("confidence")
-
-                # Get user for reply generation
-                account_result = await db.execute(
-                    select(MailAccount).where(MailAccount.id == email.account_id)
-                )
-                account = account_result.scalar_one()
-                user_result = await db.execute(
-                    select(User).where(User.id == account.user_id)
-                )
-                user = user_result.scalar_one()
-
-                # Generate reply suggestion
-                if email.category != "spam":
-                    reply_text = await generate_reply(email, user, db)
-                    suggestion = AiSuggestion(
-                        email_id=email.id,
-                        suggested_text=reply_text,
-                    )
-                    db.add(suggestion)
-
-                email.processed = True
-                await db.commit()
-        finally:
-            await engine.dispose()
-
-    run_async(_process())
+    run_handler(handlers.process_single_email, email_id)
@@ -0,0 +1,96 @@
+import pytest
+
+from app.services.chat_intents import find_reference, match_intent
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("slet den anden", 1),
+    ("Slet den første mail.", 0),
+    ("slet den sidste", -1),
+    ("marker nr 3 som læst", 2),
+    ("marker nr. 2 som læst", 1),
+    ("marker dem som læst", "all"),
+    ("slet disse", "all"),
+    ("slet dem alle", "all"),
+    ("vis den tredje", 2),
+    ("svar på den anden", 1),
+    ("svar på dem", "all"),
+    ("besvar den første og sig ja tak", 0),
+])
+def test_find_reference(message, expected):
+    assert find_reference(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "slet mails fra sidste uge",
+    "find mails fra anden@firma.dk",
+    "vis noget andet",
+    "vis mails om den første levering",
+    "slet den sidste uges mails",
+    "hvem skrev den anden mail om tilbuddet",
+    "slet nr 0",
+    "vis tilbud",
+    "",
+])
+def test_find_reference_ignores_non_references(message):
+    assert find_reference(message) is None
+
+
+@pytest.mark.parametrize("message, action, filters", [
+    ("vis ulæste tilbud", "search", {"category": "tilbud", "is_read": False}),
+    ("ulæste fakturaer", "search", {"category": "faktura", "is_read": False}),
+    ("slet spam", "delete", {"category": "spam"}),
+    ("find mails fra lars@firma.dk", "search", {"from_address": "lars@firma.dk"}),
+    ("vis mails fra firma.dk", "search", {"from_address": "firma.dk"}),
+    ("marker tilbud som læst", "mark_read", {"category": "tilbud"}),
+    ("marker alle som læst", "mark_read", {}),
+    ("vis mails der haster", "search", {"urgency": "high"}),
+    ("søg efter badeværelse", "search", {"search_text": "badeværelse"}),
+    ("giv mig et overblik", "summary", {}),
+    ("hvad skal jeg svare på?", "suggest", {}),
+    ("hvad bør jeg gøre", "suggest", {}),
+])
+def test_match_intent(message, action, filters):
+    intent = match_intent(message)
+    assert intent is not None
+    assert intent["action"] == action
+    assert intent["filters"] == filters
+
+
+@pytest.mark.parametrize("message", [
+    "svar på mailen fra lars",    # needs free text
+    "send en mail til lars",
+    "slet alt",                   # never guess at "delete everything"
+    "slet dem",                   # a reference without a listed result
+    "vis tilbud og fakturaer",    # conflicting slots
+    "vis ulæste og læste mails",
+    "vis mails til chefen",       # words left over
+    "opsummer tilbud",            # summary takes no filters
+    "book et møde med lars",      # unknown verb
+    "",
+])
+def test_match_intent_leaves_ambiguous_messages_to_the_llm(message):
+    assert match_intent(message) is None
+
+
+@pytest.mark.parametrize("message, action, filters", [
+    ("slet dem", "delete", {}),
+    ("slet den anden", "delete", {}),
+    ("marker nr 2 som læst", "mark_read", {}),
+    ("vis den første", "search", {}),
+    ("slet den anden lars@firma.dk", "delete", {"from_address": "lars@firma.dk"}),
+])
+def test_match_intent_with_reference(message, action, filters):
+    intent = match_intent(message, has_reference=True)
+    assert intent is not None
+    assert intent["action"] == action
+    assert intent["filters"] == filters
+
+
+@pytest.mark.parametrize("message", [
+    "slet mails fra sidste uge",
+    "vis noget andet",
+    "slet dem og den anden",
+])
+def test_match_intent_with_reference_needs_exactly_one_reference(message):
+    assert match_intent(message, has_reference=True) is None
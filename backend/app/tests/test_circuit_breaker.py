@@ -0,0 +1,161 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, is_service_failure
+
+DOWN = httpx.ConnectError("connection refused")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=3, reset_seconds=30)
+
+
+def fail(breaker, exc=DOWN):
+    with pytest.raises(type(exc)):
+        with breaker.guard():
+            raise exc
+
+
+def succeed(breaker):
+    with breaker.guard():
+        pass
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        fail(breaker)
+    assert breaker.state == "open"
+
+
+def test_opens_after_the_threshold(breaker):
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == "closed"
+
+    fail(breaker)
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        succeed(breaker)
+    assert raised.value.retry_after == 30
+
+
+def test_success_resets_the_failure_count(breaker):
+    fail(breaker)
+    fail(breaker)
+    succeed(breaker)
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == "closed"
+
+
+def test_errors_that_are_not_service_failures_do_not_count(breaker):
+    for _ in range(5):
+        fail(breaker, ValueError("bad input"))
+    assert breaker.state == "closed"
+
+
+def test_half_open_after_the_cool_down(breaker, clock):
+    open_breaker(breaker)
+
+    clock.now += 29
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        succeed(breaker)
+    assert raised.value.retry_after == pytest.approx(1.0)
+
+    clock.now += 1
+    assert breaker.state == "half_open"
+
+
+def test_half_open_lets_a_single_trial_through(breaker, clock):
+    open_breaker(breaker)
+    clock.now += 30
+
+    with breaker.guard():
+        # Everyone else keeps failing fast while the trial runs
+        with pytest.raises(CircuitOpenError):
+            succeed(breaker)
+
+    assert breaker.state == "closed"
+    succeed(breaker)
+
+
+def test_a_failed_trial_reopens_for_a_full_cool_down(breaker, clock):
+    open_breaker(breaker)
+    clock.now += 30
+
+    fail(breaker)
+
+    assert breaker.state == "open"
+    clock.now += 29
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.state == "half_open"
+
+
+def test_a_cancelled_trial_frees_the_slot(breaker, clock):
+    open_breaker(breaker)
+    clock.now += 30
+    started = asyncio.Event()
+
+    async def trial():
+        with breaker.guard():
+            started.set()
+            await asyncio.sleep(60)
+
+    async def run():
+        task = asyncio.create_task(trial())
+        await started.wait()
+        with pytest.raises(CircuitOpenError):
+            succeed(breaker)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    # Cancellation says nothing about the service: still half-open, slot free
+    assert breaker.state == "half_open"
+    succeed(breaker)
+    assert breaker.state == "closed"
+
+
+def test_service_failure_is_found_through_wrapped_errors():
+    try:
+        try:
+            raise DOWN
+        except httpx.ConnectError:
+            raise ValueError("Could not connect to tenant")  # as chromadb's HttpClient does
+    except ValueError as exc:
+        wrapped = exc
+
+    assert is_service_failure(wrapped)
+    assert not is_service_failure(ValueError("bad input"))
+
+
+@pytest.mark.parametrize("status, failure", [(429, True), (503, True), (404, False), (400, False)])
+def test_status_errors(status, failure):
+    request = httpx.Request("POST", "http://ollama/api/generate")
+    exc = httpx.HTTPStatusError("", request=request, response=httpx.Response(status, request=request))
+    assert is_service_failure(exc) is failure
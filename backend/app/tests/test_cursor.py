@@ -0,0 +1,78 @@
+import base64
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import emails
+from app.database import get_db
+from app.utils.auth import get_current_user
+from app.utils.cursor import decode_cursor, encode_cursor
+
+EMAIL_ID = uuid.UUID("6f1c5b0e-3d2a-4b7e-9a61-0c8d2f4e5a17")
+RECEIVED_AT = datetime(2026, 10, 19, 8, 30, tzinfo=timezone.utc)
+
+
+def optional_datetime(value):
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+@pytest.mark.parametrize("keys, parsers", [
+    ((RECEIVED_AT, EMAIL_ID), (optional_datetime, uuid.UUID)),
+    ((None, EMAIL_ID), (optional_datetime, uuid.UUID)),
+    ((0.0607927, EMAIL_ID), (float, uuid.UUID)),
+])
+def test_round_trip(keys, parsers):
+    cursor = encode_cursor(*keys)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor, *parsers) == keys
+
+
+def b64(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    "abcde",                                   # impossible base64 length
+    b64("not json"),
+    b64('{"rank": 1}'),
+    b64('[0.5]'),                              # too few keys
+    b64(f'[0.5, "{EMAIL_ID}", 3]'),            # too many keys
+    b64('["high", "6f1c5b0e"]'),               # keys the parsers reject
+    b64('[0.5, 42]'),
+    b64('[null, null]'),
+])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, float, uuid.UUID)
+
+
+class FakeResult:
+    def all(self):
+        return [(uuid.uuid4(),)]
+
+
+class FakeSession:
+    async def execute(self, stmt):
+        return FakeResult()
+
+
+@pytest.fixture
+def client():
+    api = FastAPI()
+    api.include_router(emails.router, prefix="/api/emails")
+    api.dependency_overrides[get_current_user] = lambda: type("User", (), {"id": uuid.uuid4()})()
+    api.dependency_overrides[get_db] = FakeSession
+    return TestClient(api)
+
+
+@pytest.mark.parametrize("path", ["/api/emails/", "/api/emails/search?q=tilbud"])
+def test_endpoints_reject_a_malformed_cursor(client, path):
+    separator = "&" if "?" in path else "?"
+    response = client.get(f"{path}{separator}cursor={b64('[1, 2]')}")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
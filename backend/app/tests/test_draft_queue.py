@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+import pytest
+
+from app.config import settings
+from app.services import draft_queue
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(draft_queue, "get_redis", lambda: client)
+    monkeypatch.setattr(settings, "draft_tenant_max_in_flight", 1)
+    return client
+
+
+def test_a_tenant_filling_the_queue_does_not_hide_other_tenants():
+    for n in range(500):
+        draft_queue.enqueue(f"busy-{n}", "busy", float(n))
+    draft_queue.enqueue("quiet-0", "quiet", 10_000.0)
+
+    assert draft_queue.claim_next() == ("busy-0", "busy")
+    assert draft_queue.claim_next() == ("quiet-0", "quiet")
+    assert draft_queue.claim_next() is None
+    assert draft_queue.ready_count() == 0
+
+
+def test_release_makes_the_tenant_claimable_again():
+    draft_queue.enqueue("a", "tenant", 1.0)
+    draft_queue.enqueue("b", "tenant", 2.0)
+    assert draft_queue.claim_next() == ("a", "tenant")
+    assert draft_queue.claim_next() is None
+
+    draft_queue.release("tenant")
+
+    assert draft_queue.ready_count() == 1
+    assert draft_queue.claim_next() == ("b", "tenant")
+
+
+def test_claims_follow_the_best_score_across_tenants(monkeypatch):
+    monkeypatch.setattr(settings, "draft_tenant_max_in_flight", 2)
+    draft_queue.enqueue("x1", "x", 5.0)
+    draft_queue.enqueue("x2", "x", 1.0)
+    draft_queue.enqueue("y1", "y", 3.0)
+    draft_queue.enqueue("x3", "x", 4.0)
+
+    claimed = [draft_queue.claim_next() for _ in range(4)]
+
+    assert claimed == [("x2", "x"), ("y1", "y"), ("x3", "x"), None]
+
+
+def test_requeueing_keeps_the_better_score():
+    draft_queue.enqueue("a", "x", 10.0)
+    draft_queue.enqueue("b", "y", 5.0)
+    draft_queue.enqueue("a", "x", 1.0)
+    draft_queue.enqueue("a", "x", 20.0)
+
+    assert draft_queue.claim_next() == ("a", "x")
+
+
+def test_an_expired_in_flight_counter_is_recovered_on_enqueue(redis):
+    draft_queue.enqueue("a", "tenant", 1.0)
+    draft_queue.enqueue("b", "tenant", 2.0)
+    assert draft_queue.claim_next() == ("a", "tenant")
+    # The worker drafting "a" died; its counter expires instead of being released
+    redis.delete(f"{draft_queue.IN_FLIGHT_PREFIX}tenant")
+
+    draft_queue.enqueue("b", "tenant", 2.0)
+
+    assert draft_queue.claim_next() == ("b", "tenant")
+
+
+@pytest.mark.parametrize("urgency, vip, age, boost", [
+    ("low", False, timedelta(hours=5), 0),
+    ("medium", False, timedelta(hours=5), 3600),
+    ("high", True, timedelta(hours=5), 6 * 3600),
+    ("low", False, timedelta(minutes=5), 1800),
+])
+def test_priority_score(urgency, vip, age, boost):
+    received = NOW - age
+    score = draft_queue.priority_score(
+        urgency, "chef@firma.dk", received, ["@firma.dk"] if vip else [], now=NOW
+    )
+    assert score == received.timestamp() - boost
+
+
+def test_priority_score_counts_future_mail_as_received_now():
+    future = NOW + timedelta(days=1)
+    assert draft_queue.priority_score("low", "a@b.dk", future, [], now=NOW) == NOW.timestamp() - 1800
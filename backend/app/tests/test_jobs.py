@@ -0,0 +1,274 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.models.dead_letter_job import DeadLetterJob
+from app.models.email_job import EmailJob
+from app.services import jobs, pipeline
+from app.services.circuit_breaker import CircuitOpenError
+
+UNAVAILABLE = httpx.ConnectError("connection refused")
+
+
+@pytest.fixture(autouse=True)
+def retry_settings(monkeypatch):
+    monkeypatch.setattr(settings, "job_max_attempts", 3)
+    monkeypatch.setattr(settings, "job_retry_base_seconds", 30.0)
+    monkeypatch.setattr(settings, "job_retry_max_seconds", 1800.0)
+
+
+class FakeSession:
+    def __init__(self, job: EmailJob | None = None):
+        self.job = job
+        self.added = []
+        self.commits = 0
+
+    async def get(self, model, key):
+        return self.job if self.job is not None and key == self.job.id else None
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def running_job(attempts: int) -> EmailJob:
+    return EmailJob(
+        id=uuid.uuid4(), email_id=uuid.uuid4(), stage="draft", status="running",
+        attempts=attempts, locked_until=datetime.now(timezone.utc) + timedelta(minutes=10),
+    )
+
+
+@pytest.mark.parametrize("attempts, lowest, highest", [
+    (1, 30, 60),
+    (2, 60, 90),
+    (4, 240, 270),
+    (7, 1800, 1800),   # 1920 s and up is past the cap
+])
+def test_retry_delay_doubles_with_jitter_up_to_the_cap(monkeypatch, attempts, lowest, highest):
+    monkeypatch.setattr(jobs.random, "uniform", lambda a, b: a)
+    assert jobs._retry_delay(attempts) == lowest
+    monkeypatch.setattr(jobs.random, "uniform", lambda a, b: b)
+    assert jobs._retry_delay(attempts) == highest
+
+
+@pytest.mark.parametrize("exc, transient", [
+    (CircuitOpenError("ollama", 30), True),
+    (UNAVAILABLE, True),
+    (httpx.HTTPStatusError(
+        "busy", request=httpx.Request("POST", "http://ollama"),
+        response=httpx.Response(503, request=httpx.Request("POST", "http://ollama")),
+    ), True),
+    (httpx.HTTPStatusError(
+        "bad", request=httpx.Request("POST", "http://ollama"),
+        response=httpx.Response(400, request=httpx.Request("POST", "http://ollama")),
+    ), False),
+    (ValueError("no JSON in reply"), False),
+])
+def test_is_transient(exc, transient):
+    assert jobs.is_transient(exc) is transient
+
+
+def test_transient_failure_backs_off(monkeypatch):
+    monkeypatch.setattr(jobs, "_retry_delay", lambda attempts: 60.0 * attempts)
+    job = running_job(attempts=2)
+    db = FakeSession(job)
+    before = datetime.now(timezone.utc)
+
+    asyncio.run(jobs.fail_job(job.id, UNAVAILABLE, db))
+
+    assert job.status == "pending"
+    assert job.attempts == 2
+    assert before + timedelta(seconds=120) <= job.locked_until <= datetime.now(timezone.utc) + timedelta(seconds=120)
+    assert job.last_error == "ConnectError: connection refused"
+    assert db.added == [] and db.commits == 1
+
+
+def test_transient_failure_on_the_last_attempt_is_dead_lettered():
+    job = running_job(attempts=3)
+    db = FakeSession(job)
+
+    asyncio.run(jobs.fail_job(job.id, UNAVAILABLE, db))
+
+    assert job.status == "dead" and job.locked_until is None
+    [dead] = db.added
+    assert isinstance(dead, DeadLetterJob)
+    assert (dead.job_id, dead.error_kind, dead.attempts) == (job.id, "transient", 3)
+    assert db.commits == 1
+
+
+def test_permanent_failure_is_dead_lettered_at_once():
+    job = running_job(attempts=1)
+    db = FakeSession(job)
+
+    asyncio.run(jobs.fail_job(job.id, ValueError("no JSON in reply"), db))
+
+    assert job.status == "dead"
+    [dead] = db.added
+    assert (dead.error_kind, dead.reason) == ("permanent", "ValueError: no JSON in reply")
+
+
+def test_fail_job_ignores_a_deleted_job():
+    db = FakeSession()
+    asyncio.run(jobs.fail_job(uuid.uuid4(), UNAVAILABLE, db))
+    assert db.added == [] and db.commits == 0
+
+
+def test_claim_closes_jobs_whose_email_already_has_its_result(monkeypatch):
+    pending, finished = uuid.uuid4(), uuid.uuid4()
+    claimed = {pending: uuid.uuid4(), finished: uuid.uuid4()}
+    email, user = type("Email", (), {"id": pending})(), object()
+    completed = []
+
+    async def claim_jobs(stage, db, email_ids=None, limit=50):
+        assert (stage, email_ids, limit) == ("classify", [pending, finished], 2)
+        return claimed
+
+    async def load_with_owners(email_ids, db, *conditions):
+        assert email_ids == [pending, finished]
+        return [(email, user)]
+
+    async def complete_job(job_id, db):
+        completed.append(job_id)
+
+    monkeypatch.setattr(jobs, "claim_jobs", claim_jobs)
+    monkeypatch.setattr(jobs, "complete_job", complete_job)
+    monkeypatch.setattr(pipeline, "_load_with_owners", load_with_owners)
+    db = FakeSession()
+
+    pairs, mapping = asyncio.run(pipeline._claim([pending, finished], "classify", db))
+
+    assert pairs == [(email, user)]
+    assert mapping == claimed
+    assert completed == [claimed[finished]]
+    assert db.commits == 1
+
+
+def test_claim_with_nothing_claimable(monkeypatch):
+    async def claim_jobs(stage, db, email_ids=None, limit=50):
+        return {}
+
+    monkeypatch.setattr(jobs, "claim_jobs", claim_jobs)
+    assert asyncio.run(pipeline._claim([uuid.uuid4()], "draft", FakeSession())) == ([], {})
+
+
+# --------------------------------------------------------------------------- #
+# Against Postgres: set TEST_DATABASE_URL to a throwaway database
+# --------------------------------------------------------------------------- #
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+needs_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def with_email_job(test):
+    """Run `test(db, job)` against one pending draft job on a fresh email, then clean up."""
+    from sqlalchemy import delete, select
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    import app.models  # noqa: F401 — registers every table
+    from app.database import Base
+    from app.models.email_message import EmailMessage
+    from app.models.mail_account import MailAccount
+    from app.models.user import User
+
+    async def run():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+            async with sessions() as db:
+                user = User(email=f"{uuid.uuid4().hex}@example.dk", name="Test", password_hash="x")
+                db.add(user)
+                await db.flush()
+                account = MailAccount(user_id=user.id, provider="gmail", email_address=user.email)
+                db.add(account)
+                await db.flush()
+                email = EmailMessage(
+                    account_id=account.id, provider_id=uuid.uuid4().hex,
+                    from_address="kunde@example.dk", to_address=user.email,
+                )
+                db.add(email)
+                await db.flush()
+                await jobs.create_jobs([email.id], "draft", db)
+                await db.commit()
+                job_id = await db.scalar(select(EmailJob.id).where(EmailJob.email_id == email.id))
+                try:
+                    await test(db, await db.get(EmailJob, job_id))
+                finally:
+                    await db.rollback()
+                    await db.execute(delete(EmailMessage).where(EmailMessage.id == email.id))
+                    await db.execute(delete(MailAccount).where(MailAccount.id == account.id))
+                    await db.execute(delete(User).where(User.id == user.id))
+                    await db.commit()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+async def reload(db, job: EmailJob) -> EmailJob:
+    await db.refresh(job)
+    return job
+
+
+@needs_postgres
+def test_claim_and_complete_a_job():
+    async def test(db, job):
+        assert await jobs.claim_jobs("draft", db, email_ids=[job.email_id]) == {job.email_id: job.id}
+        job = await reload(db, job)
+        assert (job.status, job.attempts) == ("running", 1)
+        assert job.locked_until > datetime.now(timezone.utc)
+        # Leased: nobody else can claim it
+        assert await jobs.claim_jobs("draft", db, email_ids=[job.email_id]) == {}
+
+        await jobs.complete_job(job.id, db)
+        await db.commit()
+        job = await reload(db, job)
+        assert (job.status, job.locked_until) == ("done", None)
+        assert await jobs.claim_jobs("draft", db, email_ids=[job.email_id]) == {}
+
+    with_email_job(test)
+
+
+@needs_postgres
+def test_retries_until_dead_at_max_attempts(monkeypatch):
+    monkeypatch.setattr(jobs, "_retry_delay", lambda attempts: 0.0)
+
+    async def test(db, job):
+        for attempt in range(1, settings.job_max_attempts + 1):
+            assert await jobs.claim_jobs("draft", db, email_ids=[job.email_id]) == {job.email_id: job.id}
+            # The claim is a bulk update; fail_job reads the job through the session
+            job = await reload(db, job)
+            assert job.attempts == attempt
+            await jobs.fail_job(job.id, UNAVAILABLE, db)
+        assert job.status == "dead"
+        [dead] = await jobs.list_dead_jobs(db, stage="draft", limit=1)
+        assert (dead.job_id, dead.attempts) == (job.id, settings.job_max_attempts)
+        assert await jobs.claim_jobs("draft", db, email_ids=[job.email_id]) == {}
+
+    with_email_job(test)
+
+
+@needs_postgres
+def test_recover_resets_an_expired_lease():
+    async def test(db, job):
+        await jobs.claim_jobs("draft", db, email_ids=[job.email_id])
+        # A live lease is left alone
+        assert job.email_id not in (await jobs.recover_stale_jobs(db)).get("draft", [])
+
+        job = await reload(db, job)
+        job.locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.commit()
+
+        assert job.email_id in (await jobs.recover_stale_jobs(db))["draft"]
+        job = await reload(db, job)
+        assert (job.status, job.attempts) == ("pending", 1)
+
+    with_email_job(test)
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import mail_outlook
+from app.services.rate_limit import TokenBucket
+from benchmarks.fake_graph import FakeGraphServer
+
+HEADERS = {"Prefer": 'odata.maxpagesize=20, outlook.body-content-type="text"'}
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    with FakeGraphServer() as server:
+        monkeypatch.setattr(mail_outlook, "GRAPH_API", server.base_url)
+        yield server
+
+
+def fetch(cursor):
+    async def run():
+        bucket = TokenBucket(rate=100.0, capacity=100.0)
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            return await mail_outlook._fetch_delta(client, HEADERS, bucket, cursor)
+    return asyncio.run(run())
+
+
+def test_first_round_pages_through_the_inbox(fake_graph):
+    for i in range(45):
+        fake_graph.add_message(f"m{i}")
+
+    messages, cursor = fetch(None)
+
+    assert len(messages) == 45
+    assert len(fake_graph.requests) == 3
+    assert cursor.startswith(fake_graph.base_url) and "$deltatoken=45" in cursor
+    first_query = fake_graph.requests[0][0]
+    assert "receivedDateTime+ge" in first_query or "receivedDateTime%20ge" in first_query
+
+
+def test_incremental_round_returns_only_new_messages(fake_graph):
+    for i in range(45):
+        fake_graph.add_message(f"m{i}")
+    _, cursor = fetch(None)
+    fake_graph.add_message("ny1")
+    fake_graph.add_message("ny2")
+    fake_graph.remove_message("m0")
+
+    messages, cursor = fetch(cursor)
+
+    assert [m["provider_id"] for m in messages] == ["ny1", "ny2"]
+    assert messages[0]["body_text"] == "Tekst ny1" and messages[0]["body_html"] == ""
+    assert fetch(cursor)[0] == []
+
+
+def test_expired_delta_token_starts_a_new_round(fake_graph):
+    for i in range(3):
+        fake_graph.add_message(f"m{i}")
+    _, cursor = fetch(None)
+    fake_graph.add_message("ny")
+    fake_graph.expire_tokens()
+
+    messages, cursor = fetch(cursor)
+
+    assert len(messages) == 4
+    assert "$deltatoken=4" in cursor
+
+
+def test_timestamp_cursor_becomes_the_start_of_a_delta_round(fake_graph):
+    fake_graph.add_message("m0")
+
+    fetch("2026-10-01T12:00:00+00:00")
+
+    query = fake_graph.requests[0][0]
+    assert "2026-10-01T12%3A00%3A00Z" in query or "2026-10-01T12:00:00Z" in query
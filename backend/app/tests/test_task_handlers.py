@@ -0,0 +1,91 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import fakeredis
+import pytest
+
+from app.services import mail_sync
+from app.tasks import async_worker, handlers, worker
+
+ACCOUNT_ID = "6f1c5b0e-3d2a-4b7e-9a61-0c8d2f4e5a17"
+
+
+@asynccontextmanager
+async def fake_session():
+    yield None
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    calls = []
+    monkeypatch.setattr(worker.sync_account, "delay", calls.append)
+    return calls
+
+
+def test_sync_account_marks_a_resync_when_the_account_is_busy(monkeypatch, redis, enqueued):
+    synced = []
+
+    async def sync_account_by_id(account_id, db):
+        synced.append(account_id)
+
+    monkeypatch.setattr(mail_sync, "sync_account_by_id", sync_account_by_id)
+
+    async def run():
+        lock = redis.lock(handlers.SYNC_LOCK_KEY.format(account_id=ACCOUNT_ID), timeout=60)
+        assert await lock.acquire(blocking=False)
+        await handlers.sync_account(fake_session, redis, ACCOUNT_ID)
+        return await redis.get(handlers.SYNC_PENDING_KEY.format(account_id=ACCOUNT_ID))
+
+    assert asyncio.run(run()) == "1"
+    assert synced == []
+    assert enqueued == []
+
+
+def test_sync_account_enqueues_the_pending_resync_after_release(monkeypatch, redis, enqueued):
+    async def sync_account_by_id(account_id, db):
+        # A push notification arrives while this sync is running
+        await handlers.sync_account(fake_session, redis, ACCOUNT_ID)
+
+    monkeypatch.setattr(mail_sync, "sync_account_by_id", sync_account_by_id)
+
+    async def run():
+        await handlers.sync_account(fake_session, redis, ACCOUNT_ID)
+        return await redis.exists(
+            handlers.SYNC_LOCK_KEY.format(account_id=ACCOUNT_ID),
+            handlers.SYNC_PENDING_KEY.format(account_id=ACCOUNT_ID),
+        )
+
+    assert asyncio.run(run()) == 0
+    assert enqueued == [ACCOUNT_ID]
+
+
+def test_async_worker_runs_every_celery_task():
+    celery_tasks = {name for name in worker.celery_app.tasks if name.startswith("app.tasks.worker.")}
+    assert set(async_worker.HANDLERS) == celery_tasks
+
+
+def test_async_worker_parks_messages_for_unknown_tasks(redis):
+    consumer = async_worker.AsyncConsumer(["celery"], 1, "test")
+    consumer._redis = redis
+    raw = json.dumps({
+        "body": json.dumps([[], {}, {}]),
+        "headers": {"task": "app.tasks.legacy.gone", "id": "1"},
+        "properties": {},
+    })
+
+    async def run():
+        await redis.lpush(consumer.processing_key, raw)
+        await consumer._run(raw, "celery")
+        return (
+            await redis.lrange(async_worker.PARKED_KEY, 0, -1),
+            await redis.llen("celery"),
+            await redis.llen(consumer.processing_key),
+        )
+
+    assert asyncio.run(run()) == ([raw], 0, 0)
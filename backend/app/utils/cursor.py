@@ -0,0 +1,35 @@
+"""Opaque keyset-pagination cursors: a position's sort keys, JSON-encoded in URL-safe base64."""
+
+import base64
+import binascii
+import json
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+
+def _key(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def encode_cursor(*keys: Any) -> str:
+    """Cursor for the sort keys of the last row on a page; datetimes and UUIDs are stored as strings."""
+    raw = json.dumps(keys, default=_key)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> tuple:
+    """
+    Inverse of encode_cursor, passing each key through the matching parser.
+
+    Raises ValueError for a malformed cursor, including one with the wrong
+    number of keys or a key its parser rejects.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        keys = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(keys, list) or len(keys) != len(parsers):
+            raise ValueError("wrong number of keys")
+        return tuple(parse(key) for parse, key in zip(parsers, keys))
+    except (binascii.Error, AttributeError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -0,0 +1,23 @@
+import redis
+from redis import asyncio as aioredis
+
+from app.config import settings
+
+_redis: redis.Redis | None = None
+_async_redis: aioredis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """Return a process-wide Redis client (created lazily, so it is fork-safe)."""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+    return _redis
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Return a process-wide asyncio Redis client, for use on the API's event loop."""
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.from_url(settings.redis_url, decode_responses=True)
+    return _async_redis
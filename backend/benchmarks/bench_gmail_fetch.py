@@ -0,0 +1,76 @@
+"""
+Benchmark — sekventiel messages.get vs. batch-endpointet vs. samtidige GETs
+mod en lokal Gmail-attrap.
+Kør med: python -m benchmarks.bench_gmail_fetch [antal beskeder] [latenstid i sek.]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.config import settings
+from app.services import mail_gmail
+from app.services.rate_limit import TokenBucket
+from benchmarks.fake_gmail import FakeGmailServer
+
+
+async def _fetch_sequential(client: httpx.AsyncClient, ids: list[str]) -> list[dict]:
+    """The pre-batch behaviour: one GET per message, one after another."""
+    results = []
+    for msg_id in ids:
+        resp = await client.get(f"{mail_gmail.GMAIL_API}/messages/{msg_id}", params={"format": "full"})
+        if resp.status_code == 404:
+            continue
+        resp.raise_for_status()
+        results.append(mail_gmail._parse_message(resp.json()))
+    return results
+
+
+async def _timed(server: FakeGmailServer, mode: str, client: httpx.AsyncClient,
+                 ids: list[str]) -> tuple[float, int, list[dict]]:
+    settings.gmail_fetch_mode = mode
+    server.throttled = {"5", "7"}
+    server.request_count = 0
+    bucket = TokenBucket(rate=settings.gmail_quota_units_per_second,
+                         capacity=settings.gmail_quota_units_per_second)
+    started = time.perf_counter()
+    messages = await mail_gmail._fetch_full_messages(client, {}, ids, bucket)
+    return time.perf_counter() - started, server.request_count, messages
+
+
+async def main(count: int, latency: float):
+    ids = [str(i) for i in range(count)]
+
+    with FakeGmailServer(latency=latency, missing={"3"}, throttled={"5", "7"}) as server:
+        mail_gmail.GMAIL_API = f"{server.base_url}/gmail/v1/users/me"
+        mail_gmail.GMAIL_BATCH_API = f"{server.base_url}/batch/gmail/v1"
+
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            server.throttled = set()
+            server.request_count = 0
+            started = time.perf_counter()
+            sequential = await _fetch_sequential(client, ids)
+            seq_time = time.perf_counter() - started
+            seq_requests = server.request_count
+
+            batch_time, batch_requests, batched = await _timed(
+                server, "batch", client, ids
+            )
+            conc_time, conc_requests, concurrent = await _timed(
+                server, "concurrent", client, ids
+            )
+
+    expected = [m["provider_id"] for m in sequential]
+    assert [m["provider_id"] for m in batched] == expected
+    assert sorted(m["provider_id"] for m in concurrent) == sorted(expected)
+    print(f"{count} beskeder, {latency * 1000:.0f} ms latenstid pr. forespørgsel")
+    print(f"  sekventiel: {seq_time:6.2f} s  ({seq_requests} forespørgsler)")
+    print(f"  batch:      {batch_time:6.2f} s  ({batch_requests} forespørgsler, inkl. 429-genforsøg)")
+    print(f"  samtidig:   {conc_time:6.2f} s  ({conc_requests} forespørgsler, inkl. 429-genforsøg)")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    asyncio.run(main(count, latency))
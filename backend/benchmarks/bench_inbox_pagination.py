@@ -0,0 +1,128 @@
+"""
+Benchmark — sidelatens for indbakkelisten: offset vs. cursor på en stor postkasse.
+Kræver en kørende Postgres (DATABASE_URL). Opretter en midlertidig bruger med
+N emails og sletter den igen bagefter.
+Kør med: python -m benchmarks.bench_inbox_pagination [antal emails] [sidestørrelse]
+"""
+import asyncio
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload
+
+import app.models  # noqa: F401 — registers every table for create_all
+from app.database import Base, async_session, engine
+from app.models.email_message import EmailMessage
+from app.models.mail_account import MailAccount
+from app.models.user import User
+from app.services.inbox import encode_cursor, list_page
+
+_SEED_CHUNK = 2000
+_CATEGORIES = ["tilbud", "booking", "reklamation", "faktura", "leverandor", "intern", "spam", "andet"]
+
+
+async def _seed(count: int) -> tuple[uuid.UUID, uuid.UUID]:
+    """Create a throwaway user and account with `count` emails spread over three years."""
+    user_id, account_id = uuid.uuid4(), uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    async with async_session() as db:
+        db.add(User(id=user_id, email=f"bench-{user_id}@example.com", name="Benchmark", password_hash="x"))
+        await db.flush()
+        db.add(MailAccount(id=account_id, user_id=user_id, provider="gmail", email_address="bench@example.com"))
+        await db.commit()
+
+        for start in range(0, count, _SEED_CHUNK):
+            rows = [
+                {
+                    "account_id": account_id,
+                    "provider_id": f"bench-{i}",
+                    "from_address": f"kunde{i % 500}@example.com",
+                    "to_address": "bench@example.com",
+                    "subject": f"Henvendelse {i}",
+                    "body_text": "Hej, vi vil gerne have et tilbud. " * 20,
+                    "body_html": "<p>Hej, vi vil gerne have et tilbud.</p>" * 20,
+                    "received_at": now - timedelta(seconds=random.randint(0, 3 * 365 * 86400)),
+                    "category": random.choice(_CATEGORIES),
+                    "urgency": random.choice(["high", "medium", "low"]),
+                    "is_read": random.random() < 0.7,
+                    "is_replied": False,
+                    "processed": True,
+                }
+                for i in range(start, min(start + _SEED_CHUNK, count))
+            ]
+            await db.execute(pg_insert(EmailMessage).values(rows))
+            await db.commit()
+        await db.execute(text("ANALYZE email_messages"))
+        await db.commit()
+    return user_id, account_id
+
+
+async def _offset_page(account_id: uuid.UUID, skip: int, limit: int) -> float:
+    """The old query: OFFSET/LIMIT over received_at desc."""
+    async with async_session() as db:
+        started = time.perf_counter()
+        result = await db.execute(
+            select(EmailMessage)
+            .options(selectinload(EmailMessage.suggestions))
+            .where(EmailMessage.account_id.in_([account_id]))
+            .order_by(EmailMessage.received_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        result.scalars().unique().all()
+        return time.perf_counter() - started
+
+
+async def _cursor_page(account_id: uuid.UUID, skip: int, limit: int) -> float:
+    """The keyset query, starting from the cursor of the row just before `skip`."""
+    async with async_session() as db:
+        cursor = None
+        if skip:
+            # Untimed: find the cursor a client would have received
+            row = (await db.execute(
+                select(EmailMessage.received_at, EmailMessage.id)
+                .where(EmailMessage.account_id == account_id)
+                .order_by(EmailMessage.received_at.desc(), EmailMessage.id.desc())
+                .offset(skip - 1)
+                .limit(1)
+            )).one()
+            cursor = encode_cursor(row.received_at, row.id)
+        started = time.perf_counter()
+        await list_page(db, [account_id], cursor=cursor, limit=limit)
+        return time.perf_counter() - started
+
+
+async def main(count: int, limit: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    print(f"Opretter {count} emails ...")
+    user_id, account_id = await _seed(count)
+    try:
+        last_page = max((count - 1) // limit, 0)
+        pages = sorted({p for p in (0, 10, 100, 1000, last_page // 2, last_page) if p <= last_page})
+        print(f"{count} emails, {limit} pr. side (median af 5 kørsler)")
+        print(f"  {'side':>6}  {'offset':>10}  {'cursor':>10}")
+        for page in pages:
+            skip = page * limit
+            offset_times = sorted([await _offset_page(account_id, skip, limit) for _ in range(5)])
+            cursor_times = sorted([await _cursor_page(account_id, skip, limit) for _ in range(5)])
+            print(f"  {page + 1:>6}  {offset_times[2] * 1000:8.1f} ms  {cursor_times[2] * 1000:8.1f} ms")
+    finally:
+        async with async_session() as db:
+            await db.execute(delete(EmailMessage).where(EmailMessage.account_id == account_id))
+            await db.execute(delete(MailAccount).where(MailAccount.id == account_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(count, limit))
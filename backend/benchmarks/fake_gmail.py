@@ -0,0 +1,104 @@
+"""
+Lokal Gmail-attrap til benchmarks — serverer messages.get og batch-endpointet.
+Hver HTTP-forespørgsel får en kunstig latenstid, så round-trips kan sammenlignes.
+"""
+import base64
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _make_message(msg_id: str) -> dict:
+    body = f"Hej, jeg vil gerne have et tilbud på opgave {msg_id}.".encode()
+    return {
+        "id": msg_id,
+        "threadId": f"t-{msg_id}",
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "From", "value": f"Kunde {msg_id} <kunde{msg_id}@example.dk>"},
+                {"name": "To", "value": "firma@example.dk"},
+                {"name": "Subject", "value": f"Tilbud {msg_id}"},
+                {"name": "Date", "value": "Mon, 19 Oct 2026 10:00:00 +0200"},
+            ],
+            "body": {"data": base64.urlsafe_b64encode(body).decode().rstrip("=")},
+        },
+    }
+
+
+class FakeGmailServer:
+    """Threaded HTTP server; `missing` IDs answer 404, `throttled` IDs 429 once."""
+
+    def __init__(self, latency: float = 0.02, missing: set[str] | None = None,
+                 throttled: set[str] | None = None):
+        self.latency = latency
+        self.missing = missing or set()
+        self.throttled = set(throttled or ())
+        self.request_count = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                server.request_count += 1
+                time.sleep(server.latency)
+                status, data = server.get_message(self.path)
+                self._reply(status, json.dumps(data).encode(), "application/json")
+
+            def do_POST(self):
+                server.request_count += 1
+                time.sleep(server.latency)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode()
+                boundary = re.search(r"boundary=(\S+)", self.headers["Content-Type"]).group(1)
+                self._reply(200, server.batch(body, boundary).encode(),
+                            "multipart/mixed; boundary=batch_response")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def get_message(self, path: str) -> tuple[int, dict]:
+        msg_id = path.split("?")[0].rsplit("/", 1)[-1]
+        if msg_id in self.missing:
+            return 404, {"error": {"code": 404}}
+        if msg_id in self.throttled:
+            self.throttled.discard(msg_id)
+            return 429, {"error": {"code": 429}}
+        return 200, _make_message(msg_id)
+
+    def batch(self, body: str, boundary: str) -> str:
+        out = []
+        for part in body.split(f"--{boundary}"):
+            item = re.search(r"Content-ID: <item-(\d+)>", part)
+            request_line = re.search(r"GET (\S+)", part)
+            if not item or not request_line:
+                continue
+            status, data = self.get_message(request_line.group(1))
+            out.append(
+                "--batch_response\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-item-{item.group(1)}>\r\n\r\n"
+                f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(data)}\r\n"
+            )
+        out.append("--batch_response--\r\n")
+        return "".join(out)
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,101 @@
+"""
+Lokal Microsoft Graph-attrap — serverer inbox-deltaforespørgsler med
+nextLink/deltaLink-paginering, så delta-synkronisering kan afprøves uden Graph.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeGraphServer:
+    """
+    Holds an inbox of messages. A delta round pages through every message
+    added after the round's token; `expire_tokens()` makes old tokens 410.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.messages: list[dict] = []
+        self.removed: list[str] = []
+        self.requests: list[tuple[str, dict]] = []
+        self._token_floor = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                server.requests.append((self.path, dict(self.headers)))
+                status, data = server.delta(self.path, self.headers.get("Prefer", ""))
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}/v1.0"
+
+    def add_message(self, msg_id: str, received: str = "2026-10-19T08:00:00Z") -> None:
+        self.messages.append({
+            "id": msg_id,
+            "conversationId": f"c-{msg_id}",
+            "from": {"emailAddress": {"address": f"{msg_id}@example.dk", "name": msg_id}},
+            "toRecipients": [{"emailAddress": {"address": "firma@example.dk"}}],
+            "subject": f"Besked {msg_id}",
+            "body": {"contentType": "text", "content": f"Tekst {msg_id}"},
+            "receivedDateTime": received,
+            "isRead": False,
+        })
+
+    def remove_message(self, msg_id: str) -> None:
+        self.removed.append(msg_id)
+
+    def expire_tokens(self) -> None:
+        self._token_floor = len(self.messages)
+
+    def delta(self, path: str, prefer: str) -> tuple[int, dict]:
+        query = parse_qs(urlparse(path).query)
+        page_size = 10
+        if "odata.maxpagesize=" in prefer:
+            page_size = int(prefer.split("odata.maxpagesize=")[1].split(",")[0])
+
+        if "$deltatoken" in query:
+            start = int(query["$deltatoken"][0])
+            if start < self._token_floor:
+                return 410, {"error": {"code": "SyncStateNotFound"}}
+            offset, removed_from = start, int(query.get("removed", ["0"])[0])
+        elif "$skiptoken" in query:
+            offset = int(query["$skiptoken"][0])
+            removed_from = int(query.get("removed", ["0"])[0])
+        else:
+            offset, removed_from = 0, len(self.removed)
+
+        page = self.messages[offset:offset + page_size]
+        value = list(page)
+        end = offset + len(page)
+        if end >= len(self.messages):
+            value += [{"id": r, "@removed": {"reason": "deleted"}} for r in self.removed[removed_from:]]
+            return 200, {
+                "value": value,
+                "@odata.deltaLink": f"{self.base_url}/me/mailFolders/inbox/messages/delta"
+                                    f"?$deltatoken={end}&removed={len(self.removed)}",
+            }
+        return 200, {
+            "value": value,
+            "@odata.nextLink": f"{self.base_url}/me/mailFolders/inbox/messages/delta"
+                               f"?$skiptoken={end}&removed={removed_from}",
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,64 @@
+"""
+Afspiller Gmail Pub/Sub- og Graph-notifikationer mod en lokal backend.
+Kør med: python -m benchmarks.replay_notifications <gmail-adresse> <graph-subscription-id> [base-url]
+"""
+import base64
+import json
+import sys
+
+import httpx
+
+from app.config import settings
+
+
+def gmail_envelope(email_address: str, history_id: int = 1) -> dict:
+    """A Pub/Sub push body as Google delivers it."""
+    data = json.dumps({"emailAddress": email_address, "historyId": history_id})
+    return {
+        "message": {
+            "data": base64.b64encode(data.encode()).decode(),
+            "messageId": "replay-1",
+            "publishTime": "2026-10-19T08:00:00Z",
+        },
+        "subscription": "projects/replay/subscriptions/mailbot",
+    }
+
+
+def graph_notification(subscription_id: str, client_state: str) -> dict:
+    """A Graph change-notification body for one new inbox message."""
+    return {
+        "value": [{
+            "subscriptionId": subscription_id,
+            "clientState": client_state,
+            "changeType": "created",
+            "resource": "Users/replay/Messages/replay-msg",
+            "tenantId": "replay",
+        }]
+    }
+
+
+def main(gmail_address: str, subscription_id: str, base_url: str):
+    with httpx.Client(base_url=f"{base_url}/api/webhooks", timeout=10.0) as client:
+        resp = client.post("/outlook/notifications", params={"validationToken": "replay-token"})
+        print(f"graph validering:       {resp.status_code} {resp.text!r}")
+
+        resp = client.post("/outlook/notifications",
+                           json=graph_notification(subscription_id, settings.outlook_client_state))
+        print(f"graph notifikation:     {resp.status_code}")
+
+        resp = client.post("/outlook/notifications", json=graph_notification(subscription_id, "forkert"))
+        print(f"graph forkert state:    {resp.status_code} (ignoreres)")
+
+        resp = client.post("/gmail/push", params={"token": settings.gmail_push_token},
+                           json=gmail_envelope(gmail_address))
+        print(f"gmail push:             {resp.status_code}")
+
+        resp = client.post("/gmail/push", params={"token": "forkert"}, json=gmail_envelope(gmail_address))
+        print(f"gmail forkert token:    {resp.status_code} (forventet 403)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "http://localhost:8080")
@@ -154,6 +154,14 @@ async def seed():
         print(f"Created {len(kb_entries)} knowledge base entries")
 
         await db.commit()
+
+        # Tællerne til dashboard og statistik bygges fra de indsatte rækker
+        from app.services.counters import reconcile
+        await reconcile(db)
+
+        # Søgeindeks for de indsatte emails
+        from app.services.search import backfill
+        await backfill(db)
         print("\nSeed completed successfully!")
 
 
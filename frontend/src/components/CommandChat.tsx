@@ -27,6 +27,7 @@ export default function CommandChat() {
     },
   ])
   const [loading, setLoading] = useState(false)
+  const sessionId = useRef<string | null>(null)
   const bottomRef = useRef<HTMLDivElement>(null)
 
   useEffect(() => {
@@ -39,6 +40,10 @@ export default function CommandChat() {
     return id
   }
 
+  const updateMessage = (id: number, patch: Partial<Message>) => {
+    setMessages((prev) => prev.map((m) => (m.id === id ? { ...m, ...patch } : m)))
+  }
+
   const sendMessage = async (text: string, confirm = false, pendingAction?: Record<string, unknown>) => {
     if (!text.trim() && !confirm) return
     setLoading(true)
@@ -48,19 +53,39 @@ export default function CommandChat() {
       setInput('')
     }
 
+    // Svaret vises efterhånden som AI-teksten streames, og erstattes af det endelige svar
+    const replyId = addMessage({ role: 'assistant', content: '' })
+    let streamed = ''
+    let finished = false
     try {
-      const res = await api.sendCommand(text, confirm, pendingAction)
-      addMessage({
-        role: 'assistant',
-        content: res.response,
-        requiresConfirmation: res.requires_confirmation,
-        pendingAction: res.pending_action,
-        actionsTaken: res.actions_taken,
-        status: res.actions_taken?.length > 0 ? 'success' : undefined,
-      })
+      await api.streamCommand(
+        text,
+        (event, data) => {
+          if (event === 'token') {
+            streamed += data.text
+            updateMessage(replyId, { content: streamed })
+          } else if (event === 'done') {
+            finished = true
+            sessionId.current = data.session_id ?? null
+            updateMessage(replyId, {
+              content: data.response,
+              requiresConfirmation: data.requires_confirmation,
+              pendingAction: data.pending_action,
+              actionsTaken: data.actions_taken,
+              status: data.actions_taken?.length > 0 ? 'success' : undefined,
+            })
+          } else if (event === 'error') {
+            finished = true
+            updateMessage(replyId, { content: `Fejl: ${data.detail}`, status: 'error' })
+          }
+        },
+        confirm,
+        pendingAction,
+        sessionId.current,
+      )
+      if (!finished) throw new Error('Forbindelsen blev afbrudt')
     } catch (err) {
-      addMessage({
-        role: 'assistant',
+      updateMessage(replyId, {
         content: `Fejl: ${err instanceof Error ? err.message : 'Noget gik galt'}`,
         status: 'error',
       })
@@ -122,7 +147,7 @@ export default function CommandChat() {
 
           {/* Beskeder */}
           <div className="flex-1 overflow-y-auto p-4 space-y-3">
-            {messages.map((msg) => (
+            {messages.filter((msg) => msg.content).map((msg) => (
               <div key={msg.id} className={`flex ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}>
                 <div
                   className={`max-w-[85%] rounded-2xl px-3 py-2 text-sm leading-relaxed whitespace-pre-wrap ${
@@ -173,7 +198,7 @@ export default function CommandChat() {
               </div>
             ))}
 
-            {loading && (
+            {loading && !messages[messages.length - 1]?.content && (
               <div className="flex justify-start">
                 <div className="bg-slate-100 dark:bg-zinc-800 rounded-2xl rounded-bl-sm px-4 py-3">
                   <Loader2 className="w-4 h-4 animate-spin text-accent" />
@@ -42,7 +42,7 @@ export const api = {
 
   // Emails
   generateSuggestion: (id: string) => fetchApi(`/emails/${id}/generate-suggestion`, { method: 'POST' }),
-  listEmails: (params?: { category?: string; urgency?: string; is_read?: boolean; skip?: number; limit?: number }) => {
+  listEmails: (params?: { category?: string; urgency?: string; is_read?: boolean; cursor?: string; limit?: number }) => {
     const searchParams = new URLSearchParams();
     if (params) {
       Object.entries(params).forEach(([k, v]) => {
@@ -52,6 +52,15 @@ export const api = {
     const qs = searchParams.toString();
     return fetchApi(`/emails/${qs ? `?${qs}` : ''}`);
   },
+  searchEmails: (q: string, params?: { cursor?: string; limit?: number }) => {
+    const searchParams = new URLSearchParams({ q });
+    if (params?.cursor) searchParams.set('cursor', params.cursor);
+    if (params?.limit) searchParams.set('limit', String(params.limit));
+    return fetchApi(`/emails/search?${searchParams.toString()}`);
+  },
+  semanticSearchEmails: (q: string, limit?: number) =>
+    fetchApi(`/emails/semantic-search?${new URLSearchParams({ q, ...(limit ? { limit: String(limit) } : {}) }).toString()}`),
+  getSimilarEmails: (id: string) => fetchApi(`/emails/${id}/similar`),
   getEmail: (id: string) => fetchApi(`/emails/${id}`),
   getEmailStats: () => fetchApi('/emails/stats/summary'),
 
@@ -89,12 +98,54 @@ export const api = {
     fetchApi(`/knowledge/${id}`, { method: 'DELETE' }),
 
   // Chat / AI Command
-  sendCommand: (message: string, confirm?: boolean, pendingAction?: Record<string, unknown>) =>
+  // sessionId comes from the previous response and keeps the conversation's context
+  sendCommand: (message: string, confirm?: boolean, pendingAction?: Record<string, unknown>, sessionId?: string | null) =>
     fetchApi('/chat', {
       method: 'POST',
-      body: JSON.stringify({ message, confirm: confirm ?? false, pending_action: pendingAction ?? null }),
+      body: JSON.stringify({
+        message, confirm: confirm ?? false, pending_action: pendingAction ?? null, session_id: sessionId ?? null,
+      }),
     }),
 
+  // Streams the same command as server-sent events: intent, results, token…, done
+  streamCommand: async (
+    message: string,
+    onEvent: (event: string, data: any) => void,
+    confirm?: boolean,
+    pendingAction?: Record<string, unknown>,
+    sessionId?: string | null,
+  ) => {
+    const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
+    const res = await fetch(`${API_URL}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({
+        message, confirm: confirm ?? false, pending_action: pendingAction ?? null, session_id: sessionId ?? null,
+      }),
+    });
+    if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const event = block.match(/^event: (.*)$/m)?.[1] ?? 'message';
+        const data = block.match(/^data: (.*)$/m)?.[1];
+        if (data !== undefined) onEvent(event, JSON.parse(data));
+      }
+    }
+  },
+
   // Accounts
   listAccounts: () => fetchApi('/webhooks/accounts'),
   connectGmail: () => fetchApi('/webhooks/gmail/connect'),